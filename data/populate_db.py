@@ -2,7 +2,7 @@
 import sys
 import os
 import asyncio
-import uuid
+import hashlib
 
 # Ensure project root is on sys.path so `from src...` imports work when running this script directly.
 # Project root is the parent directory of this file's directory.
@@ -22,11 +22,13 @@ async def main():
     ]
     added = 0
     for d in docs:
-        kd = KnowledgeDocument(id=str(uuid.uuid4()), **d)
+        # stable id so re-running updates documents instead of duplicating them
+        doc_id = hashlib.sha1(f"{d['source']}:{d['title']}".encode("utf-8")).hexdigest()[:16]
+        kd = KnowledgeDocument(id=doc_id, **d)
         ok = await rag.add_document(kd)
         if ok:
             added += 1
-    print(f"Added {added} documents")
+    print(f"Added or updated {added} documents")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
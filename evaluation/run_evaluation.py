@@ -25,12 +25,13 @@ import asyncio
 import logging
 import os
 import sys
+import uuid
 from typing import Dict, Any, Tuple, List, Optional
 
 # This is a relative import. You must run this script as a module.
 # python -m evaluation.run_evaluation
 from src.models import UserQuery
-from src.asdsadf_agent import ASASSDFAgent
+from src.asdsadf_agent import ASDSADFAgent
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -201,8 +202,24 @@ def validate_response(response: Any, expected: Dict, sample: Dict) -> Tuple[bool
 
     return True, "PASS"
 
-async def run_evaluation_pipeline(agent: ASASSDFAgent = None) -> List[Dict[str, Any]]:
-    """Run the evaluation pipeline against the dataset and write results.json."""
+async def _drop_sessions(agent: ASDSADFAgent, session_ids: List[str]) -> None:
+    """Forget the conversation memory and session state an evaluation run created."""
+    memory = getattr(agent, "memory", None)
+    for session_id in session_ids:
+        agent.user_sessions.pop(session_id, None)
+        entry = memory.sessions.pop(session_id, None) if memory is not None else None
+        task = getattr(entry, "summarizing", None)
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+async def run_evaluation_pipeline(agent: Optional[ASDSADFAgent] = None) -> List[Dict[str, Any]]:
+    """
+    Run the evaluation pipeline against the dataset and write results.json.
+
+    Pass the server's running agent to evaluate it in-process; standalone runs
+    create an ASDSADFAgent that shares the process-wide model/client registry.
+    """
     logger.info("====== STARTING EVALUATION PIPELINE ======")
     # Load dataset
     try:
@@ -214,8 +231,8 @@ async def run_evaluation_pipeline(agent: ASASSDFAgent = None) -> List[Dict[str,
 
     # Initialize or use provided agent
     if agent is None:
-        logger.info("Creating ASASSDFAgent for evaluation")
-        agent = ASASSDFAgent()
+        logger.info("Creating ASDSADFAgent for evaluation")
+        agent = ASDSADFAgent()
         try:
             await agent.initialize()
         except Exception as e:
@@ -224,65 +241,72 @@ async def run_evaluation_pipeline(agent: ASASSDFAgent = None) -> List[Dict[str,
 
     results = []
     samples = dataset.get("samples", [])
-    for i, sample in enumerate(samples):
-        sid = sample.get("id", f"sample-{i}")
-        logger.info(f"--- Running test ({i+1}/{len(samples)}): {sid} ---")
-        # Build UserQuery
-        uq_kwargs = {"message": sample.get("user_prompt") or sample.get("user_prompt", "")}
-        if sample.get("prompt_type"):
-            uq_kwargs["prompt_type"] = sample.get("prompt_type")
-        if sample.get("user_profile"):
-            uq_kwargs["user_profile"] = sample.get("user_profile")
-        uq_kwargs["session_id"] = sample.get("id")
-
-        try:
-            query = UserQuery(**uq_kwargs)
-        except Exception as e:
-            logger.warning("Failed to construct UserQuery for %s: %s", sid, e)
-            query = UserQuery(message=sample.get("user_prompt", ""), prompt_type=sample.get("prompt_type"))
+    run_id = uuid.uuid4().hex[:8]
+    session_ids: List[str] = []
+    try:
+        for i, sample in enumerate(samples):
+            sid = sample.get("id", f"sample-{i}")
+            logger.info(f"--- Running test ({i+1}/{len(samples)}): {sid} ---")
+            # Build UserQuery
+            uq_kwargs = {"message": sample.get("user_prompt") or sample.get("user_prompt", "")}
+            if sample.get("prompt_type"):
+                uq_kwargs["prompt_type"] = sample.get("prompt_type")
+            if sample.get("user_profile"):
+                uq_kwargs["user_profile"] = sample.get("user_profile")
+            # a fresh session per run, so conversation memory never carries over between runs
+            uq_kwargs["session_id"] = f"eval-{run_id}-{sid}"
+            session_ids.append(uq_kwargs["session_id"])
+
+            try:
+                query = UserQuery(**uq_kwargs)
+            except Exception as e:
+                logger.warning("Failed to construct UserQuery for %s: %s", sid, e)
+                query = UserQuery(message=sample.get("user_prompt", ""), prompt_type=sample.get("prompt_type"))
+
+            # process query
+            try:
+                response_obj = await agent.process_query(query)
+                # normalize QueryResponse -> dict/text
+                if hasattr(response_obj, "response"):
+                    resp = response_obj.response
+                    context_used = getattr(response_obj, "context_used", [])
+                elif isinstance(response_obj, dict) or isinstance(response_obj, list):
+                    resp = response_obj
+                    context_used = sample.get("context", [])
+                else:
+                    # fallback: convert to str
+                    resp = response_obj
+                    context_used = []
 
-        # process query
-        try:
-            response_obj = await agent.process_query(query)
-            # normalize QueryResponse -> dict/text
-            if hasattr(response_obj, "response"):
-                resp = response_obj.response
-                context_used = getattr(response_obj, "context_used", [])
-            elif isinstance(response_obj, dict) or isinstance(response_obj, list):
-                resp = response_obj
-                context_used = sample.get("context", [])
-            else:
-                # fallback: convert to str
-                resp = response_obj
+            except Exception as e:
+                logger.exception("Agent process_query failed for %s: %s", sid, e)
+                resp = {"error": str(e)}
                 context_used = []
 
-        except Exception as e:
-            logger.exception("Agent process_query failed for %s: %s", sid, e)
-            resp = {"error": str(e)}
-            context_used = []
-
-        expected = sample.get("expected", {})
-        # run judge: validate_response now takes sample input as well
-        is_valid, reason = validate_response(resp, expected, sample)
-
-        judge_prompt = (
-            f"Judge this output for sample '{sid}'. Criteria:\n"
-            f"- user_profile keys: {list(expected.get('user_profile', {}).keys())}\n"
-            f"- roadmap expectations: {expected.get('roadmap')}\n"
-            f"- reasoning_summary required: {expected.get('reasoning_summary')}\n"
-            f"Return PASS/FAIL and reason. Automated checks performed: substring matching (case-insensitive) for text fields, counts for phases, module inclusion checks. If agent returns unstructured text, heuristics are used."
-        )
-
-        result_entry = {
-            "id": sid,
-            "status": "PASS" if is_valid else "FAIL",
-            "reason": reason,
-            "response_preview": _preview_response(resp),
-            "context_used": context_used,
-            "judge_prompt": judge_prompt
-        }
-        results.append(result_entry)
-        logger.info("[%s] %s : %s", result_entry["status"], sid, reason)
+            expected = sample.get("expected", {})
+            # run judge: validate_response now takes sample input as well
+            is_valid, reason = validate_response(resp, expected, sample)
+
+            judge_prompt = (
+                f"Judge this output for sample '{sid}'. Criteria:\n"
+                f"- user_profile keys: {list(expected.get('user_profile', {}).keys())}\n"
+                f"- roadmap expectations: {expected.get('roadmap')}\n"
+                f"- reasoning_summary required: {expected.get('reasoning_summary')}\n"
+                f"Return PASS/FAIL and reason. Automated checks performed: substring matching (case-insensitive) for text fields, counts for phases, module inclusion checks. If agent returns unstructured text, heuristics are used."
+            )
+
+            result_entry = {
+                "id": sid,
+                "status": "PASS" if is_valid else "FAIL",
+                "reason": reason,
+                "response_preview": _preview_response(resp),
+                "context_used": context_used,
+                "judge_prompt": judge_prompt
+            }
+            results.append(result_entry)
+            logger.info("[%s] %s : %s", result_entry["status"], sid, reason)
+    finally:
+        await _drop_sessions(agent, session_ids)
 
     # summary
     pass_count = sum(1 for r in results if r["status"] == "PASS")
@@ -0,0 +1,39 @@
+# Multi-worker deployment with the embedding model preloaded in the master.
+#
+#   gunicorn -c gunicorn.conf.py src.api:app
+#
+# The master loads the model once (src.preload) and forks workers that share
+# its pages copy-on-write. Chroma and Gemini clients are opened per worker.
+# With several workers and prometheus_client installed, metrics go through its
+# multiprocess mode so /metrics aggregates every worker (src/metrics.py).
+import importlib.util
+import os
+import shutil
+
+from src.config import settings
+
+bind = f"{settings.app_host}:{settings.app_port}"
+workers = settings.app_workers
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+# must be set before the app (and prometheus_client) is imported, i.e. before preloading
+# (prometheus_client picks its value storage at import time, so only look it up here)
+if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR") and importlib.util.find_spec("prometheus_client"):
+    # samples of a previous run would be summed into this one
+    shutil.rmtree(settings.prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(settings.prometheus_multiproc_dir, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = settings.prometheus_multiproc_dir
+
+
+def on_starting(server):
+    if settings.preload_models:
+        from src.preload import preload_shared_resources
+        preload_shared_resources()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
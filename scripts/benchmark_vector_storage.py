@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Measure recall and latency of reduced-dimension / reduced-precision vector layouts.
+
+Embeds a corpus (the knowledge base documents, or a text file with one document
+per line), takes exact float32 nearest neighbours as ground truth, and for every
+layout reports recall@k of the reduced first pass alone and after re-scoring the
+top k * multiplier candidates against the stored full vectors, the per-query
+latency of both steps, and the bytes per vector in the index and the full-vector
+store. The first pass is an exact search in the reduced space, so the numbers
+show the cost of the layout itself, not of Chroma's approximate HNSW search.
+
+Usage:
+    python scripts/benchmark_vector_storage.py
+    python scripts/benchmark_vector_storage.py --corpus docs.txt --dims 64 128 192 --dtypes float16 int8 --k 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Ensure project root on sys.path so src imports work
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import settings
+from src.embeddings import PARITY_TEXTS, load_embedding_backend
+from src.resources import registry
+from src.vector_storage import Reducer, dequantize, quantize
+
+
+def load_corpus(path):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts, []
+    collection = registry.get_chroma_client().get_collection("asdsadf_knowledge")
+    result = collection.get(include=["documents", "metadatas"])
+    titles = [meta.get("title") for meta in result["metadatas"] or [] if meta and meta.get("title")]
+    return result["documents"] or [], titles
+
+
+def top_k(scores, k):
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    rows = np.arange(len(scores))[:, None]
+    return part[rows, np.argsort(-scores[rows, part], axis=1)]
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def evaluate(corpus, queries, truth, dim, reduction, dtype, k, multiplier):
+    reducer = Reducer(dim, reduction).fit(corpus)
+    index = reducer.transform(corpus)
+    codes, scales = quantize(corpus, dtype)
+    full = dequantize(codes, scales)
+
+    first_ms, rescore_ms, first_found, rescored_found = [], [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        candidates = top_k((index @ reducer.transform(query))[None, :], k * multiplier)[0]
+        first_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        exact = full[candidates] @ query
+        rescored = candidates[np.argsort(-exact)[:k]]
+        rescore_ms.append((time.perf_counter() - start) * 1000)
+        first_found.append(candidates[:k])
+        rescored_found.append(rescored)
+
+    return {
+        "layout": f"{reduction}-{dim}/{dtype}",
+        "recall_first": recall(first_found, truth),
+        "recall_rescored": recall(rescored_found, truth),
+        "first_ms": statistics.median(first_ms),
+        "rescore_ms": statistics.median(rescore_ms),
+        "index_bytes": dim * 4,
+        "store_bytes": codes.shape[1] * codes.itemsize,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="text file with one document per line (default: the knowledge base)")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 192])
+    parser.add_argument("--reductions", nargs="+", default=["truncate", "pca"], choices=["truncate", "pca"])
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"], choices=["float32", "float16", "int8"])
+    parser.add_argument("--k", type=int, default=settings.max_retrieval_results)
+    parser.add_argument("--multiplier", type=int, default=settings.vector_rescore_multiplier)
+    args = parser.parse_args()
+
+    texts, titles = load_corpus(args.corpus)
+    if len(texts) < 2:
+        sys.exit("Corpus is empty; populate the knowledge base or pass --corpus")
+    model = load_embedding_backend()
+    corpus = np.asarray(model.encode(texts, batch_size=64), dtype=np.float32)
+    queries = np.asarray(model.encode(titles + PARITY_TEXTS), dtype=np.float32)
+    truth = top_k(queries @ corpus.T, args.k)
+    full_dim = corpus.shape[1]
+
+    start = time.perf_counter()
+    for query in queries:
+        top_k((corpus @ query)[None, :], args.k)
+    baseline_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"{len(texts)} documents, {len(queries)} queries, {full_dim} dimensions, k={args.k}, multiplier={args.multiplier}")
+    print(f"{'layout':<24} {'recall':>7} {'rescored':>9} {'first ms':>9} {'rescore ms':>11} {'index B':>8} {'store B':>8}")
+    print(f"{'full-' + str(full_dim) + '/float32':<24} {1.0:>7.3f} {'-':>9} {baseline_ms:>9.3f} {'-':>11} {full_dim * 4:>8} {'-':>8}")
+    for reduction in args.reductions:
+        for dim in args.dims:
+            if dim >= full_dim:
+                continue
+            for dtype in args.dtypes:
+                row = evaluate(corpus, queries, truth, dim, reduction, dtype, args.k, args.multiplier)
+                print(
+                    f"{row['layout']:<24} {row['recall_first']:>7.3f} {row['recall_rescored']:>9.3f} "
+                    f"{row['first_ms']:>9.3f} {row['rescore_ms']:>11.3f} {row['index_bytes']:>8} {row['store_bytes']:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
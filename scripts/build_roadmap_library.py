@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Pre-generate and validate roadmaps for the common goal/level/hours buckets
+and write them into a versioned roadmap library served by ASDSADFAgent.
+
+Usage:
+    python scripts/build_roadmap_library.py --version v2
+    python scripts/build_roadmap_library.py --only frontend/beginner/8-15h --force
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+# Ensure project root on sys.path so src imports work
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.asdsadf_agent import ASDSADFAgent
+from src.config import settings
+from src.models import UserQuery
+from src.roadmap_library import RoadmapLibrary, all_buckets, bucket_prompt, validate_roadmap
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def build_library(version: str, only=None, force: bool = False, attempts: int = 2) -> int:
+    library = RoadmapLibrary(version=version)
+    library.load()
+
+    agent = ASDSADFAgent()
+    if not await agent.initialize():
+        logger.error("Agent initialization failed")
+        return 1
+    # initialize() only starts the Gemini probe; gemini_available stays True until it answers
+    if not await agent.check_gemini():
+        # Degraded-mode output is not worth freezing into the library
+        logger.error("Gemini is unavailable; refusing to build the roadmap library from local fallbacks")
+        return 1
+
+    keys = only or all_buckets()
+    unknown = [k for k in keys if k not in all_buckets()]
+    if unknown:
+        logger.error("Unknown bucket keys: %s (valid: %s)", unknown, all_buckets())
+        return 1
+    failed = []
+    for key in keys:
+        if key in library.buckets and not force:
+            logger.info("Skipping %s (already present; use --force to regenerate)", key)
+            continue
+
+        message, profile = bucket_prompt(key)
+        for attempt in range(1, attempts + 1):
+            result = await agent.process_query(UserQuery(message=message, user_profile=profile), use_library=False)
+            fallback = (result.metadata or {}).get("fallback")
+            if fallback:
+                # a local/degraded roadmap can pass validation but must not be frozen into the library
+                ok, reason = False, f"fallback response ({fallback})"
+            else:
+                ok, reason = validate_roadmap(result.response)
+            if ok:
+                library.put(key, result.response)
+                logger.info("Generated %s in %.1fs", key, result.processing_time)
+                break
+            logger.warning("Rejected %s (attempt %d/%d): %s", key, attempt, attempts, reason)
+        else:
+            failed.append(key)
+
+    library.save()
+    if failed:
+        logger.error("Failed buckets: %s", failed)
+        return 2
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed roadmap library")
+    parser.add_argument("--version", default=settings.roadmap_library_version, help="Library version to write")
+    parser.add_argument("--only", nargs="*", help="Bucket keys to (re)generate, e.g. frontend/beginner/8-15h")
+    parser.add_argument("--force", action="store_true", help="Regenerate buckets that already exist")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(build_library(args.version, only=args.only, force=args.force)))
+
+
+if __name__ == "__main__":
+    main()
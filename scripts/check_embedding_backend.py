@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Check an embedding backend against the torch reference for parity and speed.
+
+Loads the torch backend and the ONNX backend (fp32 and/or int8), compares
+their embeddings on a fixed text set, and times single-query encode latency
+and batch ingestion throughput.
+
+Usage:
+    python scripts/check_embedding_backend.py
+    python scripts/check_embedding_backend.py --variants onnx-int8 --batch-size 64 --tolerance 0.02
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Ensure project root on sys.path so src imports work
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import settings
+from src.embeddings import PARITY_TEXTS, OnnxBackend, TorchBackend, check_parity
+
+
+def time_backend(backend, queries: int, batch_size: int) -> dict:
+    backend.encode(PARITY_TEXTS)  # warm up
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        backend.encode(PARITY_TEXTS[i % len(PARITY_TEXTS)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    corpus = [f"{t} (variant {i})" for i in range(max(1, 512 // len(PARITY_TEXTS))) for t in PARITY_TEXTS]
+    start = time.perf_counter()
+    backend.encode(corpus, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+        "batch_docs_per_s": round(len(corpus) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.embedding_model)
+    parser.add_argument("--variants", nargs="+", default=["onnx", "onnx-int8"], choices=["onnx", "onnx-int8"])
+    parser.add_argument("--tolerance", type=float, default=settings.embedding_parity_tolerance)
+    parser.add_argument("--queries", type=int, default=200, help="single-query encodes to time")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    reference = TorchBackend.load(args.model)
+    rows = [("torch", {"passed": True, "min_cosine": 1.0}, time_backend(reference, args.queries, args.batch_size))]
+    for variant in args.variants:
+        try:
+            backend = OnnxBackend.load(args.model, quantize=variant == "onnx-int8")
+        except Exception as e:
+            print(f"{variant}: unavailable ({e})")
+            continue
+        parity = check_parity(backend, reference, tolerance=args.tolerance)
+        rows.append((backend.name, parity, time_backend(backend, args.queries, args.batch_size)))
+
+    base = rows[0][2]
+    print(f"{'backend':<18} {'parity':>7} {'min cos':>9} {'p50 ms':>8} {'p95 ms':>8} {'docs/s':>9} {'speedup':>8}")
+    failed = False
+    for name, parity, timing in rows:
+        failed = failed or not parity["passed"]
+        print(
+            f"{name:<18} {'ok' if parity['passed'] else 'FAIL':>7} {parity.get('min_cosine', float('nan')):>9.5f} "
+            f"{timing['query_p50_ms']:>8.2f} {timing['query_p95_ms']:>8.2f} {timing['batch_docs_per_s']:>9.1f} "
+            f"{base['query_p50_ms'] / timing['query_p50_ms']:>7.1f}x"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Export the knowledge base to a snapshot directory, or import one, without
+re-encoding any document (see src/snapshot.py for the format).
+
+Usage:
+    python scripts/kb_snapshot.py export ./snapshots/kb-2024-06-01
+    python scripts/kb_snapshot.py import ./snapshots/kb-2024-06-01 --replace
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+# Ensure project root on sys.path so src imports work
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.rag_system import RAGSystem
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def run(args) -> int:
+    rag = RAGSystem()
+    await rag.initialize()
+    try:
+        if args.command == "export":
+            manifest = await rag.export_snapshot(args.path, batch_size=args.batch_size)
+            print(json.dumps({k: v for k, v in manifest.items() if k != "files"}, indent=2))
+        else:
+            result = await rag.import_snapshot(args.path, replace=args.replace, force=args.force, batch_size=args.batch_size)
+            print(json.dumps(result, indent=2))
+    except (ValueError, FileNotFoundError) as e:
+        logger.error("Snapshot %s failed: %s", args.command, e)
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a knowledge-base snapshot")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot directory")
+    parser.add_argument("--replace", action="store_true", help="Import: drop the current collection first")
+    parser.add_argument("--force", action="store_true", help="Import: accept a snapshot from a different embedding model/backend")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per read/write batch")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Report per-process memory for a running server and its workers (Linux only).
+
+    python scripts/measure_worker_memory.py <master-pid>
+
+RSS counts shared pages in every process that maps them; PSS splits shared
+pages between the processes sharing them, so the PSS total is the real
+footprint. Private_Dirty is what each worker copied from the master.
+"""
+
+import sys
+from pathlib import Path
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_rollup(pid: int) -> dict:
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in FIELDS:
+            values[parts[0].rstrip(":")] = int(parts[1]) / 1024.0  # kB -> MiB
+    return values
+
+
+def children(pid: int) -> list:
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    return [int(c) for c in path.read_text().split()] if path.exists() else []
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    master = int(sys.argv[1])
+    pids = [master] + children(master)
+
+    print(f"{'pid':>8} {'role':>7} " + " ".join(f"{f:>14}" for f in FIELDS))
+    totals = dict.fromkeys(FIELDS, 0.0)
+    for pid in pids:
+        stats = read_rollup(pid)
+        for f in FIELDS:
+            totals[f] += stats.get(f, 0.0)
+        role = "master" if pid == master else "worker"
+        print(f"{pid:>8} {role:>7} " + " ".join(f"{stats.get(f, 0.0):>11.1f} MiB" for f in FIELDS))
+    print(f"{'total':>16} " + " ".join(f"{totals[f]:>11.1f} MiB" for f in FIELDS))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from pathlib import Path
 import json
 from typing import List
 
+from src.config import settings
 from src.rag_system import RAGSystem
 from src.models import KnowledgeDocument, DocumentType
 
@@ -306,9 +307,10 @@ class KnowledgeBasePopulator:
             )
             documents.append(doc)
         
-        # Add documents to knowledge base
+        # Upsert documents (unchanged ones are skipped, embeddings are cached by content hash)
         success_count = await self.rag_system.add_documents_batch(documents)
         logger.info(f"Successfully added {success_count}/{len(documents)} documents to knowledge base")
+        logger.info(f"Ingestion throughput: {self.rag_system.last_ingest_report}")
         
         # Get final stats
         stats = await self.rag_system.get_collection_stats()
@@ -316,10 +318,71 @@ class KnowledgeBasePopulator:
         
         return success_count
 
+    async def populate_from_jsonl(self, path: str, workers: int = 0, chunk_size: int = 50000) -> int:
+        """
+        Load documents from a JSONL file (one KnowledgeDocument object per line) in
+        chunks. With `workers`, embeddings are computed by that many worker
+        processes kept open for the whole file; this process does all writes.
+        """
+        await self.rag_system.initialize()
+        total = added = 0
+        
+        async def flush(chunk: List[KnowledgeDocument]) -> int:
+            count = await self.rag_system.add_documents_batch(chunk, workers=workers or None)
+            logger.info(f"Chunk: {count}/{len(chunk)} documents, {self.rag_system.last_ingest_report}")
+            return count
+        
+        async def load() -> None:
+            nonlocal total, added
+            chunk: List[KnowledgeDocument] = []
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    chunk.append(KnowledgeDocument(**json.loads(line)))
+                    if len(chunk) == chunk_size:
+                        total += len(chunk)
+                        added += await flush(chunk)
+                        chunk = []
+            if chunk:
+                total += len(chunk)
+                added += await flush(chunk)
+        
+        if workers > 1:
+            async with self.rag_system.embedding_workers(workers):
+                await load()
+        else:
+            await load()
+        logger.info(f"Successfully added {added}/{total} documents from {path}")
+        await self.refit_projection()
+        return added
+
+    async def refit_projection(self) -> int:
+        """Fit the PCA projection of a reduced collection on everything loaded and re-index (no-op otherwise)."""
+        await self.rag_system.initialize()
+        reindexed = await self.rag_system.refit_reduction()
+        if reindexed:
+            logger.info(f"Re-indexed {reindexed} documents with the refitted PCA projection")
+        return reindexed
+
 async def main():
     """Main function to populate knowledge base."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Populate the knowledge base")
+    parser.add_argument("--file", help="JSONL file of documents to load instead of the built-in samples")
+    parser.add_argument("--workers", type=int, default=settings.embedding_workers, help="Embedding worker processes (0 or 1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Documents read per add_documents_batch call")
+    parser.add_argument("--refit-projection", action="store_true", help="Only refit the PCA projection (VECTOR_REDUCTION=pca) and re-index")
+    args = parser.parse_args()
+    
     populator = KnowledgeBasePopulator()
-    await populator.populate_sample_data()
+    if args.refit_projection:
+        await populator.refit_projection()
+    elif args.file:
+        await populator.populate_from_jsonl(args.file, workers=args.workers, chunk_size=args.chunk_size)
+    else:
+        await populator.populate_sample_data()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
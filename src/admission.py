@@ -0,0 +1,122 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from src.config import settings
+from src.metrics import metrics
+
+ADMISSION_WAIT_SECONDS = metrics.histogram("asdsadf_admission_wait_seconds", "Time admitted /chat requests waited for a slot")
+ADMISSION_REJECTED = metrics.counter("asdsadf_admission_rejected_total", "Requests shed by admission control", ["reason"])
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued; `retry_after` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue.
+
+    At most `max_concurrent` requests run at once; up to `max_queue` more wait for
+    a slot (at most `queue_timeout` seconds). Anything beyond that is rejected
+    immediately, so admitted requests keep predictable latency instead of all
+    timing out together. With `per_client_limit`, one client can hold at most that
+    many running + waiting requests.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        per_client_limit: Optional[int] = None,
+    ):
+        self.max_concurrent = max_concurrent or settings.admission_max_concurrent
+        self.max_queue = max_queue if max_queue is not None else settings.admission_max_queue
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.admission_queue_timeout_seconds
+        self.per_client_limit = per_client_limit if per_client_limit is not None else settings.admission_per_client_limit
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._per_client: Dict[str, int] = {}
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "client_limit": 0, "queue_timeout": 0}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # moving average of service time, used for Retry-After
+        self._service_seconds = 1.0
+
+    def retry_after(self) -> int:
+        """Rough time until a queued request would be admitted."""
+        backlog = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(backlog * self._service_seconds))
+
+    @asynccontextmanager
+    async def slot(self, client_id: str = "anonymous") -> AsyncIterator[float]:
+        """Hold a concurrency slot for the body of the `async with`; yields the queue wait in seconds."""
+        if self.per_client_limit and self._per_client.get(client_id, 0) >= self.per_client_limit:
+            self.rejected["client_limit"] += 1
+            ADMISSION_REJECTED.inc(reason="client_limit")
+            raise AdmissionRejected("Too many concurrent requests from this client", self.retry_after())
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            ADMISSION_REJECTED.inc(reason="queue_full")
+            raise AdmissionRejected("Server is busy", self.retry_after())
+
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+        try:
+            start = time.perf_counter()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected["queue_timeout"] += 1
+                ADMISSION_REJECTED.inc(reason="queue_timeout")
+                raise AdmissionRejected("Timed out waiting for capacity", self.retry_after())
+            finally:
+                self.waiting -= 1
+
+            waited = time.perf_counter() - start
+            self.admitted += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            ADMISSION_WAIT_SECONDS.observe(waited)
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                yield waited
+            finally:
+                self.in_flight -= 1
+                self._semaphore.release()
+                self._service_seconds = 0.9 * self._service_seconds + 0.1 * (time.perf_counter() - started)
+        finally:
+            remaining = self._per_client[client_id] - 1
+            if remaining:
+                self._per_client[client_id] = remaining
+            else:
+                del self._per_client[client_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.admitted, 4) if self.admitted else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+            "service_seconds_avg": round(self._service_seconds, 4),
+            "clients": len(self._per_client),
+        }
+
+
+admission = AdmissionController()
@@ -1,16 +1,33 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+import time
+
+_MODULE_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import asyncio
 import json
+import shutil
 import uuid
+from pathlib import Path
 
 from src.asdsadf_agent import ASDSADFAgent
-from src.models import UserQuery, QueryResponse, SystemHealth
+from src.models import UserQuery, QueryResponse, SystemHealth, BatchQueryRequest, BatchItemResult
 from src.config import settings
+from src.ingestion import UploadRejected, jobs as ingestion_jobs, receive_upload, run_upload_job, shutdown_parse_pool
+from src.vector_store import BlockingDetector, shutdown_vector_executor
+from src.ingest_queue import IngestQueue
+from src.admission import AdmissionRejected, admission
+from src.health import HealthMonitor
+from src.metrics import metrics
+from src.timing import StageTimer, configure_tracing, stage, timed_request
+from src.resources import registry
+
+MODULE_IMPORT_MS = round((time.perf_counter() - _MODULE_IMPORT_STARTED) * 1000, 2)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,35 +50,133 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class StreamAwareCompression:
+    """
+    Wraps a compression middleware but bypasses it for streamed (NDJSON) requests:
+    compressors buffer small writes, which would hold back streamed results.
+    """
+
+    def __init__(self, app, compressor, **options):
+        self.app = app
+        self.compressed = compressor(app, **options)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self._is_streaming(scope):
+            await self.compressed(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    @staticmethod
+    def _is_streaming(scope) -> bool:
+        accept = dict(scope.get("headers") or []).get(b"accept", b"")
+        return b"stream=true" in scope.get("query_string", b"") or b"application/x-ndjson" in accept
+
+
+# Response compression, negotiated through Accept-Encoding. brotli-asgi (optional)
+# serves br and falls back to gzip; without it, gzip only.
+if settings.response_compression:
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(StreamAwareCompression, compressor=BrotliMiddleware, minimum_size=settings.compression_min_bytes, gzip_fallback=True)
+    except ImportError:
+        app.add_middleware(StreamAwareCompression, compressor=GZipMiddleware, minimum_size=settings.compression_min_bytes)
+
+# orjson serializes the large nested roadmap dicts several times faster than stdlib json
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+# Cached health snapshot served to probes; refreshed in the background once the agent exists
+health_monitor = HealthMonitor(None, version=app.version)
+
+# Gauges read at scrape time from the components that already track them
+metrics.gauge("asdsadf_admission_in_flight", "/chat requests holding an admission slot", callback=lambda: {(): admission.in_flight})
+metrics.gauge("asdsadf_admission_queue_depth", "/chat requests waiting for an admission slot", callback=lambda: {(): admission.waiting})
+metrics.gauge(
+    "asdsadf_ingest_queue_buffered",
+    "Documents accepted by /knowledge/add and not yet written",
+    callback=lambda: {(): len(app.state.ingest_queue)} if getattr(app.state, "ingest_queue", None) else {},
+)
+metrics.gauge(
+    "asdsadf_knowledge_base_documents",
+    "Documents in the knowledge base (from the health snapshot)",
+    callback=lambda: {(): health_monitor.snapshot.knowledge_base_stats.get("document_count", 0)},
+)
+metrics.gauge("asdsadf_active_sessions", "Sessions with conversation memory", callback=lambda: {(): health_monitor.snapshot.active_sessions or 0})
+metrics.gauge("asdsadf_gemini_available", "1 when Gemini is in use, 0 in degraded mode", callback=lambda: {(): int(health_monitor.snapshot.gemini_api_available)})
+
 # Global agent instance
 agent: ASDSADFAgent = None
 
+# References to fire-and-forget tasks (ingestion jobs) so they are not garbage collected
+_background_tasks: set = set()
+
+
+def _spawn_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the agent on application startup."""
+    """
+    Return immediately so the port is bound; the agent (embedding model, Chroma,
+    Gemini client) is created and warmed up in the background. /chat answers 503
+    and /health/ready reports not ready until that finishes.
+    """
+    configure_tracing()
+    app.state.agent = None
+    if settings.debug:
+        app.state.blocking_detector = BlockingDetector()
+        app.state.blocking_detector.start()
+    _spawn_background(_warm_up())
+
+
+async def _warm_up():
     global agent
-    try:
-        logger.info("Initializing ASDSADF Agent...")
-        agent = ASDSADFAgent()
-        # Expose agent on app.state so request handlers can reliably access it
-        app.state.agent = agent
-
-        # Initialize agent in background to avoid blocking startup
-        initialization_success = await agent.initialize()
-
-        if initialization_success:
-            logger.info("ASDSADF Agent initialized successfully")
-            # Ensure the app.state reference is the initialized instance
-            app.state.agent = agent
-        else:
-            logger.error("Failed to initialize ASDSADF Agent")
-            # Mark absent so endpoints can respond appropriately
+    with timed_request("startup") as timer:
+        try:
+            logger.info("Initializing ASDSADF Agent...")
+            with stage("agent_construct"):
+                candidate = ASDSADFAgent()
+            agent = candidate
+            # Expose agent on app.state right away; handlers check agent.initialized
+            app.state.agent = candidate
+            health_monitor.agent = candidate
+            health_monitor.start()
+
+            if await candidate.initialize():
+                logger.info("ASDSADF Agent initialized successfully")
+                with stage("ingest_queue"):
+                    app.state.ingest_queue = IngestQueue(candidate.rag)
+                    await app.state.ingest_queue.start()
+            else:
+                logger.error("Failed to initialize ASDSADF Agent")
+                # Mark absent so endpoints can respond appropriately
+                app.state.agent = None
+
+        except Exception as e:
+            logger.error(f"Error during startup: {e}")
+            # Ensure state is consistent on error
             app.state.agent = None
 
-    except Exception as e:
-        logger.error(f"Error during startup: {e}")
-        # Ensure state is consistent on error
-        app.state.agent = None
+    app.state.startup_timer = timer
+    app.state.ready_after_ms = timer.to_dict()["total"]
+    logger.info("Startup report: %s", _startup_report())
+    await health_monitor.refresh()
+
+
+def _startup_report() -> Dict[str, Any]:
+    timer = getattr(app.state, "startup_timer", None)
+    return {
+        "module_import_ms": MODULE_IMPORT_MS,
+        "ready_after_ms": getattr(app.state, "ready_after_ms", None),
+        # gemini_check finishes in the background and may land after ready_after_ms
+        "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in timer.stages.items()} if timer else {},
+        "resource_load_seconds": {name: round(seconds, 3) for name, seconds in registry.load_times.items()},
+    }
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -78,6 +193,17 @@ async def shutdown_event():
                         await maybe_coro
                 except Exception as e:
                     logger.debug("Agent.shutdown() raised: %s", e)
+        await health_monitor.stop()
+        queue = getattr(app.state, "ingest_queue", None)
+        if queue:
+            # flush buffered documents before the agent's clients go away
+            await queue.stop()
+            app.state.ingest_queue = None
+        shutdown_parse_pool()
+        detector = getattr(app.state, "blocking_detector", None)
+        if detector:
+            await detector.stop()
+        shutdown_vector_executor()
         # Remove agent from state
         app.state.agent = None
     except Exception as e:
@@ -107,8 +233,10 @@ async def chat_endpoint(request: Request, payload: UserQuery):
     """
     Robust /chat endpoint wrapper.
     Returns:
-      - 200 + {"success": True, "data": ..., "context": [...]} on success
+      - 200 + {"success": True, "data": ..., "sources": [...]} on success; "context" is
+        added with include_context=true, and source_format selects names, ids or none
       - 503 + {"success": False, "error": "..."} if agent not initialized
+      - 429 + Retry-After when the admission queue is full (or the client is over its share)
       - 200 + {"success": False, "error": "..."} on processing exceptions (keeps frontend from showing 'undefined')
     """
     agent = getattr(request.app.state, "agent", None)
@@ -121,69 +249,244 @@ async def chat_endpoint(request: Request, payload: UserQuery):
         return JSONResponse(status_code=503, content={"success": False, "error": "Agent not initialized. Try again shortly."})
 
     try:
-        result = await agent.process_query(payload)
-        # result may be a QueryResponse dataclass-like object
-        # Normalize to plain dicts so frontend parsing is easy
-        resp_content = None
-        context_used = []
-        retrieval_sources = []
-        processing_time = None
-
-        if hasattr(result, "response"):
-            resp_content = result.response
-        else:
-            resp_content = result
-
-        if hasattr(result, "context_used"):
-            context_used = result.context_used or []
-        if hasattr(result, "retrieval_sources"):
-            retrieval_sources = result.retrieval_sources or []
-        if hasattr(result, "processing_time"):
-            processing_time = result.processing_time
-
-        # Ensure JSON-serializable values (fast-path; if non-serializable, fallback to string)
-        try:
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "data": resp_content,
-                    "context": context_used,
-                    "sources": retrieval_sources,
-                    "processing_time": processing_time,
-                },
-            )
-        except TypeError:
-            # Fallback: stringify the data to avoid frontend undefined errors
-            logger.exception("Non-serializable response payload, stringifying.")
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "data": str(resp_content),
-                    "context": context_used,
-                    "sources": retrieval_sources,
-                    "processing_time": processing_time,
-                },
-            )
-
+        async with admission.slot(_client_id(request)):
+            result = await agent.process_query(payload)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"success": False, "error": e.reason, "retry_after": e.retry_after},
+        )
     except Exception as e:
         logger.exception("Unhandled error in /chat: %s", e)
         # Return 200 with success False to ensure frontend receives a predictable JSON body
         return JSONResponse(status_code=200, content={"success": False, "error": str(e)})
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    if not agent:
+    content = _chat_payload(result, payload)
+    timings = (getattr(result, "metadata", None) or {}).get("timings")
+    headers = {"Server-Timing": StageTimer.server_timing(timings)} if timings else None
+    try:
+        return FastJSONResponse(status_code=200, content=content, headers=headers)
+    except TypeError:
+        # Fallback: stringify the data to avoid frontend undefined errors
+        logger.exception("Non-serializable response payload, stringifying.")
+        content["data"] = str(content["data"])
+        return JSONResponse(status_code=200, content=content, headers=headers)
+
+def _client_id(request: Request) -> str:
+    """Client key for fair-share admission: explicit X-Client-Id header, else the peer address."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "anonymous")
+
+
+def _project_sources(result: QueryResponse, source_format: str) -> List[str]:
+    if source_format == "ids":
+        return result.retrieval_ids
+    if source_format == "none":
+        return []
+    return result.retrieval_sources
+
+
+def _chat_payload(result: Any, query: UserQuery) -> Dict[str, Any]:
+    """
+    Shape a QueryResponse for the wire. The joined retrieval context is several KB
+    and is only included on request (include_context); sources can be reduced to
+    document ids or omitted (source_format).
+    """
+    if not isinstance(result, QueryResponse):
+        return {"success": True, "data": result}
+    content: Dict[str, Any] = {
+        "success": True,
+        "data": result.response,
+        "sources": _project_sources(result, query.source_format),
+        "processing_time": result.processing_time,
+    }
+    if query.include_context:
+        content["context"] = result.context_used
+    return content
+
+
+def _batch_item(index: int, result: Any, query: UserQuery) -> BatchItemResult:
+    if isinstance(result, AdmissionRejected):
+        return BatchItemResult(index=index, success=False, error=f"{result.reason}; retry after {result.retry_after}s")
+    if isinstance(result, Exception):
+        return BatchItemResult(index=index, success=False, error=str(result) or type(result).__name__)
+    data = result.response if isinstance(result.response, dict) else {"text": str(result.response)}
+    return BatchItemResult(
+        index=index,
+        success=True,
+        data=data,
+        sources=_project_sources(result, query.source_format),
+        processing_time=result.processing_time,
+        session_id=result.session_id,
+    )
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: Request, payload: BatchQueryRequest, stream: bool = False):
+    """
+    Process many queries in one request with shared retrieval and bounded concurrency.
+    Returns {"success": True, "results": [...]} in input order, or, with ?stream=true
+    (or Accept: application/x-ndjson), one JSON result per line as items finish.
+    Failures are reported per item and do not fail the batch. Every item takes an
+    admission slot like a /chat request; items shed by admission control fail
+    individually, and a batch in which every item was shed returns 429 + Retry-After.
+    """
+    agent = getattr(request.app.state, "agent", None)
+    if agent is None or not getattr(agent, "initialized", False):
+        return JSONResponse(status_code=503, content={"success": False, "error": "Agent not initialized. Try again shortly."})
+    if not payload.queries:
+        return JSONResponse(status_code=200, content={"success": True, "results": []})
+    if len(payload.queries) > settings.batch_max_items:
+        return JSONResponse(status_code=413, content={"success": False, "error": f"Batch too large; at most {settings.batch_max_items} queries per request."})
+
+    client_id = _client_id(request)
+    max_concurrency = payload.max_concurrency or settings.batch_max_concurrency
+    if admission.per_client_limit:
+        # more concurrent items than the client's share would only be rejected
+        max_concurrency = min(max_concurrency, admission.per_client_limit)
+    items = agent.iter_batch(payload.queries, max_concurrency=max_concurrency, admit=lambda: admission.slot(client_id))
+
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def ndjson():
+            async for index, result in items:
+                yield _batch_item(index, result, payload.queries[index]).json() + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results: List[Optional[BatchItemResult]] = [None] * len(payload.queries)
+    rejected: List[AdmissionRejected] = []
+    async for index, result in items:
+        if isinstance(result, AdmissionRejected):
+            rejected.append(result)
+        results[index] = _batch_item(index, result, payload.queries[index])
+    if len(rejected) == len(results):
+        retry_after = max(e.retry_after for e in rejected)
         return JSONResponse(
-            status_code=503,
-            content={"status": "unhealthy", "message": "Agent not initialized"}
+            status_code=429,
+            headers={"Retry-After": str(retry_after)},
+            content={"success": False, "error": rejected[0].reason, "retry_after": retry_after},
         )
-    
-    health_status = await agent.get_health_status()
-    status_code = 200 if health_status["status"] == "healthy" else 503
-    return JSONResponse(status_code=status_code, content=health_status)
+    return FastJSONResponse(status_code=200, content={"success": True, "results": [r.dict() for r in results]})
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of pipeline metrics (all workers in multiprocess mode, see src/metrics.py)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/admission")
+async def admission_stats():
+    """Admission control state: running requests, queue depth, wait times and rejections."""
+    return JSONResponse(content=admission.stats())
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Chat over one WebSocket connection bound to one session.
+
+    Client messages: {"type": "chat", "message", "prompt_type"?, "user_profile"?, "request_id"?},
+    {"type": "cancel"}, {"type": "ping"}. Server messages: "session", "start", "delta"
+    (raw generated text as it streams), "final" (same payload as /chat), "cancelled",
+    "error" and "pong". A new chat message cancels the generation in flight. Outgoing
+    messages go through a small bounded queue, so a slow reader slows generation down
+    instead of growing server memory.
+    """
+    await websocket.accept()
+    session_id = session_id or uuid.uuid4().hex
+    client_id = websocket.headers.get("x-client-id") or (websocket.client.host if websocket.client else "anonymous")
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_send_queue_size)
+    current: Optional[asyncio.Task] = None
+    current_id: Optional[str] = None
+
+    async def sender():
+        while True:
+            await websocket.send_text(json.dumps(await outbox.get(), default=str))
+
+    async def answer(request_id: str, query: UserQuery):
+        agent = getattr(websocket.app.state, "agent", None)
+        if agent is None or not getattr(agent, "initialized", False):
+            await outbox.put({"type": "error", "request_id": request_id, "error": "Agent not initialized. Try again shortly."})
+            return
+
+        async def on_delta(text: str):
+            await outbox.put({"type": "delta", "request_id": request_id, "text": text})
+
+        try:
+            async with admission.slot(client_id):
+                await outbox.put({"type": "start", "request_id": request_id})
+                result = await agent.process_query(query, on_delta=on_delta)
+            await outbox.put({"type": "final", "request_id": request_id, **_chat_payload(result, query)})
+        except AdmissionRejected as e:
+            await outbox.put({"type": "error", "request_id": request_id, "error": e.reason, "retry_after": e.retry_after})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Unhandled error in /ws/chat: %s", e)
+            await outbox.put({"type": "error", "request_id": request_id, "error": str(e)})
+
+    async def cancel_current():
+        nonlocal current
+        if current is not None and not current.done():
+            current.cancel()
+            try:
+                await current
+            except asyncio.CancelledError:
+                pass
+            await outbox.put({"type": "cancelled", "request_id": current_id})
+        current = None
+
+    send_task = asyncio.create_task(sender())
+    try:
+        await outbox.put({"type": "session", "session_id": session_id})
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await outbox.put({"type": "error", "error": "Messages must be JSON"})
+                continue
+            kind = message.get("type", "chat") if isinstance(message, dict) else None
+
+            if kind == "ping":
+                await outbox.put({"type": "pong"})
+            elif kind == "cancel":
+                await cancel_current()
+            elif kind == "chat":
+                await cancel_current()
+                current_id = str(message.get("request_id") or uuid.uuid4().hex)
+                try:
+                    query = UserQuery(**{k: v for k, v in message.items() if k not in ("type", "request_id", "session_id")}, session_id=session_id)
+                except Exception as e:
+                    await outbox.put({"type": "error", "request_id": current_id, "error": f"Invalid message: {e}"})
+                    continue
+                current = asyncio.create_task(answer(current_id, query))
+            else:
+                await outbox.put({"type": "error", "error": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if current is not None:
+            current.cancel()
+        send_task.cancel()
+
+@app.get("/health")
+async def health_check():
+    """Health snapshot (refreshed every few seconds in the background; never calls Gemini)."""
+    status_code = 200 if health_monitor.snapshot.status == "healthy" else 503
+    return JSONResponse(status_code=status_code, content=health_monitor.to_dict())
+
+@app.get("/health/startup")
+async def startup_report():
+    """How long start-up took, per phase (module import, agent construction, model load, warm-up)."""
+    return JSONResponse(content=_startup_report())
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the event loop is serving requests."""
+    return JSONResponse(content={"status": "alive"})
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: agent initialized and knowledge base reachable, per the cached snapshot."""
+    if health_monitor.ready:
+        return JSONResponse(content={"status": "ready"})
+    return JSONResponse(status_code=503, content={"status": "not ready", "detail": health_monitor.snapshot.status})
 
 @app.get("/session/{session_id}")
 async def get_session_info(session_id: str):
@@ -194,31 +497,84 @@ async def get_session_info(session_id: str):
     session_info = agent.get_session_info(session_id)
     return JSONResponse(content=session_info)
 
-@app.post("/knowledge/upload")
-async def upload_knowledge(background_tasks: BackgroundTasks):
-    """Upload knowledge documents to the RAG system."""
-    if not agent or not agent.rag_system:
+@app.post(
+    "/knowledge/upload",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+            }}},
+        }
+    },
+)
+async def upload_knowledge(request: Request):
+    """
+    Upload Markdown, HTML, plain-text or JSONL files (multipart `files` parts) into the knowledge base.
+
+    The multipart body is parsed as it arrives and each file is written straight
+    to the job's upload directory; a body over INGEST_MAX_UPLOAD_BYTES is refused
+    with 413 as soon as the limit is crossed. Files are then parsed, chunked and
+    embedded in a background job. Returns 202 with a job id; poll
+    /knowledge/jobs/{job_id} for progress.
+    """
+    agent = getattr(request.app.state, "agent", None)
+    if agent is None or not getattr(agent, "initialized", False):
         raise HTTPException(status_code=503, detail="RAG system not available")
-    
-    # This would typically handle file uploads
-    # For now, return a placeholder response
-    return JSONResponse(content={
-        "message": "Knowledge upload endpoint - implementation depends on your data sources",
-        "status": "ready"
-    })
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > settings.ingest_max_upload_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.ingest_max_upload_bytes} bytes")
+
+    job = ingestion_jobs.create("upload")
+    upload_dir = Path(settings.ingest_upload_dir) / job.id
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        saved = await receive_upload(request.stream(), request.headers.get("content-type", ""), job, upload_dir, settings.ingest_max_upload_bytes)
+    except Exception as e:
+        # size limit, bad type, client disconnect or disk error: never leave the job "running" or files behind
+        job.add_error(str(e) if isinstance(e, UploadRejected) else f"Upload failed: {e}")
+        job.finish("failed")
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        if isinstance(e, UploadRejected):
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        raise
+
+    _spawn_background(_run_upload(job, agent.rag, saved, upload_dir))
+    return JSONResponse(status_code=202, content={"job_id": job.id, "status_url": f"/knowledge/jobs/{job.id}", **job.to_dict()})
+
+
+async def _run_upload(job, rag, saved, upload_dir: Path):
+    try:
+        await run_upload_job(job, rag, saved)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+@app.get("/knowledge/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Progress of an upload or ingest job."""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job.to_dict())
 
 @app.get("/knowledge/stats")
-async def get_knowledge_stats():
+async def get_knowledge_stats(request: Request):
     """Get statistics about the knowledge base."""
-    if not agent or not agent.rag_system:
+    agent = getattr(request.app.state, "agent", None)
+    if agent is None or not getattr(agent, "initialized", False):
         raise HTTPException(status_code=503, detail="RAG system not available")
     
-    stats = await agent.rag_system.get_collection_stats()
+    stats = await agent.rag.get_collection_stats()
     return JSONResponse(content=stats)
 
 @app.post("/evaluate")
-async def run_evaluation():
-    """Run the evaluation pipeline."""
+async def run_evaluation(request: Request):
+    """Run the evaluation pipeline against the running agent (shares its model and clients)."""
+    agent = getattr(request.app.state, "agent", None)
+    if agent is None or not getattr(agent, "initialized", False):
+        raise HTTPException(status_code=503, detail="Agent not initialized")
     try:
         from evaluation.run_evaluation import run_evaluation_pipeline
         await run_evaluation_pipeline(agent)
@@ -227,17 +583,47 @@ async def run_evaluation():
         logger.error(f"Evaluation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Evaluation failed: {str(e)}")
 
-@app.post("/knowledge/add")
-async def add_knowledge(data: dict, background_tasks: BackgroundTasks):
-    if not agent:
+@app.post("/knowledge/add", status_code=202)
+async def add_knowledge(request: Request):
+    """
+    Queue documents for ingestion. Accepts a single document, a list of documents,
+    or {"documents": [...]}; each is { "title", "content", "source", "document_type", "metadata", "id" }.
+    Documents are micro-batched with other pending writes; poll the returned job for completion.
+    """
+    from src.models import KnowledgeDocument
+
+    queue = getattr(request.app.state, "ingest_queue", None)
+    if queue is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
-    # expects { "title": "...", "content": "...", "source": "...", "document_type": "..." }
-    doc = data
-    background_tasks.add_task(_background_add, doc)
-    return {"message": "Adding document in background"}
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
 
+    if isinstance(data, dict) and "documents" in data:
+        data = data["documents"]
+    items = data if isinstance(data, list) else [data]
+    if not items:
+        raise HTTPException(status_code=400, detail="No documents provided")
 
-async def _background_add(doc: dict):
-    from src.models import KnowledgeDocument
-    kd = KnowledgeDocument(id=doc.get("id") or str(uuid.uuid4()), title=doc["title"], content=doc["content"], source=doc.get("source","unknown"), document_type=doc.get("document_type","documentation"), metadata=doc.get("metadata",{}))
-    await agent.rag.add_document(kd)
\ No newline at end of file
+    documents = []
+    for i, doc in enumerate(items):
+        try:
+            documents.append(KnowledgeDocument(
+                id=doc.get("id") or str(uuid.uuid4()),
+                title=doc["title"],
+                content=doc["content"],
+                source=doc.get("source", "unknown"),
+                document_type=doc.get("document_type", "documentation"),
+                metadata=doc.get("metadata", {}),
+            ))
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid document at index {i}: {e}")
+
+    job = await queue.submit(documents)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "documents": len(documents),
+        "status_url": f"/knowledge/jobs/{job.id}",
+    }
\ No newline at end of file
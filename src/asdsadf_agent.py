@@ -1,11 +1,20 @@
 import time
+import json
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncContextManager, AsyncIterator, Awaitable, Callable, Tuple, Union
 
 from src.gemini_client import GeminiClient
 from src.rag_system import RAGSystem
 from src.models import UserQuery, QueryResponse
 from src.config import settings
+from src.roadmap_library import RoadmapLibrary, bucket_for
+from src.local_roadmap import KnowledgeGraph, LocalRoadmapGenerator
+from src.deadline import Deadline, DeadlineExceeded, resolve_timeout
+from src.conversation_memory import ConversationMemoryStore, local_summary
+from src.resources import registry
+from src.timing import stage, timed_request
+from src.metrics import CACHE_REQUESTS, CONTEXT_CHARS, DEADLINE_MISSES, FALLBACKS, REQUEST_SECONDS, REQUESTS_IN_FLIGHT
 
 logger = logging.getLogger(__name__)
 
@@ -30,17 +39,27 @@ class ASDSADFAgent:
         # Track whether Gemini is usable; if false we use local fallbacks
         self.gemini_available: bool = True
         self.user_sessions: Dict[str, Dict[str, Any]] = {}
+        self.roadmap_library: Optional[RoadmapLibrary] = RoadmapLibrary() if settings.roadmap_library_enabled else None
+        self.local_roadmap = LocalRoadmapGenerator()
+        # single in-flight rebuild of the local roadmap graph (see _refresh_local_graph)
+        self._graph_rebuild: Optional[asyncio.Task] = None
+        # stage -> number of requests that overran that stage's deadline
+        self.deadline_misses: Dict[str, int] = {}
+        self.memory = ConversationMemoryStore(summarizer=self._summarize_history)
+        # Keep references to fire-and-forget tasks so they are not garbage collected mid-flight
+        self._background_tasks: set = set()
         self.initialized = False
 
     async def initialize(self) -> bool:
         """
-        Initialize RAG and test Gemini. If Gemini test fails (quota/network),
+        Initialize and warm up RAG, then test Gemini in the background. If Gemini test fails (quota/network),
         start in degraded mode: RAG works and local fallbacks are used instead
         of Gemini. This avoids the server returning 500 "Agent not initialized".
         """
         # Initialize RAG system
         try:
-            await self.rag.initialize()
+            with stage("rag_initialize"):
+                await self.rag.initialize()
             logger.info("RAG system initialized")
         except Exception as e:
             logger.error("Failed to initialize RAG system: %s", e)
@@ -57,9 +76,36 @@ class ASDSADFAgent:
                     logger.error("Failed to construct GeminiClient: %s", e)
                     self.gemini = None
 
-        # Test Gemini availability
         try:
-            ok = await self._test_gemini()
+            with stage("warm_up"):
+                await self.rag.warm_up()
+        except Exception as e:
+            logger.warning("Warm-up failed (first request will be slower): %s", e)
+
+        if self.roadmap_library is not None:
+            with stage("roadmap_library"):
+                await asyncio.to_thread(self.roadmap_library.load)
+
+        # Mark agent initialized regardless of Gemini status so API doesn't return 500.
+        # The Gemini round trip runs in the background; until it answers, requests try
+        # Gemini and fall back locally on error.
+        self.initialized = True
+        self._spawn(self._check_gemini())
+        return True
+
+    async def check_gemini(self) -> bool:
+        """Probe Gemini now (initialize() only starts the probe in the background); returns availability."""
+        await self._check_gemini()
+        return self.gemini_available
+
+    async def _check_gemini(self) -> None:
+        """Test Gemini availability; on failure enter degraded mode (local fallbacks)."""
+        try:
+            if hasattr(self.gemini, "warm_up"):
+                with stage("gemini_model"):
+                    await self.gemini.warm_up()
+            with stage("gemini_check"):
+                ok = await self._test_gemini()
             self.gemini_available = bool(ok)
             if not ok:
                 logger.warning("Gemini API connection failed; entering degraded/local-fallback mode.")
@@ -70,10 +116,6 @@ class ASDSADFAgent:
             self.gemini_available = False
             logger.warning("Entering degraded/local-fallback mode due to Gemini test error.")
 
-        # Mark agent initialized regardless of Gemini status so API doesn't return 500
-        self.initialized = True
-        return True
-
     async def _test_gemini(self) -> bool:
         """
         Try a lightweight call to verify Gemini connectivity. Support different client APIs.
@@ -110,20 +152,174 @@ class ASDSADFAgent:
         t = (text or "").lower()
         return any(k in t for k in keywords)
 
-    async def process_query(self, request: UserQuery) -> QueryResponse:
+    @staticmethod
+    def _format_context(retrieved: List[Dict[str, Any]]) -> str:
+        return "\n---\n".join([f"Source: {r.get('source','')}\nTitle: {r.get('title','')}\nContent: {r.get('content','')[:1000]}" for r in retrieved])
+
+    def _lookup_library_roadmap(self, request: UserQuery, count: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return {"bucket", "roadmap"} from the precomputed library if the request matches a stored bucket.
+        `count=False` skips the cache metric (for pre-checks that are followed by the real lookup).
+        """
+        if self.roadmap_library is None or not self.roadmap_library.buckets:
+            return None
+        key = bucket_for(request.message, request.user_profile)
+        roadmap = self.roadmap_library.get(key)
+        if count:
+            CACHE_REQUESTS.inc(cache="roadmap_library", result="miss" if roadmap is None else "hit")
+        if roadmap is None:
+            return None
+        return {"bucket": key, "roadmap": roadmap}
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _personalize_roadmap(self, request: UserQuery, base: Dict[str, Any], bucket: str) -> None:
+        """
+        Refine a library roadmap for this user off the request path and store the
+        result in the session, so follow-up requests can pick it up. Runs under the
+        same request deadline as a normal query; on overrun the session keeps the
+        unpersonalized library roadmap.
+        """
+        deadline = Deadline(resolve_timeout(getattr(request, "timeout_seconds", None), settings.request_timeout_seconds, settings.max_request_timeout_seconds))
+        try:
+            retrieved = await deadline.run(
+                self.rag.search(request.message, top_k=settings.max_retrieval_results),
+                stage="retrieval",
+                fraction=settings.retrieval_budget_fraction,
+            )
+            context = self._format_context(retrieved)
+            system_prompt = (
+                "You are ASDSADF. Personalize the provided baseline learning roadmap for the user's message. "
+                "Keep the same JSON structure; adjust modules, resources and durations only where the user's details require it."
+            )
+            baseline = json.dumps({k: v for k, v in base.items() if k != "session_id"}, ensure_ascii=False)
+            # context is already retrieved above; skip the client's own RAG lookup (it would search with the baseline JSON)
+            res = await deadline.run(
+                self.gemini.generate_structured_response(
+                    prompt=f"{request.message}\n\nBASELINE ROADMAP:\n{baseline}",
+                    system_instruction=system_prompt,
+                    context=context,
+                    schema_instruction="Return JSON roadmap structure.",
+                    use_rag=False,
+                    timeout=deadline.budget(),
+                ),
+                stage="generation",
+            )
+            if isinstance(res, dict) and isinstance(res.get("roadmap"), dict):
+                session = self.user_sessions.setdefault(request.session_id, {})
+                session["roadmap"] = res.get("roadmap")
+                session["roadmap_personalized"] = True
+                session["roadmap_bucket"] = bucket
+                logger.info("Stored personalized roadmap for session %s", request.session_id)
+        except DeadlineExceeded as e:
+            logger.info("Roadmap personalization for session %s abandoned, keeping the library roadmap: %s", request.session_id, e)
+        except Exception as e:
+            logger.warning("Background roadmap personalization failed: %s", e)
+        finally:
+            self.user_sessions.setdefault(request.session_id, {}).pop("roadmap_personalizing", None)
+
+    async def process_query(
+        self,
+        request: UserQuery,
+        use_library: bool = True,
+        retrieved: Optional[List[Dict[str, Any]]] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> QueryResponse:
+        """
+        Answer one query. `retrieved` lets callers that already searched (e.g. the
+        batch path, which retrieves for all queries at once) skip retrieval. With
+        `on_delta`, Gemini output is streamed through it as raw text chunks while
+        the structured response is being generated.
+        """
+        with REQUESTS_IN_FLIGHT.track(), timed_request("process_query") as timer:
+            result = await self._process_query(request, use_library, retrieved, on_delta)
+        metadata = result.metadata = {**(result.metadata or {}), "timings": timer.to_dict()}
+        fallback = metadata.get("fallback")
+        if fallback:
+            FALLBACKS.inc(kind=fallback)
+        REQUEST_SECONDS.observe(
+            result.processing_time,
+            kind="roadmap" if self._is_roadmap_request(request.message) else "answer",
+            source=metadata.get("roadmap_source") or fallback or "gemini",
+        )
+        return result
+
+    async def _process_query(self, request: UserQuery, use_library: bool, retrieved: Optional[List[Dict[str, Any]]], on_delta: Optional[Callable[[str], Awaitable[None]]]) -> QueryResponse:
         start = time.time()
         if not self.initialized:
             raise RuntimeError("Agent not initialized")
 
-        # retrieve context
-        try:
-            retrieved: List[Dict[str, Any]] = await self.rag.search(request.message, top_k=settings.max_retrieval_results)
-        except Exception as e:
-            logger.warning("RAG search failed, continuing without context: %s", e)
-            retrieved = []
+        # Serve common goal/level/hours buckets straight from the precomputed library
+        if use_library and self._is_roadmap_request(request.message):
+            with stage("library"):
+                hit = self._lookup_library_roadmap(request)
+            if hit is not None:
+                # RoadmapLibrary.get already returned a private copy
+                res = hit["roadmap"]
+                personalized = False
+                session_id = getattr(request, "session_id", None)
+                if session_id:
+                    res["session_id"] = session_id
+                    session = self.user_sessions.setdefault(session_id, {})
+                    if (
+                        session.get("roadmap_personalized")
+                        and session.get("roadmap_bucket") == hit["bucket"]
+                        and isinstance(session.get("roadmap"), dict)
+                    ):
+                        # a background personalization finished for this session: serve it
+                        res["roadmap"] = session["roadmap"]
+                        personalized = True
+                    elif "roadmap" not in session:
+                        session["roadmap"] = res.get("roadmap")
+                    if (
+                        not personalized
+                        and not session.get("roadmap_personalizing")
+                        and settings.roadmap_library_personalize and self.gemini_available and self.gemini
+                    ):
+                        session["roadmap_personalizing"] = True
+                        self._spawn(self._personalize_roadmap(request, hit["roadmap"], hit["bucket"]))
+                self._remember(request, res)
+                return QueryResponse(
+                    response=res,
+                    processing_time=time.time() - start,
+                    session_id=session_id,
+                    metadata={
+                        "roadmap_source": "library",
+                        "roadmap_personalized": personalized,
+                        "roadmap_bucket": hit["bucket"],
+                        "roadmap_library_version": self.roadmap_library.version,
+                    },
+                )
+
+        deadline = Deadline(resolve_timeout(getattr(request, "timeout_seconds", None), settings.request_timeout_seconds, settings.max_request_timeout_seconds))
+        metadata: Dict[str, Any] = {}
 
-        context = "\n---\n".join([f"Source: {r.get('source','')}\nTitle: {r.get('title','')}\nContent: {r.get('content','')[:1000]}" for r in retrieved])
+        # retrieve context within its share of the budget
+        if retrieved is None:
+            try:
+                retrieved = await deadline.run(
+                    self.rag.search(request.message, top_k=settings.max_retrieval_results),
+                    stage="retrieval",
+                    fraction=settings.retrieval_budget_fraction,
+                )
+            except DeadlineExceeded as e:
+                self._record_deadline_miss(e, metadata)
+                retrieved = []
+            except Exception as e:
+                logger.warning("RAG search failed, continuing without context: %s", e)
+                retrieved = []
+
+        context = self._format_context(retrieved)
+        CONTEXT_CHARS.observe(len(context))
         sources = list({r.get("source") for r in retrieved}) if retrieved else []
+        doc_ids = [r["id"] for r in retrieved if r.get("id")] if retrieved else []
+        session_id = getattr(request, "session_id", None)
+        # bounded history (recent turns + rolling summary) for follow-up questions
+        history = self.memory.history(session_id)
+        prompt_context = f"CONVERSATION HISTORY:\n{history}\n\n{context}" if history else context
 
         # choose prompt and flow
         if self._is_roadmap_request(request.message):
@@ -133,29 +329,26 @@ class ASDSADFAgent:
             # Use Gemini when available, fallback otherwise
             if self.gemini_available and self.gemini:
                 try:
-                    # detect structured method name variations
-                    if hasattr(self.gemini, "generate_structured_response"):
-                        res = await self.gemini.generate_structured_response(prompt=request.message, system_instruction=system_prompt, context=context, schema_instruction=schema_instruction)
-                    elif hasattr(self.gemini, "generate_response"):
-                        res_raw = await self.gemini.generate_response(request.message, system_instruction=system_prompt)
-                        # If raw string returned, wrap minimally
-                        res = {"text": res_raw}
-                    else:
-                        raise RuntimeError("No supported Gemini generation method found")
+                    res = await self._generate(request, system_prompt, schema_instruction, prompt_context, deadline, on_delta)
+                except DeadlineExceeded as e:
+                    self._record_deadline_miss(e, metadata)
+                    res = await self._best_available_roadmap(request, context, retrieved, metadata)
                 except Exception as e:
                     logger.error("Error generating roadmap via Gemini: %s", e)
-                    res = self._fallback_generate_roadmap(request, context)
+                    metadata["fallback"] = "local"
+                    res = await self._local_generate_roadmap(request, context, retrieved)
             else:
                 logger.info("Using local fallback generator for roadmap (Gemini unavailable).")
-                res = self._fallback_generate_roadmap(request, context)
+                metadata["fallback"] = "degraded"
+                res = await self._local_generate_roadmap(request, context, retrieved)
 
             # store roadmap in session if provided
-            session_id = getattr(request, "session_id", None)
             if session_id:
                 self.user_sessions.setdefault(session_id, {})["roadmap"] = res.get("roadmap") if isinstance(res, dict) else None
 
+            self._remember(request, res)
             processing_time = time.time() - start
-            return QueryResponse(response=res, context_used=[context] if context else [], retrieval_sources=sources, processing_time=processing_time)
+            return QueryResponse(response=res, context_used=[context] if context else [], retrieval_sources=sources, retrieval_ids=doc_ids, processing_time=processing_time, session_id=session_id, metadata=metadata)
 
         # Non-roadmap Q/A path
         system_prompt = "You are ASDSADF, answer concisely and provide actionable steps. Return JSON with fields: explanation, key_points, next_steps."
@@ -163,25 +356,215 @@ class ASDSADFAgent:
 
         if self.gemini_available and self.gemini:
             try:
-                if hasattr(self.gemini, "generate_structured_response"):
-                    res = await self.gemini.generate_structured_response(prompt=request.message, system_instruction=system_prompt, context=context, schema_instruction=schema_instruction)
-                elif hasattr(self.gemini, "generate_response"):
-                    res_raw = await self.gemini.generate_response(request.message, system_instruction=system_prompt)
-                    res = {"text": res_raw}
-                else:
-                    raise RuntimeError("No supported Gemini generation method found")
+                res = await self._generate(request, system_prompt, schema_instruction, prompt_context, deadline, on_delta)
+            except DeadlineExceeded as e:
+                self._record_deadline_miss(e, metadata)
+                metadata["fallback"] = "partial"
+                res = self._fallback_answer(request, context, retrieved)
             except Exception as e:
                 logger.error("Error generating response via Gemini: %s", e)
+                metadata["fallback"] = "local"
                 res = self._fallback_answer(request, context)
         else:
             logger.info("Using local fallback for Q/A (Gemini unavailable).")
+            metadata["fallback"] = "degraded"
             res = self._fallback_answer(request, context)
 
+        self._remember(request, res)
         processing_time = time.time() - start
-        return QueryResponse(response=res, context_used=[context] if context else [], retrieval_sources=sources, processing_time=processing_time)
+        return QueryResponse(response=res, context_used=[context] if context else [], retrieval_sources=sources, retrieval_ids=doc_ids, processing_time=processing_time, session_id=session_id, metadata=metadata)
+
+    async def iter_batch(
+        self,
+        requests: List[UserQuery],
+        max_concurrency: Optional[int] = None,
+        admit: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+    ) -> AsyncIterator[Tuple[int, Union[QueryResponse, Exception]]]:
+        """
+        Process many queries, yielding (index, result-or-exception) as each finishes.
+        Library hits are answered directly; all other queries share one batched
+        retrieval, then generations run with bounded concurrency. With `admit`
+        (e.g. an admission-control slot) each item holds one for its processing;
+        a rejection is that item's result.
+        """
+        if not self.initialized:
+            raise RuntimeError("Agent not initialized")
+        limit = max(1, min(max_concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency))
+
+        needs_retrieval = [
+            i for i, r in enumerate(requests)
+            if not (self._is_roadmap_request(r.message) and self._lookup_library_roadmap(r, count=False) is not None)
+        ]
+        retrieved: Dict[int, List[Dict[str, Any]]] = {}
+        if needs_retrieval:
+            results = await self.rag.search_batch([requests[i].message for i in needs_retrieval], top_k=settings.max_retrieval_results)
+            retrieved = dict(zip(needs_retrieval, results))
+
+        semaphore = asyncio.Semaphore(limit)
+
+        async def run(i: int):
+            async with semaphore:
+                try:
+                    if admit is None:
+                        return i, await self.process_query(requests[i], retrieved=retrieved.get(i))
+                    async with admit():
+                        return i, await self.process_query(requests[i], retrieved=retrieved.get(i))
+                except Exception as e:
+                    logger.warning("Batch item %d failed: %s", i, e)
+                    return i, e
+
+        tasks = [asyncio.create_task(run(i)) for i in range(len(requests))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # client went away mid-stream: do not keep generating for nobody
+            for t in tasks:
+                t.cancel()
+
+    async def _generate(self, request: UserQuery, system_prompt: str, schema_instruction: str, context: str, deadline: Deadline, on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """Call Gemini within the remaining budget, keeping a reserve for fallback work."""
+        reserve = settings.fallback_reserve_seconds
+        timeout = deadline.budget(reserve=reserve)
+        # detect structured method name variations
+        if hasattr(self.gemini, "generate_structured_response"):
+            # context is already retrieved above; skip the client's own RAG lookup
+            coro = self.gemini.generate_structured_response(prompt=request.message, system_instruction=system_prompt, context=context, schema_instruction=schema_instruction, use_rag=False, timeout=timeout, on_delta=on_delta)
+            return await deadline.run(coro, stage="generation", reserve=reserve)
+        if hasattr(self.gemini, "generate_response"):
+            res_raw = await deadline.run(self.gemini.generate_response(request.message, system_instruction=system_prompt), stage="generation", reserve=reserve)
+            # If raw string returned, wrap minimally
+            return {"text": res_raw}
+        raise RuntimeError("No supported Gemini generation method found")
+
+    def _remember(self, request: UserQuery, res: Any) -> None:
+        try:
+            self.memory.record(getattr(request, "session_id", None), request.message or "", self._describe_response(res))
+        except Exception as e:
+            logger.debug("Failed to record conversation turn: %s", e)
+
+    @staticmethod
+    def _describe_response(res: Any) -> str:
+        """Compact text form of a response for the conversation history."""
+        if isinstance(res, dict):
+            roadmap = res.get("roadmap")
+            if isinstance(roadmap, dict) and roadmap.get("phases"):
+                titles = [str(p.get("title", "")) for p in roadmap["phases"] if isinstance(p, dict)]
+                return "Proposed roadmap with phases: " + "; ".join(titles)
+            for key in ("explanation", "text", "raw_response"):
+                if res.get(key):
+                    return str(res[key])[:600]
+            return json.dumps(res, ensure_ascii=False)[:600]
+        return str(res)[:600]
+
+    async def _summarize_history(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        """Fold older turns into the rolling summary; runs off the request path."""
+        limit = settings.memory_summary_max_tokens
+        if not (self.gemini_available and self.gemini):
+            return local_summary(summary, turns, limit)
+        transcript = "\n\n".join(f"User: {t['user']}\nAssistant: {t['assistant']}" for t in turns)
+        prompt = f"PREVIOUS SUMMARY:\n{summary or '(none)'}\n\nNEW TURNS:\n{transcript}"
+        return await self.gemini.generate_response(
+            prompt,
+            system_instruction=(
+                f"Update the summary of this mentoring conversation in at most {limit * 3 // 4} words. "
+                "Keep the learner's goals, level, time commitment, progress and decisions already made. Return plain text."
+            ),
+            use_rag=False,
+            timeout=settings.request_timeout_seconds,
+        )
+
+    async def get_health_status(self) -> Dict[str, Any]:
+        """Cheap health summary: flags and a collection count, no model or Gemini calls."""
+        rag_ready = bool(getattr(self.rag, "initialized", False))
+        kb_stats: Dict[str, Any] = {}
+        if rag_ready:
+            try:
+                kb_stats["document_count"] = await self.rag.store.count()
+            except Exception as e:
+                logger.warning("Knowledge base count failed: %s", e)
+                rag_ready = False
+        gemini_up = bool(self.gemini_available and self.gemini)
+        return {
+            "status": "healthy" if self.initialized and rag_ready else ("starting" if not self.initialized else "unhealthy"),
+            "agent_initialized": self.initialized,
+            "rag_system_ready": rag_ready,
+            "gemini_api_available": gemini_up,
+            "embedding_model_loaded": registry.loaded().get("embedding_model", False),
+            "gemini_circuit": "closed" if gemini_up else "open",
+            "knowledge_base_stats": kb_stats,
+            "active_sessions": len(self.memory),
+        }
+
+    async def shutdown(self) -> None:
+        await self.memory.close()
+        for task in list(self._background_tasks):
+            task.cancel()
+
+    def _record_deadline_miss(self, exc: DeadlineExceeded, metadata: Dict[str, Any]) -> None:
+        self.deadline_misses[exc.stage] = self.deadline_misses.get(exc.stage, 0) + 1
+        DEADLINE_MISSES.inc(stage=exc.stage)
+        metadata.setdefault("deadline_exceeded", []).append(exc.stage)
+        logger.warning("%s; answering with the best available result", exc)
+
+    async def _best_available_roadmap(self, request: UserQuery, context: str, retrieved: List[Dict[str, Any]], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """After a generation timeout: prefer the session's previous roadmap, else build one locally."""
+        session_id = getattr(request, "session_id", None)
+        cached = self.user_sessions.get(session_id, {}).get("roadmap") if session_id else None
+        if cached:
+            metadata["fallback"] = "cached"
+            return {"roadmap": cached, "session_id": session_id, "note": "Showing your previous roadmap; generation timed out."}
+        metadata["fallback"] = "local"
+        return await self._local_generate_roadmap(request, context, retrieved)
 
     # --- Fallback helpers for degraded/local mode ---
 
+    async def _local_generate_roadmap(self, request: UserQuery, context: str, retrieved: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build a roadmap from the knowledge-base prerequisite graph; fall back to the
+        static skeleton only when the knowledge base has nothing relevant.
+        """
+        try:
+            with stage("local_roadmap"):
+                rebuild = self._refresh_local_graph()
+                if rebuild is not None and self.local_roadmap.graph is None:
+                    # first build: there is no previous graph to serve meanwhile
+                    await asyncio.shield(rebuild)
+                res = self.local_roadmap.generate(request.message, request.user_profile, retrieved)
+        except Exception as e:
+            logger.warning("Local roadmap generator failed: %s", e)
+            res = None
+        if res is None:
+            return self._fallback_generate_roadmap(request, context)
+        if getattr(request, "session_id", None):
+            res["session_id"] = request.session_id
+        return res
+
+    def _refresh_local_graph(self) -> Optional[asyncio.Task]:
+        """
+        Start a background rebuild of the local roadmap graph when the knowledge
+        base changed since the last build; at most one runs at a time, and requests
+        keep using the previous graph until it is swapped in. Returns the running
+        rebuild, or None when the graph is current.
+        """
+        if self.local_roadmap.graph is not None and self.local_roadmap.revision == self.rag.revision:
+            return None
+        if self._graph_rebuild is None or self._graph_rebuild.done():
+            self._graph_rebuild = asyncio.create_task(self._rebuild_local_graph())
+            self._background_tasks.add(self._graph_rebuild)
+            self._graph_rebuild.add_done_callback(self._background_tasks.discard)
+        return self._graph_rebuild
+
+    async def _rebuild_local_graph(self) -> None:
+        revision = self.rag.revision
+        try:
+            records = await self.rag.get_all_metadata()
+            graph = await asyncio.to_thread(KnowledgeGraph, records)
+            # swapped on the loop, so a generate() in progress never sees two different graphs
+            self.local_roadmap.use(graph, revision)
+        except Exception as e:
+            logger.warning("Local roadmap graph rebuild failed: %s", e)
+
     def _fallback_generate_roadmap(self, request: UserQuery, context: str) -> Dict[str, Any]:
         """
         Generate a minimal roadmap JSON structure when Gemini is unavailable.
@@ -261,14 +644,12 @@ class ASDSADFAgent:
         # Attach session_id if provided
         if getattr(request, "session_id", None):
             roadmap["session_id"] = request.session_id
-        # Optionally include retrieved context snippet for user transparency
-        if context:
-            roadmap["context_preview"] = context[:2000]
         return roadmap
 
-    def _fallback_answer(self, request: UserQuery, context: str) -> Dict[str, Any]:
+    def _fallback_answer(self, request: UserQuery, context: str, retrieved: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
-        Create a concise JSON answer when Gemini is unavailable.
+        Create a concise JSON answer when Gemini is unavailable. When `retrieved`
+        is given (generation timed out), point the user at the matching KB documents.
         """
         msg = (request.message or "").strip()
         explanation = f"Received your query: {msg}. Gemini API is unavailable; returning a brief local suggestion."
@@ -285,6 +666,10 @@ class ASDSADFAgent:
             key_points = ["Be specific about goal", "Ask for step-by-step plan or resources"]
             next_steps = "If you want more detail, try rephrasing with specifics (goal, timeline, weekly hours)."
 
+        if retrieved:
+            explanation = f"Received your query: {msg}. The full answer took too long; here is the most relevant material we found."
+            key_points = [f"{r.get('title', 'Untitled')} ({r.get('source', 'unknown')})" for r in retrieved]
+
         resp = {
             "explanation": explanation,
             "key_points": key_points,
@@ -292,8 +677,6 @@ class ASDSADFAgent:
         }
         if getattr(request, "session_id", None):
             resp["session_id"] = request.session_id
-        if context:
-            resp["context_preview"] = context[:1000]
         return resp
 
 
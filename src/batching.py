@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from src.config import settings
+from src.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveBatcher:
+    """
+    Splits texts into embedding batches by token budget instead of count.
+
+    Texts are ordered by length so each batch holds similar lengths and little
+    padding; a batch is closed when its padded size (texts x longest text, in
+    estimated tokens, capped at the model's max sequence length) would exceed
+    the budget. After every encode `record` compares the measured tokens/second
+    with the previous budget's and keeps moving the budget in the direction that
+    helped (hill climbing between `min_tokens` and `max_tokens`).
+    """
+
+    STEP = 1.5
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        min_tokens: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        adaptive: Optional[bool] = None,
+    ):
+        self.token_budget = token_budget or settings.embed_batch_tokens
+        self.min_tokens = min_tokens or settings.embed_batch_tokens_min
+        self.max_tokens = max_tokens or settings.embed_batch_tokens_max
+        self.adaptive = settings.embed_adaptive_batching if adaptive is None else adaptive
+        self._direction = 1
+        self._last_throughput: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def token_counts(texts: Sequence[str], max_seq_tokens: Optional[int] = None) -> List[int]:
+        counts = [max(1, estimate_tokens(text)) for text in texts]
+        if max_seq_tokens:
+            counts = [min(count, max_seq_tokens) for count in counts]
+        return counts
+
+    def batches(self, tokens: Sequence[int]) -> Iterator[List[int]]:
+        """Indexes into `tokens`, grouped into batches, shortest texts first."""
+        order = sorted(range(len(tokens)), key=tokens.__getitem__)
+        batch: List[int] = []
+        for i in order:
+            # sorted ascending, so the newest text is the longest in the batch
+            if batch and (len(batch) + 1) * tokens[i] > self.token_budget:
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def record(self, tokens: int, seconds: float) -> None:
+        """Feed one encode's size and duration back into the budget."""
+        if not self.adaptive or seconds <= 0 or tokens < self.token_budget / 4:
+            # tail batches are too small to say anything about the budget
+            return
+        throughput = tokens / seconds
+        with self._lock:
+            if self._last_throughput is not None and throughput < self._last_throughput:
+                self._direction = -self._direction
+            self._last_throughput = throughput
+            step = self.STEP if self._direction > 0 else 1 / self.STEP
+            self.token_budget = int(min(self.max_tokens, max(self.min_tokens, self.token_budget * step)))
+
+
+class IngestReport:
+    """Throughput of one ingestion run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.documents = 0
+        self.encoded = 0
+        self.tokens = 0
+        self.batches = 0
+        self.encode_seconds = 0.0
+
+    def add_batch(self, documents: int, encoded: int, tokens: int, encode_seconds: float) -> None:
+        self.documents += documents
+        self.encoded += encoded
+        self.tokens += tokens
+        self.batches += 1
+        self.encode_seconds += encode_seconds
+
+    def to_dict(self, token_budget: Optional[int] = None) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "documents": self.documents,
+            "encoded": self.encoded,
+            "batches": self.batches,
+            "seconds": round(elapsed, 3),
+            "docs_per_second": round(self.documents / elapsed, 1) if elapsed > 0 else None,
+            "tokens_per_second": round(self.tokens / self.encode_seconds, 1) if self.encode_seconds > 0 else None,
+            "token_budget": token_budget,
+        }
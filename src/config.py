@@ -14,17 +14,126 @@ class Settings(BaseSettings):
     # Vector DB & embeddings
     chroma_persist_directory: str = os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/chroma_db")
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    # Embedding backend: "torch" or "onnx" (optionally int8-quantized), see src/embeddings.py
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    embedding_onnx_quantize: bool = os.getenv("EMBEDDING_ONNX_QUANTIZE", "False").lower() in ("1","true","yes")
+    embedding_onnx_quantization_config: str = os.getenv("EMBEDDING_ONNX_QUANTIZATION_CONFIG", "avx2")
+    embedding_onnx_dir: str = os.getenv("EMBEDDING_ONNX_DIR", "./data/onnx")
+    embedding_parity_check: bool = os.getenv("EMBEDDING_PARITY_CHECK", "False").lower() in ("1","true","yes")
+    embedding_parity_tolerance: float = float(os.getenv("EMBEDDING_PARITY_TOLERANCE", "0.01"))
+    # Persistent content-hash -> embedding cache used on ingestion
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() in ("1","true","yes")
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite3")
+    # Ingestion embedding batches are sized by (padded) token count and tuned from measured throughput
+    embed_batch_tokens: int = int(os.getenv("EMBED_BATCH_TOKENS", "4096"))
+    embed_batch_tokens_min: int = int(os.getenv("EMBED_BATCH_TOKENS_MIN", "512"))
+    embed_batch_tokens_max: int = int(os.getenv("EMBED_BATCH_TOKENS_MAX", "65536"))
+    embed_adaptive_batching: bool = os.getenv("EMBED_ADAPTIVE_BATCHING", "True").lower() in ("1","true","yes")
+    # Multi-process ingestion (src/embedding_workers.py): default worker count (0 = one per CPU when
+    # requested), threads per worker (0 = CPUs / workers) and documents per memory-mapped window
+    embedding_workers: int = int(os.getenv("EMBEDDING_WORKERS", "0"))
+    embedding_worker_threads: int = int(os.getenv("EMBEDDING_WORKER_THREADS", "0"))
+    embedding_worker_window: int = int(os.getenv("EMBEDDING_WORKER_WINDOW", "8192"))
+    # Vector layout for newly created collections (existing collections keep theirs), see src/vector_storage.py.
+    # With VECTOR_SEARCH_DIM > 0 Chroma indexes reduced vectors ("truncate" or "pca") and the top
+    # candidates are re-scored against full-dimension vectors stored as float32, float16 or int8.
+    vector_search_dim: int = int(os.getenv("VECTOR_SEARCH_DIM", "0"))
+    vector_reduction: str = os.getenv("VECTOR_REDUCTION", "pca")
+    vector_storage_dtype: str = os.getenv("VECTOR_STORAGE_DTYPE", "float16")
+    vector_rescore_multiplier: int = int(os.getenv("VECTOR_RESCORE_MULTIPLIER", "4"))
+    # Fit the PCA projection automatically once this many full vectors are stored (0 = only refit_reduction / the CLI)
+    vector_pca_autofit_min: int = int(os.getenv("VECTOR_PCA_AUTOFIT_MIN", "2000"))
+    vector_store_directory: str = os.getenv("VECTOR_STORE_DIRECTORY", "./data/vectors")
+    # Threads dedicated to Chroma calls from async code (src/vector_store.py)
+    vector_store_workers: int = int(os.getenv("VECTOR_STORE_WORKERS", "4"))
+    # Cross-encoder re-ranking of search candidates (src/reranker.py): score RERANK_CANDIDATES
+    # bi-encoder hits and keep the best RERANK_TOP_N for the prompt
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "False").lower() in ("1","true","yes")
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "20"))
+    rerank_top_n: int = int(os.getenv("RERANK_TOP_N", "3"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+    rerank_cache_size: int = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+    # Maximal-marginal-relevance selection: pick results from MMR_FETCH_K candidates, trading
+    # relevance (MMR_LAMBDA=1) against redundancy with already picked results
+    mmr_enabled: bool = os.getenv("MMR_ENABLED", "False").lower() in ("1","true","yes")
+    mmr_lambda: float = float(os.getenv("MMR_LAMBDA", "0.7"))
+    mmr_fetch_k: int = int(os.getenv("MMR_FETCH_K", "20"))
 
     # App
     app_host: str = os.getenv("APP_HOST", "0.0.0.0")
     app_port: int = int(os.getenv("APP_PORT", "8000"))
     debug: bool = os.getenv("DEBUG", "False").lower() in ("1","true","yes")
+    # With DEBUG, log the stack of anything that blocks the event loop longer than this
+    blocking_detector_threshold_seconds: float = float(os.getenv("BLOCKING_DETECTOR_THRESHOLD_SECONDS", "0.1"))
+    app_workers: int = int(os.getenv("APP_WORKERS", "1"))
+    # Load the embedding model in the parent before forking workers (gunicorn.conf.py)
+    preload_models: bool = os.getenv("PRELOAD_MODELS", "True").lower() in ("1","true","yes")
+    torch_threads_per_worker: int = int(os.getenv("TORCH_THREADS_PER_WORKER", "1"))
+    # With APP_WORKERS > 1, gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR here so /metrics covers all workers
+    prometheus_multiproc_dir: str = os.getenv("PROMETHEUS_MULTIPROC_DIR_DEFAULT", "./data/prometheus_multiproc")
 
     # RAG
     max_retrieval_results: int = int(os.getenv("MAX_RETRIEVAL_RESULTS", "5"))
     similarity_threshold: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
     max_context_length: int = int(os.getenv("MAX_CONTEXT_LENGTH", "8000"))
 
+    # Request deadlines (seconds); stages get a fraction of the budget, the rest is kept for fallbacks
+    request_timeout_seconds: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "20"))
+    max_request_timeout_seconds: float = float(os.getenv("MAX_REQUEST_TIMEOUT_SECONDS", "60"))
+    retrieval_budget_fraction: float = float(os.getenv("RETRIEVAL_BUDGET_FRACTION", "0.2"))
+    fallback_reserve_seconds: float = float(os.getenv("FALLBACK_RESERVE_SECONDS", "0.5"))
+
+    # Response compression (gzip, or brotli when brotli-asgi is installed)
+    response_compression: bool = os.getenv("RESPONSE_COMPRESSION", "True").lower() in ("1","true","yes")
+    compression_min_bytes: int = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+    # Admission control for /chat: running slots, bounded wait queue, optional per-client share (0 = off)
+    admission_max_concurrent: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+    admission_max_queue: int = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    admission_queue_timeout_seconds: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+    admission_per_client_limit: int = int(os.getenv("ADMISSION_PER_CLIENT_LIMIT", "0"))
+
+    # Health snapshot refresh; Gemini is re-probed only while it is unavailable
+    health_refresh_seconds: float = float(os.getenv("HEALTH_REFRESH_SECONDS", "5"))
+    health_gemini_probe_seconds: float = float(os.getenv("HEALTH_GEMINI_PROBE_SECONDS", "300"))
+
+    # OpenTelemetry export of per-request stage spans (optional packages)
+    otel_enabled: bool = os.getenv("OTEL_ENABLED", "False").lower() in ("1","true","yes")
+    otel_endpoint: str = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
+    otel_service_name: str = os.getenv("OTEL_SERVICE_NAME", "asdsadf")
+
+    # Streaming: chunks buffered between the Gemini stream and its consumer, and
+    # messages buffered per WebSocket connection before generation is held back
+    gemini_stream_buffer: int = int(os.getenv("GEMINI_STREAM_BUFFER", "8"))
+    ws_send_queue_size: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+
+    # Batch chat
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+    # Knowledge ingestion (uploads and /knowledge/add)
+    ingest_upload_dir: str = os.getenv("INGEST_UPLOAD_DIR", "./data/uploads")
+    ingest_max_upload_bytes: int = int(os.getenv("INGEST_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+    ingest_parse_workers: int = int(os.getenv("INGEST_PARSE_WORKERS", "2"))
+    ingest_chunk_chars: int = int(os.getenv("INGEST_CHUNK_CHARS", "2000"))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    ingest_queue_max_wait_seconds: float = float(os.getenv("INGEST_QUEUE_MAX_WAIT_SECONDS", "0.5"))
+    # base name: each worker process spools to <stem>.<pid>-<random><suffix> next to it (src/ingest_queue.py)
+    ingest_queue_spool_path: str = os.getenv("INGEST_QUEUE_SPOOL_PATH", "./data/ingest_queue.jsonl")
+
+    # Conversation memory (token counts are estimates, ~4 chars per token)
+    memory_recent_turns: int = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+    memory_max_tokens: int = int(os.getenv("MEMORY_MAX_TOKENS", "1200"))
+    memory_summary_max_tokens: int = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "400"))
+    memory_max_sessions: int = int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+
+    # Precomputed roadmap library
+    roadmap_library_enabled: bool = os.getenv("ROADMAP_LIBRARY_ENABLED", "True").lower() in ("1","true","yes")
+    roadmap_library_path: str = os.getenv("ROADMAP_LIBRARY_PATH", "./data/roadmap_library")
+    roadmap_library_version: str = os.getenv("ROADMAP_LIBRARY_VERSION", "v1")
+    roadmap_library_personalize: bool = os.getenv("ROADMAP_LIBRARY_PERSONALIZE", "False").lower() in ("1","true","yes")
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from src.config import settings
+from src.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# (previous summary, turns to fold in) -> new summary
+Summarizer = Callable[[str, List[Dict[str, str]]], Awaitable[str]]
+
+
+def local_summary(summary: str, turns: List[Dict[str, str]], max_tokens: int) -> str:
+    """Extractive fallback: keep the gist of each folded turn, newest last, within the ceiling."""
+    lines = [summary] if summary else []
+    for t in turns:
+        lines.append(f"- User asked: {t['user'][:160]} | Answer: {t['assistant'][:160]}")
+    return truncate_to_tokens("\n".join(lines), max_tokens, keep="end")
+
+
+class ConversationMemory:
+    """Last few turns verbatim plus a rolling summary of everything older."""
+
+    def __init__(self, recent_turns: int):
+        self.recent: Deque[Dict[str, str]] = deque()
+        self.recent_turns = recent_turns
+        self.summary = ""
+        # turns evicted from `recent` that are not yet folded into the summary
+        self.pending: List[Dict[str, str]] = []
+        self.summarizing: Optional[asyncio.Task] = None
+        self.total_turns = 0
+
+    def add_turn(self, user: str, assistant: str) -> None:
+        self.recent.append({"user": user, "assistant": assistant})
+        self.total_turns += 1
+        while len(self.recent) > self.recent_turns:
+            self.pending.append(self.recent.popleft())
+
+    def render(self, max_tokens: int) -> str:
+        """Prompt-ready history bounded by `max_tokens`; oldest verbatim turns are dropped first."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        if self.pending:
+            # not yet summarized: include only their questions so nothing is silently lost
+            parts.append("Earlier questions:\n" + "\n".join(f"- {t['user'][:200]}" for t in self.pending))
+        turns = [f"User: {t['user']}\nAssistant: {t['assistant']}" for t in self.recent]
+        while turns and estimate_tokens("\n\n".join(parts + turns)) > max_tokens:
+            turns.pop(0)
+        text = "\n\n".join(parts + turns)
+        return truncate_to_tokens(text, max_tokens, keep="end")
+
+
+class ConversationMemoryStore:
+    """
+    Per-session conversation memory. Summaries are regenerated in background
+    tasks after a response is sent, so prompt size stays bounded without adding
+    a summarization call to the request path.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        recent_turns: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        summary_max_tokens: Optional[int] = None,
+        max_sessions: Optional[int] = None,
+    ):
+        self.summarizer = summarizer
+        self.recent_turns = recent_turns or settings.memory_recent_turns
+        self.max_tokens = max_tokens or settings.memory_max_tokens
+        self.summary_max_tokens = summary_max_tokens or settings.memory_summary_max_tokens
+        self.max_sessions = max_sessions or settings.memory_max_sessions
+        self.sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, session_id: str) -> ConversationMemory:
+        memory = self.sessions.get(session_id)
+        if memory is None:
+            memory = ConversationMemory(self.recent_turns)
+            self.sessions[session_id] = memory
+            # least-recently-used sessions are dropped past the cap
+            while len(self.sessions) > self.max_sessions:
+                _, evicted = self.sessions.popitem(last=False)
+                if evicted.summarizing and not evicted.summarizing.done():
+                    evicted.summarizing.cancel()
+        else:
+            self.sessions.move_to_end(session_id)
+        return memory
+
+    def history(self, session_id: Optional[str]) -> str:
+        if not session_id or session_id not in self.sessions:
+            return ""
+        return self.get(session_id).render(self.max_tokens)
+
+    def record(self, session_id: Optional[str], user: str, assistant: str) -> None:
+        if not session_id:
+            return
+        memory = self.get(session_id)
+        memory.add_turn(user, assistant)
+        if memory.pending and (memory.summarizing is None or memory.summarizing.done()):
+            memory.summarizing = asyncio.create_task(self._fold(session_id, memory))
+
+    async def _fold(self, session_id: str, memory: ConversationMemory) -> None:
+        # loop: turns may be evicted while a summary is being generated
+        while memory.pending:
+            batch = list(memory.pending)
+            try:
+                if self.summarizer is not None:
+                    summary = await self.summarizer(memory.summary, batch)
+                else:
+                    summary = local_summary(memory.summary, batch, self.summary_max_tokens)
+            except Exception as e:
+                logger.warning("Summarization failed for session %s, using local summary: %s", session_id, e)
+                summary = local_summary(memory.summary, batch, self.summary_max_tokens)
+            memory.summary = truncate_to_tokens(summary.strip(), self.summary_max_tokens, keep="end")
+            del memory.pending[:len(batch)]
+
+    async def close(self) -> None:
+        tasks = [m.summarizing for m in self.sessions.values() if m.summarizing and not m.summarizing.done()]
+        for t in tasks:
+            t.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Optional
+
+from src.timing import stage as timed_stage
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a pipeline stage does not finish within its share of the request budget."""
+
+    def __init__(self, stage: str, budget: float):
+        super().__init__(f"Stage '{stage}' exceeded its {budget:.2f}s budget")
+        self.stage = stage
+        self.budget = budget
+
+
+class Deadline:
+    """
+    End-to-end request deadline. Stages ask for a slice of the remaining budget
+    and are abandoned when they overrun it, so the caller can still answer
+    (from cache or a local fallback) before the overall deadline.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = float(timeout)
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.timeout
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def budget(self, fraction: float = 1.0, reserve: float = 0.0) -> float:
+        """
+        Seconds a stage may use: `fraction` of the total timeout, capped by what is
+        left after keeping `reserve` seconds back for fallback work.
+        """
+        return max(0.0, min(self.timeout * fraction, self.remaining() - reserve))
+
+    async def run(self, awaitable: Awaitable[Any], stage: str, fraction: float = 1.0, reserve: float = 0.0) -> Any:
+        """
+        Await `awaitable` within the stage budget. On overrun the awaiting task is
+        cancelled; work already handed to a thread keeps running but its result is discarded.
+        """
+        budget = self.budget(fraction, reserve)
+        if budget <= 0.0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(stage, budget)
+        try:
+            with timed_stage(stage):
+                return await asyncio.wait_for(awaitable, timeout=budget)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage, budget) from None
+
+
+def resolve_timeout(requested: Optional[float], default: float, maximum: float) -> float:
+    """Clamp a per-request timeout override to (0, maximum]; fall back to the default."""
+    if requested is None or requested <= 0:
+        return default
+    return min(float(requested), maximum)
@@ -0,0 +1,121 @@
+"""
+Multi-process embedding for large ingestion runs.
+
+One process running `encode` cannot keep every core busy on multi-million
+document loads. `EmbeddingWorkerPool` starts N spawned worker processes that
+each load the embedding model once (the configured src.embeddings backend,
+with EMBEDDING_WORKER_THREADS intra-op threads). A window of texts is encoded
+by handing each worker a token-sized batch plus the path of a memory-mapped
+window file (on /dev/shm where available); the worker writes its float32 rows
+straight into the mapping and returns only the row indexes, so vectors are
+never pickled. Only the parent creates and removes the file, so the workers
+never touch multiprocessing's shared-memory resource tracker. The parent
+process stays the single writer to Chroma (see RAGSystem.add_documents_batch).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(threads: int) -> None:
+    global _worker_model
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from src.embeddings import load_embedding_backend
+
+    _worker_model = load_embedding_backend()
+
+
+def _encode_into(texts: List[str], rows: List[int], path: str, shape: Tuple[int, int]) -> Tuple[List[int], float]:
+    """Worker side: encode `texts` and write them to `rows` of the mapped (window x dim) float32 matrix."""
+    import numpy as np
+
+    start = time.perf_counter()
+    vectors = _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+    # MAP_SHARED: the parent's mapping of the same file sees the rows without a flush
+    matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+    matrix[rows] = vectors
+    del matrix
+    return rows, time.perf_counter() - start
+
+
+def _window_dir() -> Optional[str]:
+    # tmpfs keeps the window in memory; elsewhere fall back to the default temp directory
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+class EmbeddingWorkerPool:
+    """Pool of embedding worker processes; use as an async context manager."""
+
+    def __init__(self, workers: Optional[int] = None, threads: Optional[int] = None):
+        self.workers = max(1, workers or settings.embedding_workers or os.cpu_count() or 1)
+        self.threads = threads or settings.embedding_worker_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def __aenter__(self) -> "EmbeddingWorkerPool":
+        # spawn: forking a process that holds torch threads (or Chroma handles) is unsafe
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.threads,),
+        )
+        logger.info("Started %d embedding workers (%d threads each)", self.workers, self.threads)
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown, True, cancel_futures=True)
+            self._pool = None
+
+    async def encode(self, texts: Sequence[str], batches: Sequence[List[int]], dimension: int) -> AsyncIterator[Tuple[List[int], Any, float]]:
+        """
+        Encode `texts`, one worker task per batch of indexes, and yield
+        (indexes, float32 vectors, encode seconds) as batches complete. The
+        vectors are copied out of the window file before it is removed.
+        """
+        import numpy as np
+
+        if not texts:
+            return
+        shape = (len(texts), dimension)
+        fd, path = tempfile.mkstemp(prefix="embedding-window-", suffix=".f32", dir=_window_dir())
+        os.close(fd)
+        matrix = np.memmap(path, dtype=np.float32, mode="w+", shape=shape)
+        loop = asyncio.get_running_loop()
+        tasks = [
+            loop.run_in_executor(self._pool, _encode_into, [texts[i] for i in batch], batch, path, shape)
+            for batch in batches
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    rows, seconds = await finished
+                except Exception as e:
+                    # a failed batch is left out; the caller's written count shows the gap
+                    logger.error("Embedding worker batch failed: %s", e)
+                    continue
+                # fancy indexing copies the rows out of the mapping
+                yield rows, np.array(matrix[rows]), seconds
+        finally:
+            # on early exit, let running workers finish writing before the file goes away
+            await asyncio.gather(*tasks, return_exceptions=True)
+            del matrix
+            os.unlink(path)
@@ -0,0 +1,140 @@
+"""
+Embedding backends.
+
+Every backend exposes the subset of SentenceTransformer's interface that the
+rest of the code uses (`encode(texts, batch_size=..., ...)` returning numpy
+arrays, one row per text or a 1-D array for a single string), so RAGSystem does
+not care which one is loaded. The backend is chosen with EMBEDDING_BACKEND:
+
+- "torch": full-precision PyTorch SentenceTransformer (default).
+- "onnx": the same model run by ONNX Runtime; with EMBEDDING_ONNX_QUANTIZE the
+  weights are dynamically quantized to int8, which is several times faster on
+  CPU. Needs sentence-transformers>=3.2 with its onnx extra (optimum, onnxruntime).
+
+A non-torch backend can be checked against the torch backend with
+`check_parity` (or scripts/check_embedding_backend.py); with
+EMBEDDING_PARITY_CHECK set this runs at load time and falls back to torch when
+the embeddings drift beyond the tolerance.
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARITY_TEXTS = [
+    "How do I get started with Python programming?",
+    "Build a REST API with FastAPI and deploy it with Docker",
+    "JavaScript closures, promises and async/await explained",
+    "Roadmap to become a data scientist in six months with 10 hours per week",
+    "SQL joins, indexes and query optimization",
+    "Introduction to machine learning: linear regression and gradient descent",
+]
+
+
+class EmbeddingBackend:
+    """A loaded embedding model. `model` is the underlying SentenceTransformer."""
+
+    name = "base"
+
+    def __init__(self, model: Any):
+        self.model = model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences, **kwargs):
+        return self.model.encode(sentences, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name} dim={self.dimension}>"
+
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    @classmethod
+    def load(cls, model_name: str) -> "TorchBackend":
+        from sentence_transformers import SentenceTransformer
+
+        return cls(SentenceTransformer(model_name))
+
+
+class OnnxBackend(EmbeddingBackend):
+    name = "onnx"
+
+    @classmethod
+    def load(cls, model_name: str, quantize: bool = False, cache_dir: Optional[str] = None) -> "OnnxBackend":
+        from sentence_transformers import SentenceTransformer
+
+        if not quantize:
+            # exports to ONNX on first load when the model repo has no ONNX file
+            return cls(SentenceTransformer(model_name, backend="onnx"))
+
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        config = settings.embedding_onnx_quantization_config
+        file_name = f"onnx/model_qint8_{config}.onnx"
+        local_dir = Path(cache_dir or settings.embedding_onnx_dir) / model_name.replace("/", "__")
+        if not (local_dir / file_name).exists():
+            logger.info("Exporting int8 (%s) ONNX model for %s to %s", config, model_name, local_dir)
+            exported = SentenceTransformer(model_name, backend="onnx")
+            exported.save(str(local_dir))
+            export_dynamic_quantized_onnx_model(exported, config, str(local_dir))
+        backend = cls(SentenceTransformer(str(local_dir), backend="onnx", model_kwargs={"file_name": file_name}))
+        backend.name = f"onnx-int8-{config}"
+        return backend
+
+
+def check_parity(candidate: EmbeddingBackend, reference: EmbeddingBackend, texts: Optional[List[str]] = None, tolerance: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Compare two backends on the same texts. Passes when every text's embeddings
+    have cosine similarity >= 1 - tolerance.
+    """
+    import numpy as np
+
+    texts = texts or PARITY_TEXTS
+    tolerance = settings.embedding_parity_tolerance if tolerance is None else tolerance
+    a = np.asarray(candidate.encode(texts), dtype=np.float32)
+    b = np.asarray(reference.encode(texts), dtype=np.float32)
+    if a.shape != b.shape:
+        return {"passed": False, "reason": f"shape mismatch {a.shape} vs {b.shape}"}
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    min_cos = float(cos.min())
+    return {
+        "passed": min_cos >= 1.0 - tolerance,
+        "min_cosine": round(min_cos, 6),
+        "mean_cosine": round(float(cos.mean()), 6),
+        "max_abs_diff": round(float(np.abs(a - b).max()), 6),
+        "tolerance": tolerance,
+        "texts": len(texts),
+    }
+
+
+def load_embedding_backend(model_name: Optional[str] = None, backend: Optional[str] = None) -> EmbeddingBackend:
+    """Load the configured backend, falling back to torch if it cannot be loaded or fails the parity check."""
+    model_name = model_name or settings.embedding_model
+    backend = (backend or settings.embedding_backend).lower()
+    if backend == "torch":
+        return TorchBackend.load(model_name)
+    if backend != "onnx":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r} (expected 'torch' or 'onnx')")
+
+    try:
+        candidate = OnnxBackend.load(model_name, quantize=settings.embedding_onnx_quantize)
+    except Exception as e:
+        logger.warning("ONNX embedding backend unavailable (%s); using torch", e)
+        return TorchBackend.load(model_name)
+
+    if settings.embedding_parity_check:
+        reference = TorchBackend.load(model_name)
+        report = check_parity(candidate, reference)
+        if not report["passed"]:
+            logger.error("Embedding backend %s failed the parity check %s; using torch", candidate.name, report)
+            return reference
+        logger.info("Embedding backend %s passed the parity check %s", candidate.name, report)
+    return candidate
@@ -1,4 +1,3 @@
-import google.generativeai as genai
 import asyncio
 import json
 import re
@@ -14,6 +13,8 @@ class GeminiClient:
     def __init__(self):
         if not settings.gemini_api_key:
             raise ValueError("GEMINI_API_KEY is required in environment")
+        import google.generativeai as genai
+
         genai.configure(api_key=settings.gemini_api_key)
         self.model = genai.GenerativeModel(settings.gemini_model)
         # conservative generation config
@@ -96,13 +97,17 @@ class GeminiClient:
         except Exception as e:
             logger.error("Gemini test connection failed: %s", e)
             return False
-import google.generativeai as genai
 import json
 import asyncio
-from typing import Dict, Any, Optional, List
+import threading
+from typing import Dict, Any, Optional, List, Callable, Awaitable
 from src.config import settings
 from src.rag_system import RAGSystem
+from src.resources import registry
+from src.metrics import GEMINI_SECONDS, GEMINI_TOKENS
+from src.timing import stage
 import logging
+import time
 import re
 
 logger = logging.getLogger(__name__)
@@ -112,27 +117,34 @@ class GeminiClient:
     
     def __init__(self, rag_system: RAGSystem):
         """Initialize the Gemini client with RAG system."""
-        if not settings.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY is required")
-        
-        genai.configure(api_key=settings.gemini_api_key)
-        self.model = genai.GenerativeModel(settings.gemini_model)
         self.rag_system = rag_system
         
-        # Configure generation parameters for JSON responses
-        self.generation_config = genai.types.GenerationConfig(
+        # Configure generation parameters for JSON responses (a plain dict is accepted
+        # by generate_content and keeps google.generativeai out of module import)
+        self.generation_config = dict(
             temperature=0.1,  # Low temperature for consistent, factual responses
             top_p=0.8,
             top_k=40,
             max_output_tokens=4096,
         )
     
+    @property
+    def model(self):
+        """Shared model handle (configured once per process on first use, see src.resources)."""
+        return registry.get_gemini_model()
+
+    async def warm_up(self) -> None:
+        """Import and configure google.generativeai and build the model off the event loop."""
+        await asyncio.to_thread(registry.get_gemini_model)
+    
     async def generate_response(
         self, 
         prompt: str, 
         system_instruction: Optional[str] = None,
         context: Optional[str] = None,
-        use_rag: bool = True
+        use_rag: bool = True,
+        timeout: Optional[float] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> str:
         """
         Generate a response using Gemini API with optional RAG context.
@@ -142,6 +154,8 @@ class GeminiClient:
             system_instruction: System-level instructions
             context: Additional context (if not using RAG)
             use_rag: Whether to use RAG for context retrieval
+            timeout: Seconds before the API call is aborted (None = client default)
+            on_delta: If given, the response is streamed and each text chunk is awaited through it
             
         Returns:
             Generated response string
@@ -158,25 +172,44 @@ class GeminiClient:
                     rag_context = self._format_rag_context(rag_results)
             
             # Construct full prompt
-            full_prompt = ""
-            
-            if system_instruction:
-                full_prompt += f"SYSTEM INSTRUCTION:\n{system_instruction}\n\n"
+            with stage("prompt"):
+                full_prompt = ""
+                
+                if system_instruction:
+                    full_prompt += f"SYSTEM INSTRUCTION:\n{system_instruction}\n\n"
+                
+                if rag_context:
+                    full_prompt += f"RELEVANT KNOWLEDGE:\n{rag_context}\n\n"
+                
+                if context:
+                    full_prompt += f"ADDITIONAL CONTEXT:\n{context}\n\n"
+                
+                full_prompt += f"USER QUERY:\n{prompt}"
             
-            if rag_context:
-                full_prompt += f"RELEVANT KNOWLEDGE:\n{rag_context}\n\n"
-            
-            if context:
-                full_prompt += f"ADDITIONAL CONTEXT:\n{context}\n\n"
-            
-            full_prompt += f"USER QUERY:\n{prompt}"
-            
-            # Generate response
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                full_prompt,
-                generation_config=self.generation_config
-            )
+            # Generate response; pass the deadline to the transport so an abandoned call does not keep its worker thread busy
+            request_options = {"timeout": timeout} if timeout else None
+            start = time.perf_counter()
+            try:
+                with stage("gemini"):
+                    if on_delta is not None:
+                        return await self._stream_content(full_prompt, request_options, on_delta, start)
+                    # resolve self.model in the worker thread too: the first use imports and configures genai
+                    response = await asyncio.to_thread(
+                        lambda: self.model.generate_content(
+                            full_prompt,
+                            generation_config=self.generation_config,
+                            request_options=request_options
+                        )
+                    )
+            except asyncio.CancelledError:
+                # deadline expired while waiting
+                GEMINI_SECONDS.observe(time.perf_counter() - start, outcome="cancelled")
+                raise
+            except Exception:
+                GEMINI_SECONDS.observe(time.perf_counter() - start, outcome="error")
+                raise
+            GEMINI_SECONDS.observe(time.perf_counter() - start, outcome="ok")
+            self._record_usage(response)
             
             return response.text
             
@@ -184,13 +217,83 @@ class GeminiClient:
             logger.error(f"Error generating response: {e}")
             raise
     
+    async def _stream_content(
+        self,
+        full_prompt: str,
+        request_options: Optional[Dict[str, Any]],
+        on_delta: Callable[[str], Awaitable[None]],
+        start: float
+    ) -> str:
+        """
+        Stream generate_content from a worker thread. Chunks pass through a small
+        bounded queue, so a slow consumer (e.g. a slow WebSocket client) stalls the
+        producer instead of buffering the whole response; if the consumer stops,
+        the producer is told to stop at the next chunk.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(2, settings.gemini_stream_buffer))
+        stop = threading.Event()
+        done = object()
+        last_chunk = []
+
+        def produce():
+            try:
+                for chunk in self.model.generate_content(
+                    full_prompt,
+                    generation_config=self.generation_config,
+                    request_options=request_options,
+                    stream=True
+                ):
+                    if stop.is_set():
+                        break
+                    last_chunk[:] = [chunk]
+                    text = getattr(chunk, "text", "")
+                    if text:
+                        asyncio.run_coroutine_threadsafe(queue.put(text), loop).result()
+                item = done
+            except Exception as e:
+                item = e
+            if not stop.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        loop.run_in_executor(None, produce)
+        parts: List[str] = []
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                parts.append(item)
+                await on_delta(item)
+        finally:
+            stop.set()
+            # unblock a producer waiting on a full queue so its thread can exit
+            while not queue.empty():
+                queue.get_nowait()
+
+        GEMINI_SECONDS.observe(time.perf_counter() - start, outcome="ok")
+        if last_chunk:
+            self._record_usage(last_chunk[0])
+        return "".join(parts)
+    
+    @staticmethod
+    def _record_usage(response: Any) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            GEMINI_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, kind="prompt")
+            GEMINI_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, kind="completion")
+    
     async def generate_structured_response(
         self, 
         prompt: str, 
         system_instruction: str,
         context: Optional[str] = None,
         use_rag: bool = True,
-        schema_instruction: str = "Respond with valid JSON only. Do not include any text outside the JSON structure."
+        schema_instruction: str = "Respond with valid JSON only. Do not include any text outside the JSON structure.",
+        timeout: Optional[float] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
         Generate a structured JSON response.
@@ -201,6 +304,8 @@ class GeminiClient:
             context: Additional context
             use_rag: Whether to use RAG for context retrieval
             schema_instruction: JSON schema instructions
+            timeout: Seconds before the API call is aborted
+            on_delta: Receives raw text chunks while the response streams
             
         Returns:
             Parsed JSON response as dictionary
@@ -213,12 +318,15 @@ class GeminiClient:
                 prompt=prompt,
                 system_instruction=enhanced_system,
                 context=context,
-                use_rag=use_rag
+                use_rag=use_rag,
+                timeout=timeout,
+                on_delta=on_delta
             )
             
             # Clean and parse JSON
-            json_text = self._extract_json(response_text)
-            return json.loads(json_text)
+            with stage("parse"):
+                json_text = self._extract_json(response_text)
+                return json.loads(json_text)
             
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON response: {e}")
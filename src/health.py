@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from src.config import settings
+from src.models import SystemHealth
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Periodically refreshed health snapshot, so probes read a cached SystemHealth
+    instead of touching Chroma or Gemini on every request.
+
+    The refresh itself is cheap (flags plus a collection count). While Gemini is
+    down, it is re-probed every `gemini_probe_interval` seconds so the agent can
+    leave degraded mode without a restart; a healthy Gemini is never probed.
+    """
+
+    def __init__(self, agent, interval: Optional[float] = None, gemini_probe_interval: Optional[float] = None, version: Optional[str] = None):
+        self.agent = agent
+        self.interval = interval or settings.health_refresh_seconds
+        self.gemini_probe_interval = gemini_probe_interval or settings.health_gemini_probe_seconds
+        self.version = version
+        self.snapshot = SystemHealth(
+            status="starting",
+            agent_initialized=False,
+            rag_system_ready=False,
+            gemini_api_available=False,
+            version=version,
+        )
+        self.updated_at = 0.0
+        self._last_gemini_probe = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot.agent_initialized and self.snapshot.rag_system_ready
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Health refresh failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> SystemHealth:
+        agent = self.agent
+        if agent is not None and agent.initialized and not agent.gemini_available and agent.gemini is not None:
+            if time.monotonic() - self._last_gemini_probe >= self.gemini_probe_interval:
+                self._last_gemini_probe = time.monotonic()
+                agent.gemini_available = await agent._test_gemini()
+                if agent.gemini_available:
+                    logger.info("Gemini API reachable again; leaving degraded mode.")
+
+        status = await agent.get_health_status() if agent is not None else {}
+        self.snapshot = SystemHealth(version=self.version, **{"status": "unhealthy", "agent_initialized": False, "rag_system_ready": False, "gemini_api_available": False, **status})
+        self.updated_at = time.time()
+        return self.snapshot
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.snapshot.dict()
+        data["checked_at"] = self.updated_at
+        data["age_seconds"] = round(time.time() - self.updated_at, 3) if self.updated_at else None
+        return data
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.ingestion import IngestionJob, JobRegistry, jobs as default_jobs
+from src.models import KnowledgeDocument
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: single-process use only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueue:
+    """
+    Micro-batching write queue for the knowledge base.
+
+    Documents are accepted immediately (and appended to a spool file so a
+    restart does not lose them), accumulated, and flushed through
+    RAGSystem.add_documents_batch when `batch_size` documents are waiting or the
+    oldest has waited `max_wait` seconds. Per-document encode/write overhead
+    becomes per-batch overhead.
+    """
+
+    def __init__(
+        self,
+        rag,
+        batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        spool_path: Optional[str] = None,
+        job_registry: Optional[JobRegistry] = None,
+    ):
+        self.rag = rag
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.max_wait = max_wait if max_wait is not None else settings.ingest_queue_max_wait_seconds
+        # each queue (one per worker process) owns its own spool next to the configured path
+        self.spool_base = Path(spool_path or settings.ingest_queue_spool_path)
+        self.spool_path = self.spool_base.with_name(
+            f"{self.spool_base.stem}.{os.getpid()}-{uuid.uuid4().hex[:6]}{self.spool_base.suffix}"
+        )
+        self._spool_file = None
+        self.jobs = job_registry or default_jobs
+        # (job, document, size of its spool line in bytes)
+        self.buffer: List[Tuple[IngestionJob, KnowledgeDocument, int]] = []
+        # bytes at the head of the spool that belong to already-flushed documents
+        self._spool_offset = 0
+        self._pending: Dict[str, int] = {}  # job id -> documents not yet flushed
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        # serializes spool appends and offset updates, which run in worker threads
+        self._spool_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    async def start(self) -> None:
+        """Open this queue's spool, take over documents left in orphaned spools, then start the flusher."""
+        async with self._spool_lock:
+            recovered, sizes = await asyncio.to_thread(self._open_spool)
+            if recovered:
+                job = self.jobs.create("recovered")
+                self._enqueue(job, recovered, sizes)
+                logger.info("Recovered %d unflushed documents into %s (job %s)", len(recovered), self.spool_path, job.id)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush what is buffered and stop the flusher."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.buffer:
+            await self._flush()
+        async with self._spool_lock:
+            await asyncio.to_thread(self._close_spool)
+
+    async def submit(self, documents: List[KnowledgeDocument]) -> IngestionJob:
+        """Spool `documents` durably, then queue them; the job is only returned once they are on disk."""
+        job = self.jobs.create("add")
+        async with self._spool_lock:
+            try:
+                sizes = await asyncio.to_thread(self._append_spool, documents)
+            except OSError as e:
+                job.add_error(f"Could not spool documents: {e}")
+                job.finish("failed")
+                raise
+            self._enqueue(job, documents, sizes)
+        return job
+
+    def _enqueue(self, job: IngestionJob, documents: List[KnowledgeDocument], sizes: List[int]) -> None:
+        job.documents_total += len(documents)
+        job.status = "queued"
+        self._pending[job.id] = self._pending.get(job.id, 0) + len(documents)
+        was_empty = not self.buffer
+        self.buffer.extend((job, d, n) for d, n in zip(documents, sizes))
+        # wake the flusher when a batch is full, or to start the max_wait clock for a first document
+        if was_empty or len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self.buffer:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if len(self.buffer) < self.batch_size:
+                # give the batch a chance to fill up, bounded by max_wait
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self._flush()
+            except Exception:
+                logger.exception("Ingest queue flush failed")
+
+    async def _flush(self) -> None:
+        async with self._lock:
+            batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+            if not batch:
+                return
+            for job, _, _ in batch:
+                job.status = "running"
+
+            documents = [d for _, d, _ in batch]
+            added = await self.rag.add_documents_batch(documents)
+            if added == len(documents):
+                outcomes = [True] * len(batch)
+            else:
+                # a sub-batch failed; retry one by one so failures are attributed to the right job
+                outcomes = [await self.rag.add_document(d) for d in documents]
+
+            for (job, doc, _), ok in zip(batch, outcomes):
+                if ok:
+                    job.documents_added += 1
+                else:
+                    job.documents_failed += 1
+                    job.add_error(f"Failed to add document {doc.id}")
+                self._pending[job.id] -= 1
+                if self._pending[job.id] == 0:
+                    del self._pending[job.id]
+                    job.finish()
+
+            async with self._spool_lock:
+                # under the spool lock no submit can append between the emptiness check and a truncate
+                truncate = not self.buffer
+                offset = 0 if truncate else self._spool_offset + sum(n for _, _, n in batch)
+                await asyncio.to_thread(self._write_spool_offset, offset, truncate)
+                self._spool_offset = offset
+
+    # --- spool: append-only JSONL of accepted documents plus the byte offset of the
+    # first unflushed line. The buffer is FIFO, so flushed documents are always a
+    # prefix of the file. Spool I/O runs in worker threads under `_spool_lock`, so it
+    # is never interleaved, and both the appended lines and the offset are fsynced
+    # before they are relied on.
+    #
+    # Every queue (so every gunicorn worker) writes its own spool,
+    # <stem>.<pid>-<random><suffix>, and holds an exclusive flock on it while it runs.
+    # On start, a queue takes over every spool of the same base name that nobody
+    # holds (its worker exited or crashed): the unflushed documents are copied into
+    # its own spool and fsynced before the orphan is deleted. A crash between the
+    # two replays those documents twice; delivery is at least once.
+
+    @staticmethod
+    def _offset_path_for(spool_path: Path) -> Path:
+        return spool_path.with_suffix(spool_path.suffix + ".offset")
+
+    @property
+    def _offset_path(self) -> Path:
+        return self._offset_path_for(self.spool_path)
+
+    @staticmethod
+    def _try_lock(f) -> bool:
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def _orphaned_spools(self) -> List[Tuple[Path, Any]]:
+        """Open and lock the spools of exited queues; returns (path, locked file) pairs."""
+        base = self.spool_base
+        candidates = sorted(base.parent.glob(f"{base.stem}.*{base.suffix}"))
+        if base.exists():
+            # single spool written before spools were per worker
+            candidates.insert(0, base)
+        claimed = []
+        for path in candidates:
+            if path == self.spool_path:
+                continue
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            if not self._try_lock(f):
+                f.close()  # a running worker's spool
+                continue
+            try:
+                same = os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+            except FileNotFoundError:
+                same = False
+            if not same:
+                # taken over and deleted by another worker between our open and lock
+                f.close()
+                continue
+            claimed.append((path, f))
+        return claimed
+
+    def _read_spool(self, path: Path, f) -> List[KnowledgeDocument]:
+        try:
+            offset = int(self._offset_path_for(path).read_text().strip() or 0)
+        except (OSError, ValueError):
+            offset = 0
+        documents = []
+        f.seek(offset)
+        for line in f:
+            try:
+                documents.append(KnowledgeDocument(**json.loads(line)))
+            except Exception as e:
+                # unreadable line (e.g. torn write on crash): drop it
+                logger.warning("Skipping unreadable spooled document in %s: %s", path, e)
+        return documents
+
+    def _open_spool(self) -> Tuple[List[KnowledgeDocument], List[int]]:
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        orphans = self._orphaned_spools()
+        try:
+            self._spool_file = open(self.spool_path, "ab")
+            self._try_lock(self._spool_file)
+            self._spool_offset = 0
+            documents: List[KnowledgeDocument] = []
+            for path, f in orphans:
+                documents.extend(self._read_spool(path, f))
+            sizes = self._append_spool(documents) if documents else []
+            # the documents are durable in our spool now; the orphans can go
+            for path, _ in orphans:
+                for stale in (path, self._offset_path_for(path)):
+                    try:
+                        stale.unlink()
+                    except FileNotFoundError:
+                        pass
+        finally:
+            for _, f in orphans:
+                f.close()
+        return documents, sizes
+
+    def _close_spool(self) -> None:
+        if self._spool_file is None:
+            return
+        empty = not self.buffer
+        self._spool_file.close()
+        self._spool_file = None
+        if empty:
+            # clean shutdown with nothing pending: leave nothing to recover
+            for path in (self.spool_path, self._offset_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _append_spool(self, documents: List[KnowledgeDocument]) -> List[int]:
+        lines = [(d.json() + "\n").encode("utf-8") for d in documents]
+        self._spool_file.write(b"".join(lines))
+        self._spool_file.flush()
+        os.fsync(self._spool_file.fileno())
+        return [len(line) for line in lines]
+
+    def _write_spool_offset(self, offset: int, truncate: bool) -> None:
+        if truncate:
+            # everything is flushed: truncate instead of letting the file grow
+            self._spool_file.truncate(0)
+            os.fsync(self._spool_file.fileno())
+        tmp = self._offset_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._offset_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"buffered": len(self.buffer), "pending_jobs": len(self._pending), "batch_size": self.batch_size, "max_wait": self.max_wait}
@@ -0,0 +1,381 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {".md": "markdown", ".markdown": "markdown", ".html": "html", ".htm": "html", ".txt": "text", ".jsonl": "jsonl"}
+
+
+class IngestionJob:
+    """Progress of one background ingestion job (file upload or queued /knowledge/add documents)."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.files: List[str] = []
+        self.bytes_received = 0
+        self.documents_total = 0
+        self.documents_added = 0
+        self.documents_failed = 0
+        self.errors: List[str] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def add_error(self, message: str) -> None:
+        # keep the status payload small for jobs with many bad inputs
+        if len(self.errors) < 50:
+            self.errors.append(message)
+
+    def finish(self, status: Optional[str] = None) -> None:
+        if status is None:
+            status = "failed" if not self.documents_added and (self.documents_total or self.errors) else "completed"
+        self.status = status
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        done = self.documents_added + self.documents_failed
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "files": self.files,
+            "bytes_received": self.bytes_received,
+            "documents_total": self.documents_total,
+            "documents_added": self.documents_added,
+            "documents_failed": self.documents_failed,
+            "progress": round(done / self.documents_total, 3) if self.documents_total else (1.0 if self.finished_at else 0.0),
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    """In-memory job table; finished jobs are kept for `retention` seconds."""
+
+    def __init__(self, retention: float = 3600.0):
+        self.retention = retention
+        self.jobs: Dict[str, IngestionJob] = {}
+
+    def create(self, kind: str) -> IngestionJob:
+        self._prune()
+        job = IngestionJob(kind)
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+
+jobs = JobRegistry()
+
+
+# --- Parsing and chunking (run in worker processes; keep free of heavy imports) ---
+
+def chunk_text(text: str, max_chars: int, overlap: int = 0) -> List[str]:
+    """Split text on paragraph boundaries into chunks of at most `max_chars` (long paragraphs are hard-split)."""
+    overlap = min(overlap, max_chars // 2)
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks: List[str] = []
+    current = ""
+    for para in paragraphs:
+        while len(para) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:max_chars])
+            para = para[max_chars - overlap:] if overlap else para[max_chars:]
+        if current and len(current) + len(para) + 2 > max_chars:
+            chunks.append(current)
+            current = current[-overlap:] + "\n\n" + para if overlap else para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _markdown_sections(text: str, default_title: str) -> List[Dict[str, str]]:
+    """Split Markdown on headings so each chunk keeps its section title."""
+    sections = []
+    title, lines = default_title, []
+    for line in text.splitlines():
+        heading = re.match(r"^#{1,3}\s+(.*)", line)
+        if heading:
+            if any(l.strip() for l in lines):
+                sections.append({"title": title, "content": "\n".join(lines)})
+            title, lines = heading.group(1).strip(), []
+        else:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append({"title": title, "content": "\n".join(lines)})
+    return sections
+
+
+def _html_sections(raw: str, default_title: str) -> List[Dict[str, str]]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(raw, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer", "header"]):
+        tag.decompose()
+    title = default_title
+    if soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    elif soup.h1:
+        title = soup.h1.get_text(strip=True)
+    text = soup.get_text("\n")
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return [{"title": title, "content": text}]
+
+
+def _doc_id(filename: str, content: str) -> str:
+    return "upload-" + hashlib.sha1(f"{filename}\0{content}".encode("utf-8")).hexdigest()[:20]
+
+
+def parse_and_chunk(path: str, filename: str, max_chars: int) -> List[Dict[str, Any]]:
+    """Parse one uploaded file into KnowledgeDocument-shaped dicts."""
+    kind = SUPPORTED_EXTENSIONS.get(Path(filename).suffix.lower())
+    stem = Path(filename).stem
+    docs: List[Dict[str, Any]] = []
+
+    if kind == "jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "content" not in record:
+                    raise ValueError(f"{filename}:{line_no}: missing 'content'")
+                record.setdefault("title", f"{stem} #{line_no}")
+                record.setdefault("source", filename)
+                record.setdefault("document_type", "documentation")
+                record.setdefault("metadata", {})
+                record.setdefault("id", _doc_id(filename, record["content"]))
+                docs.append(record)
+        return docs
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+    if kind == "markdown":
+        sections = _markdown_sections(raw, stem)
+    elif kind == "html":
+        sections = _html_sections(raw, stem)
+    else:
+        sections = [{"title": stem, "content": raw}]
+
+    for section in sections:
+        chunks = chunk_text(section["content"], max_chars)
+        for i, chunk in enumerate(chunks):
+            title = section["title"] if len(chunks) == 1 else f"{section['title']} ({i + 1}/{len(chunks)})"
+            docs.append({
+                "id": _doc_id(filename, chunk),
+                "title": title,
+                "content": chunk,
+                "source": filename,
+                "document_type": "documentation",
+                "metadata": {"upload_format": kind},
+            })
+    return docs
+
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Process pool for parsing. Uses spawn: forking a server process that holds torch threads is unsafe."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=settings.ingest_parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+class UploadRejected(Exception):
+    """An upload refused while it is being received; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _multipart():
+    try:
+        from python_multipart.multipart import MultipartParser, parse_options_header
+    except ImportError:  # python-multipart < 0.0.13
+        from multipart.multipart import MultipartParser, parse_options_header
+    return MultipartParser, parse_options_header
+
+
+class _MultipartEvents:
+    """Push-parser callbacks turned into a list of ("part", headers) / ("data", bytes) / ("end", None) events."""
+
+    def __init__(self):
+        self.events: List[tuple] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+
+    def callbacks(self) -> Dict[str, Any]:
+        names = ("on_part_begin", "on_header_field", "on_header_value", "on_header_end", "on_headers_finished", "on_part_data", "on_part_end")
+        return {name: getattr(self, name) for name in names}
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def on_headers_finished(self) -> None:
+        self.events.append(("part", self._headers))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        # copy: the parser reuses its buffer
+        self.events.append(("data", bytes(data[start:end])))
+
+    def on_part_end(self) -> None:
+        self.events.append(("end", None))
+
+    def drain(self) -> List[tuple]:
+        events, self.events = self.events, []
+        return events
+
+
+async def receive_upload(stream: AsyncIterator[bytes], content_type: str, job: IngestionJob, upload_dir: Path, max_bytes: int) -> List[Dict[str, str]]:
+    """
+    Parse a multipart/form-data request body as it arrives and write every file
+    part straight to `upload_dir` (as "<index>-<name>", so equal names do not
+    collide). At most one network chunk is held in memory. Raises UploadRejected:
+    413 as soon as the body exceeds `max_bytes`, 415 for an unsupported file
+    type, 400 for a body that is not multipart or carries no file. Returns
+    {"path", "filename"} for each saved file.
+    """
+    MultipartParser, parse_options_header = _multipart()
+    mime, params = parse_options_header(content_type or "")
+    boundary = params.get(b"boundary")
+    if mime != b"multipart/form-data" or not boundary:
+        raise UploadRejected(400, "Expected a multipart/form-data body")
+
+    handler = _MultipartEvents()
+    parser = MultipartParser(boundary, handler.callbacks())
+    saved: List[Dict[str, str]] = []
+    out = None
+    try:
+        async for chunk in stream:
+            job.bytes_received += len(chunk)
+            if job.bytes_received > max_bytes:
+                raise UploadRejected(413, f"Upload exceeds {max_bytes} bytes")
+            parser.write(chunk)
+            pending = bytearray()
+            for kind, value in handler.drain():
+                if kind == "data":
+                    if out is not None:
+                        pending += value
+                    continue
+                if pending:
+                    await asyncio.to_thread(out.write, bytes(pending))
+                    pending = bytearray()
+                if kind == "part":
+                    _, disposition = parse_options_header(value.get(b"content-disposition", b""))
+                    if b"filename" not in disposition:
+                        continue  # plain form field
+                    filename = Path(disposition[b"filename"].decode("utf-8", "replace")).name
+                    if Path(filename).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                        raise UploadRejected(415, f"Unsupported file type: {filename} (supported: {', '.join(sorted(SUPPORTED_EXTENSIONS))})")
+                    target = upload_dir / f"{len(saved)}-{filename}"
+                    out = await asyncio.to_thread(open, target, "wb")
+                    job.files.append(filename)
+                    saved.append({"path": str(target), "filename": filename})
+                elif kind == "end" and out is not None:
+                    await asyncio.to_thread(out.close)
+                    out = None
+            if pending:
+                await asyncio.to_thread(out.write, bytes(pending))
+        parser.finalize()
+    finally:
+        if out is not None:
+            out.close()
+    if not saved:
+        raise UploadRejected(400, "No files in the upload")
+    return saved
+
+
+async def run_upload_job(job: IngestionJob, rag, files: List[Dict[str, str]]) -> None:
+    """
+    Parse saved uploads in the process pool and ingest them in embedding batches.
+    `files` holds {"path", "filename"}; temporary files are removed afterwards.
+    """
+    from src.models import KnowledgeDocument
+
+    job.status = "running"
+    loop = asyncio.get_running_loop()
+    batch_size = settings.ingest_batch_size
+    try:
+        parsed = await asyncio.gather(
+            *[loop.run_in_executor(get_parse_pool(), parse_and_chunk, f["path"], f["filename"], settings.ingest_chunk_chars) for f in files],
+            return_exceptions=True,
+        )
+        documents: List[KnowledgeDocument] = []
+        for f, result in zip(files, parsed):
+            if isinstance(result, Exception):
+                job.add_error(f"{f['filename']}: {result}")
+                continue
+            for d in result:
+                try:
+                    documents.append(KnowledgeDocument(**d))
+                except Exception as e:
+                    job.documents_failed += 1
+                    job.add_error(f"{f['filename']}: invalid document {d.get('id')}: {e}")
+        job.documents_total = len(documents) + job.documents_failed
+
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i + batch_size]
+            added = await rag.add_documents_batch(batch)
+            job.documents_added += added
+            job.documents_failed += len(batch) - added
+        job.finish()
+    except Exception as e:
+        logger.exception("Upload job %s failed", job.id)
+        job.add_error(str(e))
+        job.finish("failed")
+    finally:
+        for f in files:
+            try:
+                os.remove(f["path"])
+            except OSError:
+                pass
+        logger.info("Upload job %s finished: %s", job.id, job.to_dict())
@@ -0,0 +1,308 @@
+import heapq
+import logging
+import math
+import re
+from typing import Dict, Any, List, Optional, Set
+
+from src.roadmap_library import infer_goal, parse_weekly_hours
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTY_RANK = {"beginner": 0, "intermediate": 1, "advanced": 2}
+
+# Topics that anchor each goal bucket; documents tagged with these are relevant
+# even if the vector search did not retrieve them.
+GOAL_TOPICS: Dict[str, Set[str]] = {
+    "frontend": {"html", "css", "javascript", "react", "responsive", "layout"},
+    "backend": {"nodejs", "python", "django", "backend", "server", "sql", "api"},
+    "full-stack": {"html", "css", "javascript", "react", "nodejs", "backend", "server", "sql", "api"},
+}
+
+# KB `estimated_time` is reading time; a module also covers practice and a small project.
+PRACTICE_MULTIPLIER = 8
+DEFAULT_MODULE_HOURS = 6.0
+DEFAULT_WEEKLY_HOURS = 8.0
+WEEKS_PER_PHASE = 4
+
+_TIME_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(minutes?|mins?|hours?|hrs?|h|weeks?)", re.IGNORECASE)
+
+
+def _as_list(value: Any) -> List[str]:
+    """Chroma metadata cannot hold lists, so topics/prerequisites may arrive comma-separated."""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(",")
+    return [str(v).strip().lower() for v in items if str(v).strip()]
+
+
+def _normalize(term: str) -> str:
+    return re.sub(r"[^a-z0-9+#]", "", term.lower())
+
+
+def parse_study_hours(estimated_time: Any) -> float:
+    """Convert KB `estimated_time` (e.g. '45 minutes', '2 hours') into hours of study including practice."""
+    match = _TIME_RE.search(str(estimated_time or ""))
+    if not match:
+        return DEFAULT_MODULE_HOURS
+    amount, unit = float(match.group(1)), match.group(2).lower()
+    if unit.startswith("min"):
+        hours = amount / 60.0
+    elif unit.startswith("week"):
+        # calendar estimates already include practice time
+        return amount * DEFAULT_WEEKLY_HOURS
+    else:
+        hours = amount
+    return max(1.0, hours * PRACTICE_MULTIPLIER)
+
+
+class KnowledgeGraph:
+    """Prerequisite DAG over knowledge-base documents built from their metadata."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        for r in records:
+            doc_id = r.get("id")
+            if not doc_id:
+                continue
+            self.nodes[doc_id] = {
+                "id": doc_id,
+                "title": r.get("title", "Untitled"),
+                "source": r.get("source", "unknown"),
+                "url": r.get("url"),
+                "document_type": r.get("document_type", "documentation"),
+                "difficulty": str(r.get("difficulty", "beginner")).lower(),
+                "topics": _as_list(r.get("topics")),
+                "prerequisites": _as_list(r.get("prerequisites")),
+                "hours": parse_study_hours(r.get("estimated_time")),
+            }
+
+        # topic -> documents teaching it
+        self.providers: Dict[str, Set[str]] = {}
+        for doc_id, node in self.nodes.items():
+            for t in node["topics"]:
+                self.providers.setdefault(_normalize(t), set()).add(doc_id)
+
+        # doc -> documents it depends on
+        self.parents: Dict[str, Set[str]] = {doc_id: set() for doc_id in self.nodes}
+        for doc_id, node in self.nodes.items():
+            for prereq in node["prerequisites"]:
+                for provider in self._providers_for(prereq):
+                    if provider != doc_id:
+                        self.parents[doc_id].add(provider)
+
+    def _providers_for(self, prereq: str) -> Set[str]:
+        """Match a prerequisite like 'css basics' to documents whose topics include 'css'."""
+        key = _normalize(prereq)
+        if key in self.providers:
+            return self.providers[key]
+        found: Set[str] = set()
+        for word in prereq.split():
+            found |= self.providers.get(_normalize(word), set())
+        return found
+
+    def closure(self, seeds: Set[str]) -> Set[str]:
+        """Seeds plus all their transitive prerequisites."""
+        selected: Set[str] = set()
+        stack = [s for s in seeds if s in self.nodes]
+        while stack:
+            doc_id = stack.pop()
+            if doc_id in selected:
+                continue
+            selected.add(doc_id)
+            stack.extend(self.parents[doc_id] - selected)
+        return selected
+
+    def topological_order(self, selected: Set[str], relevance: Dict[str, float]) -> List[str]:
+        """
+        Kahn's algorithm restricted to `selected`. Ties are broken by difficulty,
+        then by relevance, so easier and more relevant modules come first.
+        Cycles (mutual prerequisites) are broken by emitting the easiest remaining node.
+        """
+        def priority(doc_id: str):
+            return (DIFFICULTY_RANK.get(self.nodes[doc_id]["difficulty"], 1), -relevance.get(doc_id, 0.0), doc_id)
+
+        indegree = {d: len(self.parents[d] & selected) for d in selected}
+        children: Dict[str, List[str]] = {d: [] for d in selected}
+        for d in selected:
+            for p in self.parents[d] & selected:
+                children[p].append(d)
+
+        ready = [(priority(d), d) for d, deg in indegree.items() if deg == 0]
+        heapq.heapify(ready)
+        order: List[str] = []
+        remaining = set(selected)
+        while remaining:
+            if not ready:
+                # cycle: release the easiest blocked node
+                d = min(remaining, key=priority)
+                indegree[d] = 0
+                ready.append((priority(d), d))
+                heapq.heapify(ready)
+            _, d = heapq.heappop(ready)
+            if d not in remaining:
+                continue
+            remaining.discard(d)
+            order.append(d)
+            for c in children[d]:
+                indegree[c] -= 1
+                if indegree[c] == 0 and c in remaining:
+                    heapq.heappush(ready, (priority(c), c))
+        return order
+
+
+class LocalRoadmapGenerator:
+    """
+    Deterministic roadmap generator used when Gemini is unavailable. Builds a
+    prerequisite graph from knowledge-base metadata, orders the modules relevant
+    to the request and packs them into phases by the user's weekly hours.
+    """
+
+    def __init__(self):
+        self.graph: Optional[KnowledgeGraph] = None
+        self.revision: Optional[int] = None
+
+    def rebuild(self, records: List[Dict[str, Any]], revision: Optional[int] = None) -> None:
+        self.use(KnowledgeGraph(records), revision)
+
+    def use(self, graph: KnowledgeGraph, revision: Optional[int] = None) -> None:
+        """Swap in a graph built elsewhere (e.g. in a worker thread)."""
+        self.graph, self.revision = graph, revision
+        logger.info("Built local roadmap graph with %d modules", len(graph.nodes))
+
+    def _seed_documents(self, goal: Optional[str], retrieved: List[Dict[str, Any]]) -> Dict[str, float]:
+        relevance: Dict[str, float] = {}
+        for r in retrieved or []:
+            if r.get("id") in self.graph.nodes:
+                relevance[r["id"]] = max(relevance.get(r["id"], 0.0), float(r.get("score", 0.0)))
+        goal_topics = {_normalize(t) for t in GOAL_TOPICS.get(goal or "", set())}
+        for doc_id, node in self.graph.nodes.items():
+            if goal_topics & {_normalize(t) for t in node["topics"]}:
+                relevance.setdefault(doc_id, 0.0)
+        return relevance
+
+    def _module(self, node: Dict[str, Any], module_id: int) -> Dict[str, Any]:
+        topics = node["topics"] or [node["title"]]
+        return {
+            "module_id": module_id,
+            "module_name": node["title"],
+            "concepts": topics,
+            "resources": [{
+                "type": node["document_type"],
+                "title": node["title"],
+                "url": node["url"],
+                "source": node["source"],
+                "difficulty": node["difficulty"],
+            }],
+            "hands_on_project": {
+                "title": f"Practice project: {topics[0]}",
+                "description": f"Build a small project that applies {', '.join(topics[:3])}.",
+                "skills_practiced": topics[:3],
+                "deliverables": ["repo", "README"],
+                "estimated_time": f"{math.ceil(node['hours'] / 2)} hours",
+                "difficulty": node["difficulty"],
+            },
+            "prerequisites": node["prerequisites"],
+            "success_metrics": [f"Can explain and apply {t}" for t in topics[:2]],
+            "estimated_time": f"{math.ceil(node['hours'])} hours",
+        }
+
+    def _pack_phases(self, order: List[str], weekly_hours: float) -> List[Dict[str, Any]]:
+        capacity = weekly_hours * WEEKS_PER_PHASE
+        phases: List[List[str]] = []
+        current: List[str] = []
+        used = 0.0
+        for doc_id in order:
+            node = self.graph.nodes[doc_id]
+            hours = node["hours"]
+            # start a new phase when the week budget is used up or the material steps up in difficulty
+            harder = current and DIFFICULTY_RANK.get(node["difficulty"], 1) > DIFFICULTY_RANK.get(self.graph.nodes[current[-1]]["difficulty"], 1)
+            if current and (used + hours > capacity or harder):
+                phases.append(current)
+                current, used = [], 0.0
+            current.append(doc_id)
+            used += hours
+        if current:
+            phases.append(current)
+
+        result = []
+        module_id = 1
+        for i, ids in enumerate(phases, 1):
+            nodes = [self.graph.nodes[d] for d in ids]
+            hours = sum(n["hours"] for n in nodes)
+            modules = []
+            for n in nodes:
+                modules.append(self._module(n, module_id))
+                module_id += 1
+            difficulties = sorted({n["difficulty"] for n in nodes}, key=lambda d: DIFFICULTY_RANK.get(d, 1))
+            result.append({
+                "phase_id": i,
+                "title": ", ".join(list(dict.fromkeys(n["title"].split(" - ")[0] for n in nodes))[:3]),
+                "duration": f"{max(1, math.ceil(hours / weekly_hours))} weeks",
+                "learning_objectives": [f"Complete {n['title']}" for n in nodes],
+                "difficulty": difficulties[-1] if difficulties else "beginner",
+                "modules": modules,
+            })
+        return result
+
+    def generate(self, message: str, user_profile: Optional[Dict[str, Any]], retrieved: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return a roadmap response dict, or None if the knowledge base has nothing relevant."""
+        if self.graph is None or not self.graph.nodes:
+            return None
+        profile = user_profile or {}
+        goal = infer_goal(message, profile)
+        weekly_hours = parse_weekly_hours(profile.get("time_commitment")) or parse_weekly_hours(message) or DEFAULT_WEEKLY_HOURS
+
+        relevance = self._seed_documents(goal, retrieved)
+        if not relevance:
+            return None
+        selected = self.graph.closure(set(relevance))
+        order = self.graph.topological_order(selected, relevance)
+        phases = self._pack_phases(order, weekly_hours)
+
+        all_topics = list(dict.fromkeys(t for d in order for t in self.graph.nodes[d]["topics"]))
+        phases.append({
+            "phase_id": len(phases) + 1,
+            "title": "Capstone Project",
+            "duration": f"{max(2, math.ceil(20 / weekly_hours))} weeks",
+            "learning_objectives": ["Integrate everything learned into one portfolio project"],
+            "modules": [{
+                "module_id": len(order) + 1,
+                "module_name": "Capstone Portfolio Project",
+                "concepts": all_topics[:8],
+                "resources": [],
+                "hands_on_project": {
+                    "title": "Portfolio capstone",
+                    "description": f"Build and deploy an application combining {', '.join(all_topics[:5])}.",
+                    "skills_practiced": all_topics[:8],
+                    "deliverables": ["deployed app", "repo", "README"],
+                    "estimated_time": "20 hours",
+                    "difficulty": "intermediate",
+                },
+                "prerequisites": [self.graph.nodes[d]["title"] for d in order[-3:]],
+                "success_metrics": ["Application deployed and documented"],
+            }],
+        })
+
+        total_weeks = sum(int(p["duration"].split()[0]) for p in phases)
+        progression = list(dict.fromkeys(p.get("difficulty", "intermediate") for p in phases))
+        return {
+            "user_profile": {
+                "current_level": profile.get("current_level", "unknown"),
+                "primary_goal": profile.get("primary_goal") or (f"{goal} developer" if goal else "general software development"),
+                "timeline": profile.get("timeline", "unspecified"),
+                "learning_style": profile.get("learning_style", "unspecified"),
+                "time_commitment": profile.get("time_commitment") or f"{weekly_hours:g} hrs/week",
+            },
+            "roadmap": {
+                "phases": phases,
+                "total_duration": f"{total_weeks} weeks",
+                "difficulty_progression": progression,
+                "key_technologies": all_topics[:10],
+            },
+            "milestone_checkpoints": [f"Finish phase {p['phase_id']}: {p['title']}" for p in phases],
+            "next_steps": f"Start with '{phases[0]['modules'][0]['module_name']}' and its practice project.",
+            "generator": "local_knowledge_graph",
+        }
@@ -0,0 +1,324 @@
+"""
+Pipeline metrics with Prometheus text exposition.
+
+When prometheus_client is installed (requirements.txt) the metrics are
+prometheus_client objects; with PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py
+sets it when APP_WORKERS > 1) every worker writes its samples to that
+directory and /metrics aggregates all workers, whichever one serves the
+scrape. Gauges computed at scrape time (`callback`) describe the serving
+worker only and carry a `pid` label in that mode.
+
+Without prometheus_client, counters, gauges and histograms are plain Python
+objects updated on the event loop or from worker threads (one lock per
+metric), and `render()` reports this process only: with several workers each
+scrape sees one worker's series.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import prometheus_client
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        documentation = self.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        return [f"# HELP {self.name} {documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Gauge set directly, or computed at scrape time by `callback` (returning {label values: value})."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                items = list(self.callback().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), total[0]) for k, (counts, total) in self._series.items()]
+        lines = self.header()
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _PrometheusMetric:
+    """Adapter giving a prometheus_client metric the keyword-label API used across the code base."""
+
+    def __init__(self, name: str, metric: Any, labelnames: Sequence[str]):
+        self.name = name
+        self.metric = metric
+        self.labelnames = tuple(labelnames)
+
+    def _child(self, labels: Dict[str, str]) -> Any:
+        if not self.labelnames:
+            return self.metric
+        return self.metric.labels(*(str(labels.get(n, "")) for n in self.labelnames))
+
+
+class PrometheusCounter(_PrometheusMetric):
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._child(labels).inc(amount)
+
+
+class PrometheusGauge(_PrometheusMetric):
+    def set(self, value: float, **labels: str) -> None:
+        self._child(labels).set(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._child(labels).inc(amount)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self._child(labels).dec(amount)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class PrometheusHistogram(_PrometheusMetric):
+    def observe(self, value: float, **labels: str) -> None:
+        self._child(labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class _CallbackCollector:
+    """prometheus_client collector for the scrape-time gauges of one MetricsRegistry."""
+
+    def __init__(self, gauges: List[Gauge], pid_label: bool):
+        self.gauges = gauges
+        self.pid_label = pid_label
+
+    def describe(self) -> List[Any]:
+        return []
+
+    def collect(self) -> Iterator[Any]:
+        pid = str(os.getpid())
+        for gauge in self.gauges:
+            labelnames = list(gauge.labelnames) + (["pid"] if self.pid_label else [])
+            family = GaugeMetricFamily(gauge.name, gauge.documentation, labels=labelnames)
+            try:
+                items = list(gauge.callback().items())
+            except Exception:
+                items = []
+            for key, value in items:
+                family.add_metric(list(key) + ([pid] if self.pid_label else []), value)
+            yield family
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Union[_Metric, _PrometheusMetric]] = {}
+        self._callbacks: List[Gauge] = []
+        self.multiprocess = prometheus_client is not None and bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+        self._registry = None
+        if prometheus_client is not None:
+            self._registry = prometheus_client.CollectorRegistry(auto_describe=True)
+            if not self.multiprocess:
+                self._registry.register(_CallbackCollector(self._callbacks, pid_label=False))
+
+    def register(self, metric: Union[_Metric, _PrometheusMetric]) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Union[Counter, PrometheusCounter]:
+        if self._registry is not None:
+            return self.register(PrometheusCounter(name, prometheus_client.Counter(name, documentation, labelnames, registry=self._registry), labelnames))
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback=None) -> Union[Gauge, PrometheusGauge]:
+        if callback is not None:
+            gauge = Gauge(name, documentation, labelnames, callback)
+            self._callbacks.append(gauge)
+            return self.register(gauge)
+        if self._registry is not None:
+            # livesum: in multiprocess mode, add up the values of the workers that are alive
+            metric = prometheus_client.Gauge(name, documentation, labelnames, registry=self._registry, multiprocess_mode="livesum")
+            return self.register(PrometheusGauge(name, metric, labelnames))
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Union[Histogram, PrometheusHistogram]:
+        if self._registry is not None:
+            metric = prometheus_client.Histogram(name, documentation, labelnames, registry=self._registry, buckets=tuple(sorted(buckets)))
+            return self.register(PrometheusHistogram(name, metric, labelnames))
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        if self._registry is not None:
+            registry = self._registry
+            if self.multiprocess:
+                # samples of every worker come from the files in PROMETHEUS_MULTIPROC_DIR
+                from prometheus_client import multiprocess
+
+                registry = prometheus_client.CollectorRegistry()
+                multiprocess.MultiProcessCollector(registry)
+                registry.register(_CallbackCollector(self._callbacks, pid_label=True))
+            return prometheus_client.generate_latest(registry).decode("utf-8")
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# --- pipeline metrics ---
+
+EMBEDDING_SECONDS = metrics.histogram("asdsadf_embedding_seconds", "Time spent encoding texts with the embedding model", ["operation"])
+EMBEDDING_TEXTS = metrics.counter("asdsadf_embedding_texts_total", "Texts encoded by the embedding model", ["operation"])
+VECTOR_QUERY_SECONDS = metrics.histogram("asdsadf_vector_query_seconds", "Chroma query latency", ["operation"])
+VECTOR_WRITE_SECONDS = metrics.histogram("asdsadf_vector_write_seconds", "Chroma write latency")
+GEMINI_SECONDS = metrics.histogram("asdsadf_gemini_seconds", "Gemini generate_content latency", ["outcome"])
+GEMINI_TOKENS = metrics.counter("asdsadf_gemini_tokens_total", "Gemini tokens reported by usage metadata", ["kind"])
+CONTEXT_CHARS = metrics.histogram("asdsadf_context_chars", "Size of the retrieval context passed to generation", buckets=SIZE_BUCKETS)
+REQUEST_SECONDS = metrics.histogram("asdsadf_request_seconds", "End-to-end process_query latency", ["kind", "source"])
+REQUESTS_IN_FLIGHT = metrics.gauge("asdsadf_requests_in_flight", "Queries currently being processed")
+FALLBACKS = metrics.counter("asdsadf_fallbacks_total", "Responses produced by a fallback or degraded path", ["kind"])
+DEADLINE_MISSES = metrics.counter("asdsadf_deadline_misses_total", "Pipeline stages that ran out of their deadline budget", ["stage"])
+RERANK_SECONDS = metrics.histogram("asdsadf_rerank_seconds", "Cross-encoder scoring latency (cache misses only)")
+CACHE_REQUESTS = metrics.counter("asdsadf_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
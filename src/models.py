@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, root_validator
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Literal, Optional
 from enum import Enum
 
 class PromptType(str, Enum):
@@ -31,6 +31,9 @@ class UserQuery(BaseModel):
     prompt_type: PromptType = Field(PromptType.ZERO_SHOT, description="Type of prompting to use")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context for the query")
     user_profile: Optional[Dict[str, Any]] = Field(None, description="User's profile information")
+    timeout_seconds: Optional[float] = Field(None, description="Per-request deadline override in seconds (capped server-side)")
+    include_context: bool = Field(False, description="Include the retrieved context text in the response")
+    source_format: Literal["names", "ids", "none"] = Field("names", description="Report retrieval sources by name, by document id, or not at all")
 
     class Config:
         allow_population_by_field_name = True
@@ -159,6 +162,8 @@ class SystemHealth(BaseModel):
     agent_initialized: bool = Field(..., description="Whether the agent is initialized")
     rag_system_ready: bool = Field(..., description="Whether RAG system is ready")
     gemini_api_available: bool = Field(..., description="Whether Gemini API is available")
+    embedding_model_loaded: bool = Field(False, description="Whether the embedding model is loaded")
+    gemini_circuit: str = Field("open", description="closed: Gemini in use; open: degraded mode, re-probed periodically")
     knowledge_base_stats: Dict[str, Any] = Field(default_factory=dict, description="Knowledge base statistics")
     version: Optional[str] = Field(None, description="Application version")
     active_sessions: Optional[int] = Field(0, description="Number of active sessions")
@@ -169,6 +174,22 @@ class QueryResponse(BaseModel):
     response: Dict[str, Any] = Field(default_factory=dict, description="Structured response generated by the agent")
     context_used: List[str] = Field(default_factory=list, description="Context snippets used from the KB")
     retrieval_sources: List[str] = Field(default_factory=list, description="Sources used during retrieval")
+    retrieval_ids: List[str] = Field(default_factory=list, description="Ids of the documents retrieved")
     processing_time: float = Field(0.0, description="Processing time in seconds")
     session_id: Optional[str] = Field(None, description="Session identifier for the query")
-    metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
\ No newline at end of file
+    metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
+
+class BatchQueryRequest(BaseModel):
+    """Batch of chat queries processed with shared retrieval."""
+    queries: List[UserQuery] = Field(..., description="Queries to process")
+    max_concurrency: Optional[int] = Field(None, description="Upper bound on concurrent generations (capped server-side)")
+
+class BatchItemResult(BaseModel):
+    """Result for one query of a batch; failures are reported per item."""
+    index: int = Field(..., description="Position of the query in the request")
+    success: bool = Field(..., description="Whether the query was processed")
+    data: Optional[Dict[str, Any]] = Field(None, description="Structured response for the query")
+    sources: List[str] = Field(default_factory=list, description="Sources used during retrieval")
+    processing_time: Optional[float] = Field(None, description="Processing time in seconds")
+    session_id: Optional[str] = Field(None, description="Session identifier for the query")
+    error: Optional[str] = Field(None, description="Error message if the query failed")
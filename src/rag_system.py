@@ -1,11 +1,8 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
 import asyncio
 from typing import List, Dict, Any, Optional
 import logging
 import uuid
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 
 from src.config import settings
 from src.models import KnowledgeDocument
@@ -26,6 +23,10 @@ class RAGSystem:
         if self.initialized:
             return
         try:
+            import chromadb
+            from chromadb.config import Settings as ChromaSettings
+            from sentence_transformers import SentenceTransformer
+
             Path(settings.chroma_persist_directory).mkdir(parents=True, exist_ok=True)
             self.client = chromadb.PersistentClient(
                 path=settings.chroma_persist_directory,
@@ -156,63 +157,185 @@ class RAGSystem:
         except Exception as e:
             logger.error(f"Reset error: {e}")
             return False
-import chromadb
-from chromadb.config import Settings as ChromaSettings
+# chromadb and sentence_transformers (torch) are imported lazily by src.resources
 import asyncio
-from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 import logging
 import uuid
 import json
+import time
 from pathlib import Path
 
 from src.config import settings
 from src.models import KnowledgeDocument
+from src.resources import registry
+from src.metrics import CACHE_REQUESTS, EMBEDDING_SECONDS, EMBEDDING_TEXTS, VECTOR_QUERY_SECONDS, VECTOR_WRITE_SECONDS
+from src.embedding_cache import content_hash
+from src.timing import stage
+from src.vector_storage import FullVectorStore, Reducer, VectorLayout, distances
+from src.snapshot import PROJECTION, iter_snapshot, read_manifest, write_snapshot
+from src.vector_store import AsyncCollection, run_blocking
+from src.batching import AdaptiveBatcher, IngestReport
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: no cross-process fit lock
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+def _flatten_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Chroma only stores scalar metadata; store list values (topics, prerequisites) comma-separated."""
+    flat = {}
+    for key, value in metadata.items():
+        if isinstance(value, (list, tuple, set)):
+            flat[key] = ", ".join(str(v) for v in value)
+        elif hasattr(value, "value"):
+            flat[key] = value.value  # enums such as DocumentType
+        elif value is None:
+            continue
+        else:
+            flat[key] = value
+    return flat
+
+
 class RAGSystem:
     """Retrieval-Augmented Generation system using ChromaDB."""
     
+    # How often a process re-reads the shared projection version (see _sync_projection)
+    PROJECTION_CHECK_SECONDS = 1.0
+    
     def __init__(self):
         """Initialize the RAG system."""
         self.client = None
         self.collection = None
+        # Async facade over the collection; all Chroma I/O from async code goes through it (src/vector_store.py)
+        self.store: Optional[AsyncCollection] = None
         self.embedding_model = None
         self.initialized = False
+        # Bumped on every write so derived structures (e.g. the local roadmap graph) know when to rebuild
+        self.revision = 0
+        # Vector layout of the collection; reduced layouts also use a reducer and a full-vector store
+        self.layout = VectorLayout()
+        self.reducer: Optional[Reducer] = None
+        self.full_vectors: Optional[FullVectorStore] = None
+        # Version of the loaded PCA projection (shared through the full-vector store) and when it was last checked
+        self._projection_version: Optional[str] = None
+        self._projection_checked = 0.0
+        self._autofit_task: Optional[asyncio.Task] = None
+        self._refit_lock = asyncio.Lock()
+        # Token-budgeted embedding batches, tuned across ingestion runs
+        self.batcher = AdaptiveBatcher()
+        self.last_ingest_report: Dict[str, Any] = {}
+        # Worker pool kept open across add_documents_batch calls by `embedding_workers`
+        self._worker_pool = None
+    
+    def _create_collection(self):
+        """Create the collection with the currently configured vector layout."""
+        return self.client.create_collection(
+            name="asdsadf_knowledge",
+            metadata={"description": "ASDSADF knowledge base for RAG", **VectorLayout.from_settings().to_metadata()}
+        )
+    
+    def _open_vector_layout(self) -> None:
+        """Read the collection's layout and open its reducer and full-vector store."""
+        if self.full_vectors is not None:
+            self.full_vectors.close()
+        self.store = AsyncCollection(self.collection)
+        self.layout = VectorLayout.from_metadata(self.collection.metadata)
+        self.reducer = self.full_vectors = None
+        if self.layout.reduced:
+            directory = Path(settings.vector_store_directory)
+            self.reducer = Reducer.load(directory / f"{self.collection.name}.pca.npz", self.layout.search_dim, self.layout.reduction)
+            self.full_vectors = FullVectorStore(directory / f"{self.collection.name}.sqlite3", self.layout.storage_dtype)
+            self._projection_version = self.full_vectors.get_meta("projection_version")
+            self._projection_checked = time.monotonic()
+            logger.info(f"Vector layout: {self.layout.to_dict()}")
+    
+    @property
+    def _projection_path(self) -> Path:
+        return Path(settings.vector_store_directory) / f"{self.collection.name}.pca.npz"
+    
+    async def _sync_projection(self, force: bool = False) -> None:
+        """
+        Reload the PCA projection when another process refitted it. The version
+        is read at most once per PROJECTION_CHECK_SECONDS, so queries and stored
+        vectors can disagree only for that long after a refit.
+        """
+        if not self.layout.reduced or self.layout.reduction != "pca":
+            return
+        now = time.monotonic()
+        if not force and now - self._projection_checked < self.PROJECTION_CHECK_SECONDS:
+            return
+        self._projection_checked = now
+        version = await run_blocking(self.full_vectors.get_meta, "projection_version")
+        if version == self._projection_version:
+            return
+        self.reducer = await run_blocking(Reducer.load, self._projection_path, self.layout.search_dim, self.layout.reduction)
+        self._projection_version = version
+        logger.info(f"Reloaded PCA projection (version {version}, fitted: {self.reducer.fitted})")
+    
+    async def _publish_projection(self) -> None:
+        """Record a new projection version so other processes reload it."""
+        version = uuid.uuid4().hex
+        await run_blocking(self.full_vectors.set_meta, "projection_version", version)
+        self._projection_version = version
+    
+    async def _maybe_autofit(self) -> None:
+        """Start a background PCA fit once enough full vectors are stored (VECTOR_PCA_AUTOFIT_MIN)."""
+        if (
+            not self.layout.reduced
+            or self.layout.reduction != "pca"
+            or self.reducer.fitted
+            or settings.vector_pca_autofit_min <= 0
+            or (self._autofit_task is not None and not self._autofit_task.done())
+        ):
+            return
+        stored = await run_blocking(len, self.full_vectors)
+        if stored >= max(settings.vector_pca_autofit_min, self.layout.search_dim):
+            self._autofit_task = asyncio.create_task(self._autofit())
+    
+    async def _autofit(self) -> None:
+        # one process fits; the others pick the projection up through _sync_projection
+        lock_path = self._projection_path.with_suffix(".lock")
+        try:
+            lock = await asyncio.to_thread(open, lock_path, "a")
+        except OSError as e:
+            logger.warning(f"Cannot open PCA fit lock {lock_path}: {e}")
+            return
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return  # another process is fitting
+            await self._sync_projection(force=True)
+            if not self.reducer.fitted:
+                reindexed = await self.refit_reduction()
+                logger.info(f"Fitted PCA projection automatically ({reindexed} documents re-indexed)")
+        except Exception as e:
+            logger.error(f"Automatic PCA fit failed: {e}")
+        finally:
+            lock.close()
     
     async def initialize(self):
         """Initialize ChromaDB and embedding model."""
         try:
-            # Create data directory if it doesn't exist
-            data_dir = Path(settings.chroma_persist_directory)
-            data_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Initialize ChromaDB client
-            self.client = chromadb.PersistentClient(
-                path=settings.chroma_persist_directory,
-                settings=ChromaSettings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            # Shared ChromaDB client (one per process, see src.resources)
+            self.client = await run_blocking(registry.get_chroma_client)
             
             # Get or create collection
             try:
-                self.collection = self.client.get_collection("asdsadf_knowledge")
+                self.collection = await run_blocking(self.client.get_collection, "asdsadf_knowledge")
                 logger.info("Loaded existing ChromaDB collection")
             except Exception:
-                self.collection = self.client.create_collection(
-                    name="asdsadf_knowledge",
-                    metadata={"description": "ASDSADF knowledge base for RAG"}
-                )
+                self.collection = await run_blocking(self._create_collection)
                 logger.info("Created new ChromaDB collection")
+            await run_blocking(self._open_vector_layout)
             
-            # Initialize embedding model
-            self.embedding_model = await asyncio.to_thread(
-                SentenceTransformer, 
-                settings.embedding_model
-            )
+            # Shared embedding model; loaded in a thread on first use
+            self.embedding_model = await asyncio.to_thread(registry.get_embedding_model)
             
             self.initialized = True
             logger.info("RAG system initialized successfully")
@@ -221,9 +344,22 @@ class RAGSystem:
             logger.error(f"Failed to initialize RAG system: {e}")
             raise
     
+    async def warm_up(self) -> None:
+        """
+        Run one encode and one query so the first user request does not pay for
+        lazy kernel initialization, thread-pool start-up or cold index pages.
+        """
+        if not self.initialized:
+            await self.initialize()
+        await asyncio.to_thread(self.embedding_model.encode, "warm up")
+        if settings.rerank_enabled:
+            await asyncio.to_thread(registry.get_reranker)
+        if await self.store.count():
+            await self.search("warm up", top_k=1)
+    
     async def add_document(self, document: KnowledgeDocument) -> bool:
         """
-        Add a document to the knowledge base.
+        Add or update a document in the knowledge base.
         
         Args:
             document: KnowledgeDocument to add
@@ -231,101 +367,231 @@ class RAGSystem:
         Returns:
             True if successful, False otherwise
         """
-        if not self.initialized:
-            await self.initialize()
+        return await self.add_documents_batch([document]) == 1
+    
+    @property
+    def embedding_key(self) -> str:
+        """Identifies the model and backend that produced stored embeddings."""
+        return f"{settings.embedding_model}:{getattr(self.embedding_model, 'name', 'torch')}"
+    
+    async def _embed(self, texts: List[str], hashes: List[str], tokens: List[int]) -> Tuple[List[List[float]], int, int, float]:
+        """
+        Embed texts, reusing vectors from the persistent cache for content already seen.
+        The misses are encoded in one call; their size and duration tune the batcher.
         
-        try:
-            # Generate embedding
-            embedding = await asyncio.to_thread(
-                self.embedding_model.encode,
-                document.content
-            )
-            
-            # Prepare metadata
-            metadata = {
-                "title": document.title,
-                "source": document.source,
-                "document_type": document.document_type,
-                **document.metadata
-            }
-            
-            # Add to ChromaDB
-            self.collection.add(
-                embeddings=[embedding.tolist()],
-                documents=[document.content],
-                metadatas=[metadata],
-                ids=[document.id]
-            )
-            
-            logger.debug(f"Added document: {document.title}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to add document {document.title}: {e}")
-            return False
+        Returns:
+            (embeddings in input order, texts encoded, tokens encoded, encode seconds)
+        """
+        cache = registry.get_embedding_cache()
+        cached = await asyncio.to_thread(cache.get_many, self.embedding_key, hashes) if cache else {}
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        CACHE_REQUESTS.inc(len(hashes) - len(missing), cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(missing), cache="embedding", result="miss")
+        encoded_tokens, seconds = 0, 0.0
+        if missing:
+            start = time.perf_counter()
+            with EMBEDDING_SECONDS.time(operation="add"):
+                encoded = await asyncio.to_thread(
+                    self.embedding_model.encode,
+                    [texts[i] for i in missing],
+                    batch_size=len(missing)  # the batch is already sized by token budget
+                )
+            seconds = time.perf_counter() - start
+            encoded_tokens = len(missing) * max(tokens[i] for i in missing)
+            self.batcher.record(encoded_tokens, seconds)
+            EMBEDDING_TEXTS.inc(len(missing), operation="add")
+            fresh = {hashes[i]: vector.tolist() for i, vector in zip(missing, encoded)}
+            if cache:
+                await asyncio.to_thread(cache.put_many, self.embedding_key, fresh.items())
+            cached.update(fresh)
+        return [cached[h] for h in hashes], len(missing), encoded_tokens, seconds
     
-    async def add_documents_batch(self, documents: List[KnowledgeDocument]) -> int:
+    async def _unchanged_ids(self, ids: List[str], hashes: List[str]) -> set:
+        """Ids already stored with the same content hash and embedding model."""
+        existing = await self.store.get(ids=ids, include=["metadatas"])
+        stored = {
+            doc_id: meta for doc_id, meta in zip(existing.get("ids") or [], existing.get("metadatas") or [])
+            if meta
+        }
+        key = self.embedding_key
+        return {
+            doc_id for doc_id, h in zip(ids, hashes)
+            if doc_id in stored and stored[doc_id].get("content_hash") == h and stored[doc_id].get("embedding_model") == key
+        }
+    
+    async def add_documents_batch(self, documents: List[KnowledgeDocument], workers: Optional[int] = None) -> int:
         """
-        Add multiple documents in batch.
+        Add or update documents in batch (upsert by id).
+        
+        Documents whose id is already stored with the same content hash and
+        embedding model are skipped; the others are embedded through the
+        persistent embedding cache, so only new or changed content is encoded.
+        Batches are sized by token budget and ordered by length (see
+        src/batching.py); the run's throughput is logged and kept in
+        `last_ingest_report`.
         
         Args:
             documents: List of KnowledgeDocument objects
+            workers: Encode in this many worker processes (src/embedding_workers.py)
+                instead of in-process; for large loads. This process still does
+                all writes.
             
         Returns:
-            Number of documents successfully added
+            Number of documents successfully added, updated or already up to date
         """
         if not self.initialized:
             await self.initialize()
         
-        successful_adds = 0
-        batch_size = 10  # Process in batches to avoid memory issues
-        
-        for i in range(0, len(documents), batch_size):
-            batch = documents[i:i + batch_size]
-            
+        report = IngestReport()
+        hashes = [content_hash(doc.content) for doc in documents]
+        unchanged: set = set()
+        for i in range(0, len(documents), 500):
             try:
-                # Generate embeddings for batch
-                contents = [doc.content for doc in batch]
-                embeddings = await asyncio.to_thread(
-                    self.embedding_model.encode,
-                    contents
-                )
-                
-                # Prepare batch data
-                ids = [doc.id for doc in batch]
-                metadatas = []
-                for doc in batch:
-                    metadata = {
-                        "title": doc.title,
-                        "source": doc.source,
-                        "document_type": doc.document_type,
-                        **doc.metadata
-                    }
-                    metadatas.append(metadata)
-                
-                # Add batch to ChromaDB
-                self.collection.add(
-                    embeddings=embeddings.tolist(),
-                    documents=contents,
-                    metadatas=metadatas,
-                    ids=ids
-                )
-                
-                successful_adds += len(batch)
-                logger.info(f"Added batch of {len(batch)} documents")
-                
+                unchanged |= await self._unchanged_ids([doc.id for doc in documents[i:i + 500]], hashes[i:i + 500])
             except Exception as e:
-                logger.error(f"Failed to add batch starting at index {i}: {e}")
+                logger.warning(f"Could not check for unchanged documents: {e}")
+        pending = [i for i, doc in enumerate(documents) if doc.id not in unchanged]
+        skipped = len(documents) - len(pending)
+        
+        max_seq = getattr(getattr(self.embedding_model, "model", None), "max_seq_length", None)
+        if (self._worker_pool is not None or (workers and workers > 1)) and pending:
+            written = await self._add_with_workers(documents, hashes, pending, max_seq, workers, report)
+        else:
+            written = 0
+            tokens = self.batcher.token_counts([documents[i].content for i in pending], max_seq)
+            for batch in self.batcher.batches(tokens):
+                rows = [pending[j] for j in batch]
+                try:
+                    # Generate embeddings (cached by content hash)
+                    embeddings, encoded, encoded_tokens, encode_seconds = await self._embed(
+                        [documents[i].content for i in rows], [hashes[i] for i in rows], [tokens[j] for j in batch]
+                    )
+                    await self._write_batch([documents[i] for i in rows], [hashes[i] for i in rows], embeddings)
+                    written += len(rows)
+                    report.add_batch(len(rows), encoded, encoded_tokens, encode_seconds)
+                except Exception as e:
+                    logger.error(f"Failed to add batch of {len(rows)} documents (first id {documents[rows[0]].id}): {e}")
         
-        logger.info(f"Successfully added {successful_adds}/{len(documents)} documents")
+        successful_adds = skipped + written
+        self.last_ingest_report = {**report.to_dict(self.batcher.token_budget), "unchanged": skipped, "workers": workers or 1}
+        logger.info(f"Successfully added {successful_adds}/{len(documents)} documents ({skipped} unchanged): {self.last_ingest_report}")
         return successful_adds
     
+    async def _write_batch(self, documents: List[KnowledgeDocument], hashes: List[str], embeddings) -> None:
+        """Upsert one embedded batch (the only place ingestion writes to the collection)."""
+        ids = [doc.id for doc in documents]
+        metadatas = []
+        for doc, h in zip(documents, hashes):
+            metadata = _flatten_metadata({
+                "title": doc.title,
+                "source": doc.source,
+                "document_type": doc.document_type,
+                **doc.metadata,
+                "content_hash": h,
+                "embedding_model": self.embedding_key,
+            })
+            metadatas.append(metadata)
+        
+        # Reduced layouts keep the full vectors aside and index the projection
+        if self.layout.reduced:
+            await self._sync_projection()
+            await run_blocking(self.full_vectors.put_many, ids, embeddings)
+            embeddings = self.reducer.transform(embeddings)
+        if hasattr(embeddings, "tolist"):
+            embeddings = embeddings.tolist()
+        
+        # Upsert batch into ChromaDB (re-running ingestion updates instead of failing)
+        with VECTOR_WRITE_SECONDS.time():
+            await self.store.upsert(
+                embeddings=embeddings,
+                documents=[doc.content for doc in documents],
+                metadatas=metadatas,
+                ids=ids
+            )
+        self.revision += 1
+        logger.debug(f"Upserted batch of {len(ids)} documents (token budget {self.batcher.token_budget})")
+        await self._maybe_autofit()
+    
+    @asynccontextmanager
+    async def embedding_workers(self, workers: Optional[int] = None) -> AsyncIterator[Any]:
+        """
+        Keep one pool of embedding worker processes open for every
+        add_documents_batch call inside the `async with`, so chunked loads load
+        the model into the workers only once.
+        """
+        from src.embedding_workers import EmbeddingWorkerPool
+        
+        async with EmbeddingWorkerPool(workers) as pool:
+            self._worker_pool = pool
+            try:
+                yield pool
+            finally:
+                self._worker_pool = None
+    
+    async def _add_with_workers(
+        self,
+        documents: List[KnowledgeDocument],
+        hashes: List[str],
+        pending: List[int],
+        max_seq: Optional[int],
+        workers: Optional[int],
+        report: IngestReport
+    ) -> int:
+        """
+        Encode `pending` documents in worker processes, a window at a time, and
+        upsert each batch here as soon as its vectors are back in the shared window.
+        Cached embeddings are written without going to the workers.
+        """
+        if self._worker_pool is None:
+            async with self.embedding_workers(workers):
+                return await self._add_with_workers(documents, hashes, pending, max_seq, workers, report)
+        
+        pool = self._worker_pool
+        cache = registry.get_embedding_cache()
+        window = max(1, settings.embedding_worker_window)
+        written = 0
+        for w in range(0, len(pending), window):
+            rows = pending[w:w + window]
+            cached = await asyncio.to_thread(cache.get_many, self.embedding_key, [hashes[i] for i in rows]) if cache else {}
+            hits = [i for i in rows if hashes[i] in cached]
+            misses = [i for i in rows if hashes[i] not in cached]
+            CACHE_REQUESTS.inc(len(hits), cache="embedding", result="hit")
+            CACHE_REQUESTS.inc(len(misses), cache="embedding", result="miss")
+            if hits:
+                try:
+                    await self._write_batch([documents[i] for i in hits], [hashes[i] for i in hits], [cached[hashes[i]] for i in hits])
+                    written += len(hits)
+                    report.add_batch(len(hits), 0, 0, 0.0)
+                except Exception as e:
+                    logger.error(f"Failed to add {len(hits)} cached documents: {e}")
+            
+            tokens = self.batcher.token_counts([documents[i].content for i in misses], max_seq)
+            batches = list(self.batcher.batches(tokens))
+            async for batch, vectors, seconds in pool.encode(
+                [documents[i].content for i in misses], batches, self.embedding_model.dimension
+            ):
+                rows_done = [misses[j] for j in batch]
+                padded = len(batch) * max(tokens[j] for j in batch)
+                self.batcher.record(padded, seconds)
+                EMBEDDING_TEXTS.inc(len(batch), operation="add")
+                try:
+                    batch_hashes = [hashes[i] for i in rows_done]
+                    if cache:
+                        await asyncio.to_thread(cache.put_many, self.embedding_key, zip(batch_hashes, vectors))
+                    await self._write_batch([documents[i] for i in rows_done], batch_hashes, vectors)
+                    written += len(rows_done)
+                    report.add_batch(len(rows_done), len(rows_done), padded, seconds)
+                except Exception as e:
+                    logger.error(f"Failed to add batch of {len(rows_done)} documents (first id {documents[rows_done[0]].id}): {e}")
+        return written
+    
     async def search(
         self, 
         query: str, 
         top_k: int = 5,
         document_type: Optional[str] = None,
-        difficulty: Optional[str] = None
+        difficulty: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant documents.
@@ -335,55 +601,50 @@ class RAGSystem:
             top_k: Number of results to return
             document_type: Filter by document type
             difficulty: Filter by difficulty level
+            mmr_lambda: Select results by maximal marginal relevance with this
+                relevance/diversity trade-off (1.0 = relevance only); defaults to
+                MMR_LAMBDA when MMR_ENABLED is set
             
         Returns:
             List of relevant documents with scores
         """
         if not self.initialized:
             await self.initialize()
+        await self._sync_projection()
         
         try:
             # Generate query embedding
-            query_embedding = await asyncio.to_thread(
-                self.embedding_model.encode,
-                query
-            )
+            with EMBEDDING_SECONDS.time(operation="search"), stage("embed"):
+                query_embedding = await asyncio.to_thread(
+                    self.embedding_model.encode,
+                    query
+                )
+            EMBEDDING_TEXTS.inc(operation="search")
             
-            # Prepare where clause for filtering
-            where_clause = {}
-            if document_type:
-                where_clause["document_type"] = document_type
-            if difficulty:
-                where_clause["difficulty"] = difficulty
+            where_clause = self._where_clause(document_type, difficulty)
             
-            # Search in ChromaDB
+            # Search in ChromaDB (a larger candidate pool when a reranker or MMR picks the final few)
+            n_results = min(top_k, settings.max_retrieval_results)
+            reranker = await asyncio.to_thread(registry.get_reranker) if settings.rerank_enabled else None
+            mmr_lambda = self._mmr_lambda(mmr_lambda)
+            pool = self._pool_size(n_results, reranker, mmr_lambda)
+            first_pass = self._first_pass_embeddings([query_embedding])
             search_kwargs = {
-                "query_embeddings": [query_embedding.tolist()],
-                "n_results": min(top_k, settings.max_retrieval_results)
+                "query_embeddings": first_pass,
+                "n_results": self._candidate_count(pool)
             }
             
             if where_clause:
                 search_kwargs["where"] = where_clause
+            if mmr_lambda is not None:
+                search_kwargs["include"] = ["documents", "metadatas", "distances", "embeddings"]
             
-            results = self.collection.query(**search_kwargs)
-            
-            # Format results
-            formatted_results = []
-            if results["documents"] and results["documents"][0]:
-                for i in range(len(results["documents"][0])):
-                    result = {
-                        "id": results["ids"][0][i],
-                        "content": results["documents"][0][i],
-                        "title": results["metadatas"][0][i].get("title", "Untitled"),
-                        "source": results["metadatas"][0][i].get("source", "Unknown"),
-                        "document_type": results["metadatas"][0][i].get("document_type", "unknown"),
-                        "score": 1 - results["distances"][0][i],  # Convert distance to similarity
-                        "metadata": results["metadatas"][0][i]
-                    }
-                    
-                    # Filter by similarity threshold
-                    if result["score"] >= settings.similarity_threshold:
-                        formatted_results.append(result)
+            with VECTOR_QUERY_SECONDS.time(operation="search"), stage("vector_search"):
+                results = await self.store.query(**search_kwargs)
+            if self.layout.reduced:
+                with stage("rescore"):
+                    results = await run_blocking(self._rescore, results, [query_embedding], pool)
+            formatted_results = (await self._select([query], first_pass, results, n_results, reranker, mmr_lambda))[0]
             
             logger.debug(f"Search query: '{query}' returned {len(formatted_results)} results")
             return formatted_results
@@ -392,13 +653,269 @@ class RAGSystem:
             logger.error(f"Search failed: {e}")
             return []
     
+    async def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        document_type: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries at once: one encode call for all queries and one
+        vector-store query with all embeddings. Arguments are as for `search`.
+        
+        Returns:
+            One result list per query, in input order
+        """
+        if not queries:
+            return []
+        if not self.initialized:
+            await self.initialize()
+        await self._sync_projection()
+        
+        try:
+            with EMBEDDING_SECONDS.time(operation="search_batch"), stage("embed"):
+                query_embeddings = await asyncio.to_thread(
+                    self.embedding_model.encode,
+                    list(queries)
+                )
+            EMBEDDING_TEXTS.inc(len(queries), operation="search_batch")
+            
+            n_results = min(top_k, settings.max_retrieval_results)
+            reranker = await asyncio.to_thread(registry.get_reranker) if settings.rerank_enabled else None
+            mmr_lambda = self._mmr_lambda(mmr_lambda)
+            pool = self._pool_size(n_results, reranker, mmr_lambda)
+            first_pass = self._first_pass_embeddings(query_embeddings)
+            search_kwargs = {
+                "query_embeddings": first_pass,
+                "n_results": self._candidate_count(pool)
+            }
+            where_clause = self._where_clause(document_type, difficulty)
+            if where_clause:
+                search_kwargs["where"] = where_clause
+            if mmr_lambda is not None:
+                search_kwargs["include"] = ["documents", "metadatas", "distances", "embeddings"]
+            
+            with VECTOR_QUERY_SECONDS.time(operation="search_batch"), stage("vector_search"):
+                results = await self.store.query(**search_kwargs)
+            if self.layout.reduced:
+                with stage("rescore"):
+                    results = await run_blocking(self._rescore, results, query_embeddings, pool)
+            return await self._select(list(queries), first_pass, results, n_results, reranker, mmr_lambda)
+            
+        except Exception as e:
+            logger.error(f"Batch search failed: {e}")
+            return [[] for _ in queries]
+    
+    @staticmethod
+    def _mmr_lambda(mmr_lambda: Optional[float]) -> Optional[float]:
+        if mmr_lambda is not None:
+            return min(1.0, max(0.0, mmr_lambda))
+        return settings.mmr_lambda if settings.mmr_enabled else None
+    
+    @staticmethod
+    def _pool_size(n_results: int, reranker, mmr_lambda: Optional[float]) -> int:
+        """Candidates to fetch so the reranker and MMR have something to choose from."""
+        pool = n_results
+        if reranker:
+            pool = max(pool, settings.rerank_candidates)
+        if mmr_lambda is not None:
+            pool = max(pool, settings.mmr_fetch_k)
+        return pool
+    
+    async def _select(
+        self,
+        queries: List[str],
+        first_pass: List[List[float]],
+        results: Dict[str, Any],
+        n_results: int,
+        reranker,
+        mmr_lambda: Optional[float]
+    ) -> List[List[Dict[str, Any]]]:
+        """Format each query row, then narrow the candidates with the reranker and/or MMR."""
+        formatted = [self._format_results(results, row) for row in range(len(queries))]
+        final_n = min(n_results, settings.rerank_top_n) if reranker else n_results
+        if reranker:
+            # one cross-encoder batch for the candidates of every query; MMR needs them all scored
+            keep = max(map(len, formatted), default=0) if mmr_lambda is not None else final_n
+            with stage("rerank"):
+                formatted = await asyncio.to_thread(reranker.rerank_many, queries, formatted, keep)
+        if mmr_lambda is not None:
+            embeddings = results.get("embeddings")
+            vectors = {
+                doc_id: vector
+                for row in range(len(queries))
+                for doc_id, vector in zip(results["ids"][row], embeddings[row] if embeddings is not None else [])
+            }
+            with stage("mmr"):
+                formatted = [
+                    self._mmr(query, rows, vectors, final_n, mmr_lambda)
+                    for query, rows in zip(first_pass, formatted)
+                ]
+        return formatted
+    
+    @staticmethod
+    def _mmr(
+        query: List[float],
+        candidates: List[Dict[str, Any]],
+        vectors: Dict[str, Any],
+        k: int,
+        mmr_lambda: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Maximal marginal relevance: greedily pick the candidate maximizing
+        lambda * relevance - (1 - lambda) * (max similarity to those already picked).
+        Relevance is the reranker score (min-max scaled) when present, otherwise
+        cosine similarity to the query.
+        """
+        import numpy as np
+        
+        candidates = [c for c in candidates if c["id"] in vectors]
+        if len(candidates) <= 1 or k <= 1:
+            return candidates[:k]
+        matrix = np.asarray([vectors[c["id"]] for c in candidates], dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        if "rerank_score" in candidates[0]:
+            relevance = np.asarray([c["rerank_score"] for c in candidates], dtype=np.float32)
+            relevance = (relevance - relevance.min()) / max(float(relevance.max() - relevance.min()), 1e-12)
+        else:
+            q = np.asarray(query, dtype=np.float32)
+            relevance = matrix @ (q / max(float(np.linalg.norm(q)), 1e-12))
+        similarity = matrix @ matrix.T
+        
+        selected = [int(np.argmax(relevance))]
+        redundancy = similarity[selected[0]].copy()
+        available = np.ones(len(candidates), dtype=bool)
+        available[selected[0]] = False
+        while len(selected) < min(k, len(candidates)):
+            scores = mmr_lambda * relevance - (1.0 - mmr_lambda) * redundancy
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(redundancy, similarity[best], out=redundancy)
+        return [candidates[i] for i in selected]
+    
+    def _first_pass_embeddings(self, query_embeddings) -> List[List[float]]:
+        """Query vectors in the space the collection indexes."""
+        if self.layout.reduced:
+            return self.reducer.transform(query_embeddings).tolist()
+        return [embedding.tolist() for embedding in query_embeddings]
+    
+    def _candidate_count(self, n_results: int) -> int:
+        """Reduced layouts over-fetch so re-scoring can recover neighbours the projection misordered."""
+        if self.layout.reduced:
+            return n_results * max(1, settings.vector_rescore_multiplier)
+        return n_results
+    
+    def _rescore(self, results: Dict[str, Any], query_embeddings, n_results: int) -> Dict[str, Any]:
+        """
+        Re-rank first-pass candidates by their distance to the full-dimension query
+        and keep the best `n_results` per query row. Candidates without a stored
+        full vector keep their first-pass distance.
+        """
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        rescored = {key: [] for key in ("ids", "documents", "metadatas", "distances")}
+        embeddings = results.get("embeddings")
+        if embeddings is not None:
+            rescored["embeddings"] = []
+        for row, query in enumerate(query_embeddings):
+            ids = results["ids"][row] if results.get("ids") else []
+            full = self.full_vectors.get_many(ids)
+            exact = dict(zip(full, distances(query, list(full.values()), space).tolist())) if full else {}
+            order = sorted(
+                range(len(ids)),
+                key=lambda i: exact.get(ids[i], results["distances"][row][i])
+            )[:n_results]
+            rescored["ids"].append([ids[i] for i in order])
+            rescored["documents"].append([results["documents"][row][i] for i in order])
+            rescored["metadatas"].append([results["metadatas"][row][i] for i in order])
+            rescored["distances"].append([exact.get(ids[i], results["distances"][row][i]) for i in order])
+            if embeddings is not None:
+                rescored["embeddings"].append([embeddings[row][i] for i in order])
+        return rescored
+    
+    async def refit_reduction(self) -> int:
+        """
+        Fit the PCA projection on all stored full vectors and re-index every
+        document with it. Runs automatically once VECTOR_PCA_AUTOFIT_MIN vectors
+        are stored; run it again after bulk population (populate_knowledge_base
+        does) or when the corpus has changed a lot. Other processes pick the new
+        projection up through the shared version. Returns the number of
+        re-indexed documents.
+        """
+        if not self.initialized:
+            await self.initialize()
+        if not self.layout.reduced or self.layout.reduction != "pca":
+            return 0
+        
+        # one refit at a time, so re-indexing never mixes two projections
+        async with self._refit_lock:
+            if not await run_blocking(len, self.full_vectors):
+                return 0
+            # two streaming passes over the stored vectors: fit, then re-index; only one batch is in memory at a time.
+            # The fit goes into a new Reducer, so searches keep using the current one until it is published.
+            reducer = Reducer(self.layout.search_dim, self.layout.reduction)
+            await asyncio.to_thread(lambda: reducer.fit_batches(vectors for _, vectors in self.full_vectors.iter_batches()))
+            await run_blocking(reducer.save, self._projection_path)
+            self.reducer = reducer
+            await self._publish_projection()
+            reindexed = 0
+            batches = self.full_vectors.iter_batches()
+            while True:
+                batch = await run_blocking(next, batches, None)
+                if batch is None:
+                    break
+                ids, vectors = batch
+                with VECTOR_WRITE_SECONDS.time():
+                    await self.store.update(ids=ids, embeddings=reducer.transform(vectors).tolist())
+                reindexed += len(ids)
+            self.revision += 1
+        logger.info(f"Refitted PCA projection to {self.layout.search_dim} dimensions and re-indexed {reindexed} documents")
+        return reindexed
+    
+    @staticmethod
+    def _where_clause(document_type: Optional[str], difficulty: Optional[str]) -> Dict[str, Any]:
+        """Build a Chroma filter; several conditions must be combined with $and."""
+        conditions = []
+        if document_type:
+            conditions.append({"document_type": document_type})
+        if difficulty:
+            conditions.append({"difficulty": difficulty})
+        if len(conditions) > 1:
+            return {"$and": conditions}
+        return conditions[0] if conditions else {}
+    
+    @staticmethod
+    def _format_results(results: Dict[str, Any], row: int) -> List[Dict[str, Any]]:
+        """Format one query row of a Chroma query result, dropping hits below the similarity threshold."""
+        formatted_results = []
+        if results["documents"] and len(results["documents"]) > row and results["documents"][row]:
+            for i in range(len(results["documents"][row])):
+                metadata = results["metadatas"][row][i] or {}
+                result = {
+                    "id": results["ids"][row][i],
+                    "content": results["documents"][row][i],
+                    "title": metadata.get("title", "Untitled"),
+                    "source": metadata.get("source", "Unknown"),
+                    "document_type": metadata.get("document_type", "unknown"),
+                    "score": 1 - results["distances"][row][i],  # Convert distance to similarity
+                    "metadata": metadata
+                }
+                
+                # Filter by similarity threshold
+                if result["score"] >= settings.similarity_threshold:
+                    formatted_results.append(result)
+        return formatted_results
+    
     async def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific document by ID."""
         if not self.initialized:
             await self.initialize()
         
         try:
-            result = self.collection.get(ids=[document_id])
+            result = await self.store.get(ids=[document_id])
             if result["documents"]:
                 return {
                     "id": document_id,
@@ -413,13 +930,31 @@ class RAGSystem:
         
         return None
     
+    async def get_all_metadata(self) -> List[Dict[str, Any]]:
+        """Return id, title and metadata for every document (no content or embeddings)."""
+        if not self.initialized:
+            await self.initialize()
+
+        try:
+            result = await self.store.get(include=["metadatas"])
+            return [
+                {**(metadata or {}), "id": doc_id}
+                for doc_id, metadata in zip(result.get("ids", []), result.get("metadatas", []) or [])
+            ]
+        except Exception as e:
+            logger.error(f"Failed to list document metadata: {e}")
+            return []
+
     async def delete_document(self, document_id: str) -> bool:
         """Delete a document by ID."""
         if not self.initialized:
             await self.initialize()
         
         try:
-            self.collection.delete(ids=[document_id])
+            await self.store.delete(ids=[document_id])
+            if self.full_vectors is not None:
+                await run_blocking(self.full_vectors.delete_many, [document_id])
+            self.revision += 1
             logger.info(f"Deleted document: {document_id}")
             return True
         except Exception as e:
@@ -432,11 +967,11 @@ class RAGSystem:
             await self.initialize()
         
         try:
-            count = self.collection.count()
+            count = await self.store.count()
             
             # Get sample of documents to analyze types
-            sample_results = self.collection.query(
-                query_embeddings=[[0.0] * 384],  # Dummy embedding
+            sample_results = await self.store.query(
+                query_embeddings=[[0.0] * (self.layout.search_dim or self.embedding_model.dimension)],  # Dummy embedding
                 n_results=min(100, count) if count > 0 else 0
             )
             
@@ -456,6 +991,7 @@ class RAGSystem:
                 "document_types": document_types,
                 "difficulties": difficulties,
                 "embedding_model": settings.embedding_model,
+                "vector_layout": self.layout.to_dict(),
                 "initialized": self.initialized
             }
             
@@ -463,17 +999,125 @@ class RAGSystem:
             logger.error(f"Failed to get collection stats: {e}")
             return {"error": str(e)}
     
+    async def export_snapshot(self, path: str, batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Export the collection (embeddings, documents, metadata and model info) to
+        a snapshot directory that `import_snapshot` can load without re-encoding.
+        See src/snapshot.py for the format. Returns the manifest.
+        """
+        if not self.initialized:
+            await self.initialize()
+        
+        from importlib.metadata import PackageNotFoundError, version
+        
+        versions = {}
+        for package in ("sentence-transformers", "chromadb"):
+            try:
+                versions[package] = version(package)
+            except PackageNotFoundError:
+                pass
+        manifest = {
+            "embedding_model": settings.embedding_model,
+            "embedding_key": self.embedding_key,
+            "vector_layout": self.layout.to_dict(),
+            "packages": versions,
+        }
+        projection = Path(settings.vector_store_directory) / f"{self.collection.name}.pca.npz"
+        start = time.perf_counter()
+        manifest = await run_blocking(
+            write_snapshot, Path(path), self.collection, manifest, self.full_vectors, projection, batch_size
+        )
+        logger.info(f"Exported {manifest['count']} documents to {path} in {time.perf_counter() - start:.1f}s")
+        return manifest
+    
+    async def import_snapshot(self, path: str, replace: bool = False, force: bool = False, batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Load a snapshot written by `export_snapshot` with bulk upserts and no
+        re-encoding.
+        
+        Args:
+            path: Snapshot directory
+            replace: Drop the current collection first and adopt the snapshot's
+                vector layout (implied when the collection is empty)
+            force: Import even if the snapshot was embedded with a different
+                model or backend than this node uses
+            
+        Returns:
+            Number of imported documents and the elapsed time
+        """
+        if not self.initialized:
+            await self.initialize()
+        
+        start = time.perf_counter()
+        manifest = await asyncio.to_thread(read_manifest, Path(path))
+        if manifest.get("embedding_key") != self.embedding_key and not force:
+            raise ValueError(
+                f"Snapshot was embedded with {manifest.get('embedding_key')!r}, this node uses {self.embedding_key!r}; "
+                "re-populate instead or pass force=True"
+            )
+        layout = VectorLayout.from_metadata(manifest.get("collection_metadata"))
+        replace = replace or await self.store.count() == 0
+        if not replace:
+            if layout.to_metadata() != self.layout.to_metadata() or layout.reduced:
+                raise ValueError("Snapshot vector layout differs from (or needs the projection of) this collection; import with replace=True")
+            expected = self.layout.search_dim or self.embedding_model.dimension
+            if manifest.get("dimension") != expected:
+                raise ValueError(f"Snapshot dimension {manifest.get('dimension')} does not match the collection ({expected})")
+        
+        name = self.collection.name
+        if replace:
+            def recreate():
+                self.client.delete_collection(name)
+                if self.full_vectors is not None:
+                    self.full_vectors.clear()
+                projection = Path(settings.vector_store_directory) / f"{name}.pca.npz"
+                projection.unlink(missing_ok=True)
+                if (Path(path) / PROJECTION).exists():
+                    projection.parent.mkdir(parents=True, exist_ok=True)
+                    projection.write_bytes((Path(path) / PROJECTION).read_bytes())
+                self.collection = self.client.create_collection(name=name, metadata=manifest.get("collection_metadata") or None)
+                self._open_vector_layout()
+            
+            await run_blocking(recreate)
+            if self.full_vectors is not None:
+                # other processes must drop their projection for the imported one
+                await self._publish_projection()
+        
+        def load() -> int:
+            imported = 0
+            for ids, documents, metadatas, embeddings, full in iter_snapshot(Path(path), batch_size):
+                if full is not None and self.full_vectors is not None:
+                    self.full_vectors.put_many(ids, full)
+                with VECTOR_WRITE_SECONDS.time():
+                    self.collection.upsert(ids=ids, embeddings=embeddings.tolist(), documents=documents, metadatas=metadatas)
+                imported += len(ids)
+            return imported
+        
+        imported = await run_blocking(load)
+        self.revision += 1
+        elapsed = time.perf_counter() - start
+        logger.info(f"Imported {imported} documents from {path} in {elapsed:.1f}s")
+        return {"imported": imported, "seconds": round(elapsed, 2), "replaced": replace, "embedding_key": manifest.get("embedding_key")}
+    
     async def reset_collection(self) -> bool:
         """Reset (clear) the entire collection."""
         if not self.initialized:
             await self.initialize()
         
         try:
-            self.client.delete_collection("asdsadf_knowledge")
-            self.collection = self.client.create_collection(
-                name="asdsadf_knowledge",
-                metadata={"description": "ASDSADF knowledge base for RAG"}
-            )
+            def recreate():
+                self.client.delete_collection("asdsadf_knowledge")
+                if self.full_vectors is not None:
+                    self.full_vectors.clear()
+                Path(settings.vector_store_directory, "asdsadf_knowledge.pca.npz").unlink(missing_ok=True)
+                # A reset collection adopts the currently configured vector layout
+                self.collection = self._create_collection()
+                self._open_vector_layout()
+            
+            await run_blocking(recreate)
+            if self.full_vectors is not None:
+                await self._publish_projection()
+            self.revision += 1
             logger.info("Collection reset successfully")
             return True
         except Exception as e:
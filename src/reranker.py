@@ -0,0 +1,84 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.config import settings
+from src.embedding_cache import content_hash
+from src.metrics import CACHE_REQUESTS, RERANK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """
+    Re-orders retrieved documents with a cross-encoder, which reads query and
+    document together and ranks far more reliably than bi-encoder distances.
+
+    All uncached (query, document) pairs of a call are scored in one batched
+    `predict`; scores are kept in an LRU keyed by the query text and the
+    document's content hash, so repeated and batched queries over the same
+    candidates cost a dictionary lookup.
+    """
+
+    def __init__(self, model: Any, batch_size: Optional[int] = None, cache_size: Optional[int] = None):
+        self.model = model
+        self.batch_size = batch_size or settings.rerank_batch_size
+        self.cache_size = cache_size or settings.rerank_cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_name: Optional[str] = None) -> "Reranker":
+        from sentence_transformers import CrossEncoder
+
+        return cls(CrossEncoder(model_name or settings.rerank_model, max_length=512))
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[float]:
+        score = self._cache.get(key)
+        if score is not None:
+            self._cache.move_to_end(key)
+        return score
+
+    def _store(self, key: Tuple[str, str], score: float) -> None:
+        self._cache[key] = score
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def score(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        """Cross-encoder scores for (query, document text) pairs, higher is more relevant."""
+        keys = [(query, content_hash(text)) for query, text in pairs]
+        with self._lock:
+            scores = [self._cached(key) for key in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        CACHE_REQUESTS.inc(len(keys) - len(missing), cache="rerank", result="hit")
+        CACHE_REQUESTS.inc(len(missing), cache="rerank", result="miss")
+        if missing:
+            with RERANK_SECONDS.time():
+                predicted = self.model.predict([pairs[i] for i in missing], batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for i, value in zip(missing, predicted):
+                    scores[i] = float(value)
+                    self._store(keys[i], scores[i])
+        return scores
+
+    def rerank_many(self, queries: Sequence[str], result_lists: Sequence[List[Dict[str, Any]]], top_n: int) -> List[List[Dict[str, Any]]]:
+        """
+        Keep the `top_n` best results per query by cross-encoder score (stored as
+        "rerank_score"; the retrieval "score" is left as is).
+        """
+        pairs = [(query, result["content"]) for query, results in zip(queries, result_lists) for result in results]
+        scores = iter(self.score(pairs)) if pairs else iter(())
+        reranked = []
+        for results in result_lists:
+            scored = [{**result, "rerank_score": next(scores)} for result in results]
+            scored.sort(key=lambda r: r["rerank_score"], reverse=True)
+            reranked.append(scored[:top_n])
+        return reranked
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        return self.rerank_many([query], [results], top_n)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"model": settings.rerank_model, "cached_pairs": len(self._cache), "cache_size": self.cache_size}
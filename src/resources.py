@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """
+    Process-wide owner of the heavy shared resources: the embedding model (an
+    src.embeddings backend selected by EMBEDDING_BACKEND), the
+    Chroma client, the Gemini model handle and the optional reranker. Each is created lazily on first
+    use and then handed out by reference to every agent, script and evaluation
+    run in the process, so nothing is loaded twice.
+
+    Getters are synchronous and thread-safe; call the embedding getter through
+    asyncio.to_thread from async code since the first call loads the model.
+    """
+
+    def __init__(self):
+        self._embedding_model = None
+        self._chroma_client = None
+        self._gemini_model = None
+        self._embedding_cache = None
+        self._reranker = None
+        # one lock per resource so a slow model load does not block the Chroma client
+        self._locks: Dict[str, threading.Lock] = {
+            "embedding_model": threading.Lock(),
+            "chroma_client": threading.Lock(),
+            "gemini_model": threading.Lock(),
+            "embedding_cache": threading.Lock(),
+            "reranker": threading.Lock(),
+        }
+        self.load_times: Dict[str, float] = {}
+
+    def _timed(self, name: str, factory):
+        start = time.perf_counter()
+        value = factory()
+        self.load_times[name] = time.perf_counter() - start
+        logger.info("Loaded shared %s in %.2fs", name, self.load_times[name])
+        return value
+
+    def get_embedding_model(self):
+        if self._embedding_model is None:
+            with self._locks["embedding_model"]:
+                if self._embedding_model is None:
+                    from src.embeddings import load_embedding_backend
+                    self._embedding_model = self._timed("embedding_model", load_embedding_backend)
+        return self._embedding_model
+
+    def get_chroma_client(self):
+        if self._chroma_client is None:
+            with self._locks["chroma_client"]:
+                if self._chroma_client is None:
+                    import chromadb
+                    from chromadb.config import Settings as ChromaSettings
+
+                    Path(settings.chroma_persist_directory).mkdir(parents=True, exist_ok=True)
+                    self._chroma_client = self._timed("chroma_client", lambda: chromadb.PersistentClient(
+                        path=settings.chroma_persist_directory,
+                        settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True)
+                    ))
+        return self._chroma_client
+
+    def get_gemini_model(self):
+        if self._gemini_model is None:
+            with self._locks["gemini_model"]:
+                if self._gemini_model is None:
+                    if not settings.gemini_api_key:
+                        raise ValueError("GEMINI_API_KEY is required")
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=settings.gemini_api_key)
+                    self._gemini_model = self._timed("gemini_model", lambda: genai.GenerativeModel(settings.gemini_model))
+        return self._gemini_model
+
+    def get_embedding_cache(self):
+        """Persistent content-hash -> embedding cache, or None when EMBEDDING_CACHE_ENABLED is off."""
+        if not settings.embedding_cache_enabled:
+            return None
+        if self._embedding_cache is None:
+            with self._locks["embedding_cache"]:
+                if self._embedding_cache is None:
+                    from src.embedding_cache import EmbeddingCache
+                    self._embedding_cache = self._timed("embedding_cache", EmbeddingCache)
+        return self._embedding_cache
+
+    def get_reranker(self):
+        """Cross-encoder reranker (src.reranker), or None when RERANK_ENABLED is off."""
+        if not settings.rerank_enabled:
+            return None
+        if self._reranker is None:
+            with self._locks["reranker"]:
+                if self._reranker is None:
+                    from src.reranker import Reranker
+                    self._reranker = self._timed("reranker", Reranker.load)
+        return self._reranker
+
+    def loaded(self) -> Dict[str, bool]:
+        return {
+            "embedding_model": self._embedding_model is not None,
+            "chroma_client": self._chroma_client is not None,
+            "gemini_model": self._gemini_model is not None,
+            "embedding_cache": self._embedding_cache is not None,
+            "reranker": self._reranker is not None,
+        }
+
+    def reset(self) -> None:
+        """Drop all references (tests, or re-opening after a fork)."""
+        with self._locks["embedding_model"], self._locks["chroma_client"], self._locks["gemini_model"], self._locks["embedding_cache"], self._locks["reranker"]:
+            if self._embedding_cache is not None:
+                self._embedding_cache.close()
+            self._embedding_model = None
+            self._chroma_client = None
+            self._gemini_model = None
+            self._embedding_cache = None
+            self._reranker = None
+            self.load_times.clear()
+
+
+# Shared instance used across the process
+registry = ResourceRegistry()
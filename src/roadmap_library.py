@@ -0,0 +1,194 @@
+import copy
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Goal buckets and the keywords that map a free-form goal onto them.
+# Order matters: "full-stack" must be checked before "frontend"/"backend".
+GOAL_KEYWORDS: Dict[str, List[str]] = {
+    "full-stack": ["full-stack", "full stack", "fullstack", "mern", "mean"],
+    "frontend": ["frontend", "front-end", "front end", "react", "vue", "angular", "ui developer"],
+    "backend": ["backend", "back-end", "back end", "node.js", "nodejs", "express", "django", "api developer"],
+}
+
+LEVELS = ["beginner", "intermediate"]
+
+# (label, lower bound inclusive, upper bound exclusive) in hours per week
+HOURS_BUCKETS: List[Tuple[str, float, float]] = [
+    ("lt8h", 0.0, 8.0),
+    ("8-15h", 8.0, 15.0),
+    ("15h+", 15.0, float("inf")),
+]
+
+# Representative hours used when generating a bucket offline
+HOURS_REPRESENTATIVE = {"lt8h": "5 hrs/week", "8-15h": "10 hrs/week", "15h+": "20 hrs/week"}
+
+_HOURS_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-|to|–)?\s*(\d+(?:\.\d+)?)?\s*(?:hrs?|hours?|h)\b(?:\s*(?:/|per|a)\s*(?:week|wk))?", re.IGNORECASE)
+
+
+def parse_weekly_hours(text: Optional[str]) -> Optional[float]:
+    """Parse strings like '12-15 hrs/week' or '8 hours per week' into an hour count (range midpoint)."""
+    if not text:
+        return None
+    match = _HOURS_RE.search(str(text))
+    if not match:
+        return None
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    return (low + high) / 2.0
+
+
+def infer_goal(message: str, user_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Map the profile's primary goal (or the message) onto a goal bucket."""
+    candidates = []
+    if user_profile and user_profile.get("primary_goal"):
+        candidates.append(str(user_profile["primary_goal"]))
+    candidates.append(message or "")
+    for text in candidates:
+        t = text.lower()
+        for goal, keywords in GOAL_KEYWORDS.items():
+            if any(k in t for k in keywords):
+                return goal
+    return None
+
+
+def hours_bucket(hours: Optional[float]) -> Optional[str]:
+    if hours is None:
+        return None
+    for label, low, high in HOURS_BUCKETS:
+        if low <= hours < high:
+            return label
+    return None
+
+
+def bucket_key(goal: str, level: str, hours_label: str) -> str:
+    return f"{goal}/{level}/{hours_label}"
+
+
+def bucket_for(message: str, user_profile: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Return the library bucket for a request, or None when the profile does not
+    pin down goal, level and weekly hours (such requests are generated live).
+    """
+    if not user_profile:
+        return None
+    level = str(user_profile.get("current_level") or "").strip().lower()
+    if level not in LEVELS:
+        return None
+    goal = infer_goal(message, user_profile)
+    hours_label = hours_bucket(parse_weekly_hours(user_profile.get("time_commitment")) or parse_weekly_hours(message))
+    if not goal or not hours_label:
+        return None
+    return bucket_key(goal, level, hours_label)
+
+
+def all_buckets() -> List[str]:
+    return [bucket_key(g, l, h[0]) for g in GOAL_KEYWORDS for l in LEVELS for h in HOURS_BUCKETS]
+
+
+def bucket_prompt(key: str) -> Tuple[str, Dict[str, Any]]:
+    """Build the canonical message and user_profile used to generate a bucket offline."""
+    goal, level, hours_label = key.split("/")
+    time_commitment = HOURS_REPRESENTATIVE[hours_label]
+    message = (
+        f"I'm a {level} developer with {time_commitment} available. "
+        f"Create a learning roadmap to become a job-ready {goal} developer."
+    )
+    profile = {"current_level": level, "primary_goal": f"{goal} developer", "time_commitment": time_commitment}
+    return message, profile
+
+
+def validate_roadmap(res: Any, min_phases: int = 2) -> Tuple[bool, str]:
+    """Check that a generated response is a usable structured roadmap."""
+    if not isinstance(res, dict):
+        return False, "response is not a JSON object"
+    if "raw_response" in res or res.get("error"):
+        return False, "response could not be parsed as a roadmap"
+    roadmap = res.get("roadmap")
+    if not isinstance(roadmap, dict):
+        return False, "missing roadmap object"
+    phases = roadmap.get("phases")
+    if not isinstance(phases, list) or len(phases) < min_phases:
+        return False, f"expected at least {min_phases} phases"
+    for i, phase in enumerate(phases, 1):
+        modules = phase.get("modules") if isinstance(phase, dict) else None
+        if not isinstance(modules, list) or not modules:
+            return False, f"phase {i} has no modules"
+        for m in modules:
+            if not isinstance(m, dict) or not (m.get("module_name") or m.get("title")):
+                return False, f"phase {i} has a module without a name"
+    return True, "ok"
+
+
+class RoadmapLibrary:
+    """
+    Versioned store of pre-generated roadmaps, one per goal/level/hours bucket.
+
+    Layout: <path>/<version>/roadmaps.json holding
+    {"version": ..., "generated_at": ..., "buckets": {key: {"roadmap": {...}, "generated_at": ...}}}
+    """
+
+    FILENAME = "roadmaps.json"
+
+    def __init__(self, path: Optional[str] = None, version: Optional[str] = None):
+        self.path = Path(path or settings.roadmap_library_path)
+        self.version = version or settings.roadmap_library_version
+        self.buckets: Dict[str, Dict[str, Any]] = {}
+        self.loaded = False
+
+    @property
+    def file_path(self) -> Path:
+        return self.path / self.version / self.FILENAME
+
+    def load(self) -> int:
+        """Load the configured version from disk. Returns number of buckets available."""
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.buckets = data.get("buckets", {}) or {}
+            logger.info("Loaded roadmap library %s with %d buckets", self.version, len(self.buckets))
+        except FileNotFoundError:
+            logger.info("Roadmap library %s not found at %s", self.version, self.file_path)
+            self.buckets = {}
+        except Exception as e:
+            logger.error("Failed to load roadmap library %s: %s", self.file_path, e)
+            self.buckets = {}
+        self.loaded = True
+        return len(self.buckets)
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a private copy of the stored roadmap for a bucket, if any."""
+        if not key:
+            return None
+        entry = self.buckets.get(key)
+        if not entry:
+            return None
+        return copy.deepcopy(entry["roadmap"])
+
+    def put(self, key: str, roadmap: Dict[str, Any]) -> None:
+        self.buckets[key] = {"roadmap": roadmap, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+    def save(self) -> Path:
+        """Atomically write the library version to disk."""
+        target = self.file_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(".json.tmp")
+        payload = {
+            "version": self.version,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "model": settings.gemini_model,
+            "buckets": self.buckets,
+        }
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, target)
+        logger.info("Wrote roadmap library %s (%d buckets) to %s", self.version, len(self.buckets), target)
+        return target
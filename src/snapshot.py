@@ -0,0 +1,142 @@
+"""
+Knowledge-base snapshots: a collection exported as plain files that another
+node can import with bulk writes and no re-encoding.
+
+A snapshot is a directory containing:
+
+- manifest.json: format version, collection name and metadata, document count,
+  dimension, embedding model (and backend) and per-file sha256 checksums
+- embeddings.npy: float32 matrix, one row per document, as indexed by Chroma
+- documents.jsonl.gz: {"id", "document", "metadata"} per line, in row order
+- full_embeddings.npy / projection.npz: the full-dimension vectors and fitted
+  PCA projection of collections with a reduced vector layout
+"""
+
+import gzip
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+FULL_EMBEDDINGS = "full_embeddings.npy"
+DOCUMENTS = "documents.jsonl.gz"
+PROJECTION = "projection.npz"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_snapshot(
+    directory: Path,
+    collection: Any,
+    manifest: Dict[str, Any],
+    full_vectors: Any = None,
+    projection: Optional[Path] = None,
+    batch_size: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Page through `collection` and write it to `directory`. `full_vectors` (a
+    FullVectorStore) and `projection` are included for reduced layouts.
+    Returns the written manifest.
+    """
+    import numpy as np
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    count = collection.count()
+    embeddings = None
+    full = None
+    row = 0
+    with gzip.open(directory / DOCUMENTS, "wt", encoding="utf-8") as docs:
+        for offset in range(0, count, batch_size):
+            page = collection.get(
+                limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"]
+            )
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                # preallocated on disk so the matrix is written contiguously without holding it in memory
+                embeddings = np.lib.format.open_memmap(directory / EMBEDDINGS, mode="w+", dtype=np.float32, shape=(count, vectors.shape[1]))
+            embeddings[row:row + len(vectors)] = vectors
+            if full_vectors is not None:
+                stored = full_vectors.get_many(page["ids"])
+                missing = [doc_id for doc_id in page["ids"] if doc_id not in stored]
+                if missing:
+                    raise ValueError(f"{len(missing)} documents have no full-dimension vector (e.g. {missing[0]})")
+                page_full = np.stack([stored[doc_id] for doc_id in page["ids"]])
+                if full is None:
+                    full = np.lib.format.open_memmap(directory / FULL_EMBEDDINGS, mode="w+", dtype=np.float32, shape=(count, page_full.shape[1]))
+                full[row:row + len(page_full)] = page_full
+            for doc_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                docs.write(json.dumps({"id": doc_id, "document": document, "metadata": metadata or {}}, ensure_ascii=False) + "\n")
+            row += len(vectors)
+    for matrix in (embeddings, full):
+        if matrix is not None:
+            matrix.flush()
+    if projection is not None and Path(projection).exists():
+        (directory / PROJECTION).write_bytes(Path(projection).read_bytes())
+
+    files = [name for name in (EMBEDDINGS, FULL_EMBEDDINGS, DOCUMENTS, PROJECTION) if (directory / name).exists()]
+    manifest = {
+        **manifest,
+        "format_version": FORMAT_VERSION,
+        "collection": collection.name,
+        "collection_metadata": collection.metadata or {},
+        "count": row,
+        "dimension": int(embeddings.shape[1]) if embeddings is not None else 0,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": {name: _sha256(directory / name) for name in files},
+    }
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def read_manifest(directory: Path, verify: bool = True) -> Dict[str, Any]:
+    directory = Path(directory)
+    manifest = json.loads((directory / MANIFEST).read_text(encoding="utf-8"))
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format_version')!r} (expected {FORMAT_VERSION})")
+    if verify:
+        for name, checksum in manifest.get("files", {}).items():
+            if _sha256(directory / name) != checksum:
+                raise ValueError(f"Snapshot file {name} does not match its checksum")
+    return manifest
+
+
+def iter_snapshot(directory: Path, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], Any, Any]]:
+    """Yield (ids, documents, metadatas, embeddings, full_embeddings or None) batches in row order."""
+    import numpy as np
+
+    directory = Path(directory)
+    embeddings = np.load(directory / EMBEDDINGS, mmap_mode="r") if (directory / EMBEDDINGS).exists() else None
+    full = np.load(directory / FULL_EMBEDDINGS, mmap_mode="r") if (directory / FULL_EMBEDDINGS).exists() else None
+    row = 0
+    batch: List[Dict[str, Any]] = []
+    with gzip.open(directory / DOCUMENTS, "rt", encoding="utf-8") as docs:
+        for line in docs:
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield _batch(batch, embeddings, full, row)
+                row += len(batch)
+                batch = []
+    if batch:
+        yield _batch(batch, embeddings, full, row)
+
+
+def _batch(records: List[Dict[str, Any]], embeddings: Any, full: Any, row: int):
+    end = row + len(records)
+    return (
+        [r["id"] for r in records],
+        [r["document"] for r in records],
+        [r["metadata"] or None for r in records],
+        embeddings[row:end],
+        full[row:end] if full is not None else None,
+    )
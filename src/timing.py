@@ -0,0 +1,109 @@
+"""
+Per-request stage timings.
+
+`StageTimer` collects how long each pipeline stage took for one request; the
+active timer lives in a context variable, so RAG and Gemini code can record
+stages with `with stage("embed"):` without the timer being passed through every
+call. Stages outside a timed request cost one context-variable lookup. When
+OpenTelemetry is installed and enabled, every stage is also exported as a span.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+_tracer = None
+
+
+class StageTimer:
+    """Accumulated seconds per stage name (a stage entered twice is summed)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, float]:
+        """Milliseconds per stage, plus the total since the timer started."""
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 2)
+        return timings
+
+    @staticmethod
+    def server_timing(timings: Dict[str, float]) -> str:
+        """Format a to_dict() result as a Server-Timing header value."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+@contextmanager
+def timed_request(name: str = "request") -> Iterator[StageTimer]:
+    """Make a fresh StageTimer current for the body of the `with` (under a root span when tracing)."""
+    timer = StageTimer()
+    token = _current.set(timer)
+    try:
+        if _tracer is not None:
+            with _tracer.start_as_current_span(name):
+                yield timer
+        else:
+            yield timer
+    finally:
+        _current.reset(token)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage into the current request's timer (and an OpenTelemetry span when enabled)."""
+    timer = _current.get()
+    if timer is None and _tracer is None:
+        yield
+        return
+    span = _tracer.start_as_current_span(name) if _tracer is not None else None
+    if span is not None:
+        span.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timer is not None:
+            timer.add(name, time.perf_counter() - start)
+        if span is not None:
+            span.__exit__(None, None, None)
+
+
+def configure_tracing() -> bool:
+    """
+    Export stages as OpenTelemetry spans to an OTLP collector when OTEL_ENABLED is set.
+    The opentelemetry packages are optional; without them tracing stays off.
+    """
+    global _tracer
+    if not settings.otel_enabled:
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_ENABLED is set but opentelemetry-sdk / OTLP exporter are not installed; tracing disabled")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.otel_service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.otel_endpoint, insecure=True)))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("asdsadf")
+    logger.info("Exporting stage spans to %s", settings.otel_endpoint)
+    return True
@@ -0,0 +1,13 @@
+"""Character-based token estimates shared by conversation memory and ingestion batching."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "end") -> str:
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[-max_chars:] if keep == "end" else text[:max_chars]
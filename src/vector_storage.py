@@ -0,0 +1,298 @@
+"""
+Reduced-dimension first-pass search with re-scoring against compact full vectors.
+
+Chroma keeps every vector as float32 in its HNSW index, so the index itself is
+made smaller by giving it fewer dimensions: a collection's `VectorLayout` can
+index `search_dim` dimensions, obtained by truncation (Matryoshka-style, for
+models trained for it) or by a PCA projection fitted on the corpus. The
+full-dimension vectors are kept on disk in a `FullVectorStore` as float32,
+float16 or int8 (symmetric per-vector scale), and only the top candidates of
+the first pass are read back and re-scored with the full-precision query.
+
+The layout is stored in the collection's metadata when the collection is
+created, so changing the VECTOR_* settings only affects new (or reset)
+collections. scripts/benchmark_vector_storage.py measures recall and latency
+for the possible layouts.
+
+A fitted PCA projection is saved next to the full-vector store and its version
+is recorded in that store's `meta` table, which every process shares; a
+process that sees a new version reloads the projection (RAGSystem._sync_projection).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ("float32", "float16", "int8")
+REDUCTIONS = ("truncate", "pca")
+
+
+def quantize(vectors, dtype: str) -> Tuple[Any, Any]:
+    """Encode float vectors as `dtype`; returns (codes, per-vector scales)."""
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown vector dtype {dtype!r} (expected one of {DTYPES})")
+    return vectors.astype(dtype), np.ones(len(vectors), dtype=np.float32)
+
+
+def dequantize(codes, scales):
+    import numpy as np
+
+    return np.asarray(codes, dtype=np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+def distances(query, vectors, space: str = "l2"):
+    """Distances in the convention Chroma uses for the collection's `hnsw:space`."""
+    import numpy as np
+
+    query = np.asarray(query, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if space == "ip":
+        return 1.0 - vectors @ query
+    if space == "cosine":
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        norms[norms == 0] = 1.0
+        return 1.0 - (vectors @ query) / norms
+    return ((vectors - query) ** 2).sum(axis=1)
+
+
+class VectorLayout:
+    """How a collection stores vectors; round-trips through Chroma collection metadata."""
+
+    def __init__(self, search_dim: int = 0, reduction: str = "pca", storage_dtype: str = "float32"):
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"Unknown vector reduction {reduction!r} (expected one of {REDUCTIONS})")
+        if storage_dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype {storage_dtype!r} (expected one of {DTYPES})")
+        self.search_dim = max(0, search_dim)
+        self.reduction = reduction
+        self.storage_dtype = storage_dtype
+
+    @property
+    def reduced(self) -> bool:
+        return self.search_dim > 0
+
+    @classmethod
+    def from_settings(cls) -> "VectorLayout":
+        return cls(settings.vector_search_dim, settings.vector_reduction, settings.vector_storage_dtype)
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict[str, Any]]) -> "VectorLayout":
+        """Collections created before layouts existed have no keys and index full float32 vectors."""
+        metadata = metadata or {}
+        return cls(
+            int(metadata.get("vector_search_dim", 0)),
+            metadata.get("vector_reduction", "pca"),
+            metadata.get("vector_storage_dtype", "float32"),
+        )
+
+    def to_metadata(self) -> Dict[str, Any]:
+        if not self.reduced:
+            return {}
+        return {
+            "vector_search_dim": self.search_dim,
+            "vector_reduction": self.reduction,
+            "vector_storage_dtype": self.storage_dtype,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"search_dim": self.search_dim or None, "reduction": self.reduction if self.reduced else None, "storage_dtype": self.storage_dtype if self.reduced else "float32"}
+
+
+class Reducer:
+    """
+    Projects full vectors to `dim` dimensions and re-normalizes them.
+
+    "truncate" keeps the leading dimensions. "pca" uses a projection fitted on
+    the stored vectors; until `fit` has run it behaves like "truncate".
+    """
+
+    def __init__(self, dim: int, method: str = "pca", mean=None, components=None):
+        self.dim = dim
+        self.method = method
+        self.mean = mean
+        self.components = components
+
+    @property
+    def fitted(self) -> bool:
+        return self.components is not None
+
+    def fit(self, vectors) -> "Reducer":
+        return self.fit_batches([vectors])
+
+    def fit_batches(self, batches: Iterable[Any]) -> "Reducer":
+        """
+        Fit the projection from batches of vectors without holding them all: the
+        mean and the d x d covariance are accumulated batch by batch, and the
+        principal axes are its eigenvectors with the largest eigenvalues.
+        """
+        import numpy as np
+
+        if self.method != "pca":
+            return self
+        count, total, scatter = 0, None, None
+        for vectors in batches:
+            vectors = np.asarray(vectors, dtype=np.float64)
+            if not len(vectors):
+                continue
+            if total is None:
+                total = np.zeros(vectors.shape[1])
+                scatter = np.zeros((vectors.shape[1], vectors.shape[1]))
+            count += len(vectors)
+            total += vectors.sum(axis=0)
+            scatter += vectors.T @ vectors
+        if count < 2:
+            raise ValueError("PCA needs at least two vectors")
+        mean = total / count
+        covariance = (scatter - count * np.outer(mean, mean)) / (count - 1)
+        # eigh returns ascending eigenvalues; take the strongest axes first
+        _, eigenvectors = np.linalg.eigh(covariance)
+        self.mean = mean.astype(np.float32)
+        self.components = eigenvectors[:, ::-1][:, : self.dim].T.astype(np.float32)
+        return self
+
+    def transform(self, vectors):
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        single = vectors.ndim == 1
+        if single:
+            vectors = vectors[None, :]
+        if self.fitted:
+            reduced = (vectors - self.mean) @ self.components.T
+        else:
+            reduced = vectors[:, : self.dim]
+        norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        reduced = reduced / norms
+        return reduced[0] if single else reduced
+
+    def save(self, path: Path) -> None:
+        import numpy as np
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # replace atomically: other processes may load the projection at any time
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, dim: int, method: str) -> "Reducer":
+        import numpy as np
+
+        reducer = cls(dim, method)
+        if method == "pca" and path.exists():
+            data = np.load(path)
+            reducer.mean, reducer.components = data["mean"], data["components"]
+            if reducer.components.shape[0] != dim:
+                logger.warning("Ignoring PCA projection %s fitted for %d dimensions (want %d)", path, reducer.components.shape[0], dim)
+                reducer.mean = reducer.components = None
+        return reducer
+
+
+class FullVectorStore:
+    """Full-dimension vectors by document id (SQLite, one `dtype` per store)."""
+
+    def __init__(self, path: Path, dtype: str = "float32"):
+        self.path = Path(path)
+        self.dtype = dtype
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (id TEXT PRIMARY KEY, scale REAL NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def put_many(self, ids: List[str], vectors) -> None:
+        if not ids:
+            return
+        codes, scales = quantize(vectors, self.dtype)
+        rows = [(doc_id, float(scale), code.tobytes()) for doc_id, scale, code in zip(ids, scales, codes)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors (id, scale, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Any]:
+        """Dequantized float32 vectors for the ids that are stored."""
+        import numpy as np
+
+        wanted = list(dict.fromkeys(ids))
+        found: Dict[str, Any] = {}
+        with self._lock:
+            # stay under SQLite's bound-parameter limit
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, scale, vector FROM vectors WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for doc_id, scale, blob in rows:
+                    found[doc_id] = np.frombuffer(blob, dtype=self.dtype).astype(np.float32) * scale
+        return found
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], Any]]:
+        """All stored (ids, vectors) in batches, for refitting a projection."""
+        import numpy as np
+
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, scale, vector FROM vectors WHERE id > ? ORDER BY id LIMIT ?", (last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            codes = np.stack([np.frombuffer(blob, dtype=self.dtype) for _, _, blob in rows])
+            yield [row[0] for row in rows], dequantize(codes, [row[1] for row in rows])
+
+    def delete_many(self, ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM vectors WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors")
+            self._conn.commit()
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM vectors").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,158 @@
+"""
+Async access to the vector store.
+
+Chroma's client is synchronous: every query, write and count does SQLite and
+HNSW work on the calling thread. Async code must never call it directly;
+`run_blocking` runs the call on a dedicated thread pool sized by
+VECTOR_STORE_WORKERS (separate from asyncio's default executor, which also
+serves model encodes and file I/O), and `AsyncCollection` wraps a Chroma
+collection with awaitable versions of the methods RAGSystem uses.
+
+`BlockingDetector` (enabled with DEBUG) reports any call that still blocks
+the event loop, with the stack of the offending code.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.config import settings
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORE_WAIT_SECONDS = metrics.histogram(
+    "asdsadf_vector_store_wait_seconds", "Time vector-store calls waited for an executor thread"
+)
+LOOP_BLOCKED = metrics.counter("asdsadf_event_loop_blocked_total", "Event-loop stalls seen by the blocking detector")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_vector_executor() -> ThreadPoolExecutor:
+    """Thread pool for vector-store calls, created on first use (so never in a pre-fork parent)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.vector_store_workers, thread_name_prefix="vector-store")
+    return _executor
+
+
+def shutdown_vector_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a synchronous vector-store call on the vector-store executor (context variables are kept)."""
+    submitted = time.perf_counter()
+
+    def call():
+        VECTOR_STORE_WAIT_SECONDS.observe(time.perf_counter() - submitted)
+        return fn(*args, **kwargs)
+
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(get_vector_executor(), functools.partial(context.run, call))
+
+
+class AsyncCollection:
+    """Awaitable facade over a Chroma collection; every call runs through `run_blocking`."""
+
+    def __init__(self, collection: Any):
+        self.collection = collection
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self.collection.metadata
+
+    async def count(self) -> int:
+        return await run_blocking(self.collection.count)
+
+    async def query(self, **kwargs: Any) -> Dict[str, Any]:
+        return await run_blocking(self.collection.query, **kwargs)
+
+    async def get(self, **kwargs: Any) -> Dict[str, Any]:
+        return await run_blocking(self.collection.get, **kwargs)
+
+    async def upsert(self, **kwargs: Any) -> None:
+        await run_blocking(self.collection.upsert, **kwargs)
+
+    async def update(self, **kwargs: Any) -> None:
+        await run_blocking(self.collection.update, **kwargs)
+
+    async def delete(self, **kwargs: Any) -> None:
+        await run_blocking(self.collection.delete, **kwargs)
+
+
+class BlockingDetector:
+    """
+    Debug aid: a heartbeat task stamps the time every `interval`; a watchdog
+    thread that sees the stamp go stale for more than `threshold` seconds logs
+    the event-loop thread's current stack, which is the code blocking the loop.
+    One report per stall.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, interval: float = 0.05):
+        self.threshold = threshold or settings.blocking_detector_threshold_seconds
+        self.interval = interval
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="blocking-detector", daemon=True)
+        self._watchdog.start()
+        logger.info("Blocking-call detector on (threshold %.0f ms)", self.threshold * 1000)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold + self.interval or reported == beat:
+                continue
+            reported = beat
+            self.stalls += 1
+            LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)"
+            logger.warning("Event loop blocked for %.0f ms so far; loop thread stack:\n%s", stalled * 1000, stack)